@@ -1,22 +1,33 @@
 """批量测试API"""
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import json
 from datetime import datetime
 import asyncio
+import logging
+import uuid
 
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.models.model_config import ModelConfigDB
 from app.models.test_case import TestCaseDB
-from app.models.test_result import TestResultDB, TestMetrics
-from app.models.tool_definition import ToolDefinitionDB
-from app.services.llm_service import LLMService
-from app.services.agent_service import AgentService
-from app.services.evaluation_service import EvaluationService
+from app.models.test_result import TestResultDB, TestResultSampleDB, TestMetrics
+from app.models.batch_job import (
+    BatchDB, BatchItemDB, BatchStatusResponse, BatchHistoryEntry, ITEM_PENDING,
+    BATCH_PENDING, BATCH_RUNNING, BATCH_PAUSED, BATCH_CANCELLED
+)
+from app.services.batch_queue import BatchQueue
+from app.services.batch_progress import BatchProgress
+from app.services.batch_worker import BatchWorker
+from app.services.benchmark_service import BenchmarkService
+from app.services.compare_service import CompareService
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -27,6 +38,35 @@ class BatchRunRequest(BaseModel):
     model_ids: List[int] = Field(..., min_items=1, description="模型ID列表")
     test_case_ids: List[int] = Field(..., min_items=1, description="测试用例ID列表")
     params: Optional[Dict[str, Any]] = Field(None, description="覆盖模型参数")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="全局最大并发调用数（为空时使用配置值）")
+    use_cache: Optional[bool] = Field(None, description="是否使用响应缓存（为空时使用全局配置）")
+    virtual_clock: Optional[bool] = Field(None, description="Mock工具虚拟时钟：只记录模拟延迟不实际等待（为空时使用全局配置）")
+    force_stream: bool = Field(False, description="强制流式调用，记录首token延迟、token间隔等流式指标")
+    priority: int = Field(0, description="批次优先级，数值越大越先调度（如交互式回归测试优先于夜间大批量测试）")
+    n_samples: int = Field(1, ge=1, le=100, description="每个组合的采样次数（>1 时并发采样并统计 pass@k、得分均值/标准差、延迟分位数）")
+    only_stale: bool = Field(False, description="增量重跑：输入指纹与近期成功结果一致的组合直接复用结果，只执行有变化的组合")
+    reuse_max_age_hours: Optional[int] = Field(None, ge=0, description="可复用结果的最长时间(小时)，0 表示不限（为空时使用配置值）")
+    adaptive: bool = Field(False, description="自适应早停：模型得分置信区间与领先模型明显分离时跳过其剩余用例")
+    confidence: Optional[float] = Field(None, gt=0.5, lt=1, description="早停置信水平（为空时使用配置值）")
+    min_cases: Optional[int] = Field(None, ge=2, description="早停前每个模型至少完成的用例数（为空时使用配置值）")
+
+
+class BatchPriorityRequest(BaseModel):
+    """调整批次优先级请求"""
+    priority: int = Field(..., description="批次优先级，数值越大越先调度")
+
+
+class BenchmarkRequest(BaseModel):
+    """压测请求（并发扫描）"""
+    model_config = {"protected_namespaces": ()}
+    
+    model_id: int = Field(..., description="模型ID")
+    test_case_ids: List[int] = Field(..., min_items=1, description="回放的测试用例ID列表")
+    concurrency_levels: Optional[List[int]] = Field(None, description="并发级别列表（为空时使用 1, 2, 4 ... max_concurrency）")
+    max_concurrency: int = Field(16, ge=1, le=1024, description="最大并发级别")
+    requests_per_level: Optional[int] = Field(None, ge=1, description="每个级别的请求数（为空时为 并发数×4 与用例数的较大值）")
+    params: Optional[Dict[str, Any]] = Field(None, description="覆盖模型参数")
+    stream: bool = Field(True, description="是否流式调用（流式时记录首token延迟）")
 
 
 class BatchRunResponse(BaseModel):
@@ -59,175 +99,192 @@ class CompareResult(BaseModel):
     results: List[Dict[str, Any]]
 
 
+class CompareSummary(BaseModel):
+    """单个模型的对比汇总"""
+    model_config = {"protected_namespaces": ()}
+    
+    model_id: int
+    model_name: str
+    total: int
+    test_cases: int
+    success_rate: Optional[float] = None
+    score_mean: Optional[float] = None
+    scored: int = 0
+    score_min: Optional[float] = None
+    score_max: Optional[float] = None
+    latency_mean: Optional[float] = None
+    latency_p50: Optional[float] = None
+    latency_p90: Optional[float] = None
+    latency_p95: Optional[float] = None
+    tokens_mean: Optional[float] = None
+    tokens_total: Optional[int] = None
+    cache_hits: int = 0
+    cache_lookups: int = 0
+    cache_hit_rate: Optional[float] = None
+
+
 @router.post("/run", response_model=BatchRunResponse)
 async def run_batch_test(
     request: BatchRunRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """执行批量测试"""
+    """执行批量测试（批次持久化到数据库，由 worker 领取执行）"""
     # 验证模型和测试用例存在
-    models = db.query(ModelConfigDB).filter(ModelConfigDB.id.in_(request.model_ids)).all()
+    models = (await db.scalars(select(ModelConfigDB).where(ModelConfigDB.id.in_(request.model_ids)))).all()
     if len(models) != len(request.model_ids):
         raise HTTPException(status_code=404, detail="Some models not found")
     
-    test_cases = db.query(TestCaseDB).filter(TestCaseDB.id.in_(request.test_case_ids)).all()
+    test_cases = (await db.scalars(select(TestCaseDB).where(TestCaseDB.id.in_(request.test_case_ids)))).all()
     if len(test_cases) != len(request.test_case_ids):
         raise HTTPException(status_code=404, detail="Some test cases not found")
     
-    # 生成批次ID
-    batch_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    batch_id = BatchQueue.new_batch_id()
     
-    # 在后台执行测试
-    background_tasks.add_task(
-        execute_batch_test,
+    await db.run_sync(
+        BatchQueue.create_batch,
         batch_id,
         models,
         test_cases,
-        request.params
+        request.params,
+        {
+            "max_concurrency": request.max_concurrency,
+            "use_cache": request.use_cache,
+            "virtual_clock": request.virtual_clock,
+            "force_stream": request.force_stream,
+            "n_samples": request.n_samples,
+            "adaptive": request.adaptive,
+            "confidence": request.confidence,
+            "min_cases": request.min_cases
+        },
+        request.priority,
+        request.only_stale,
+        request.reuse_max_age_hours
     )
+    BatchWorker.wake()
+    
+    message = f"Batch test started with {len(models)} models and {len(test_cases)} test cases"
+    if request.only_stale:
+        pending = await _count_pending(db, batch_id)
+        message += f" ({len(models) * len(test_cases) - pending} unchanged pairs reused, {pending} to run)"
     
     return BatchRunResponse(
         batch_id=batch_id,
         status="running",
-        message=f"Batch test started with {len(models)} models and {len(test_cases)} test cases"
+        message=message
     )
 
 
-async def execute_batch_test(
-    batch_id: str,
-    models: List[ModelConfigDB],
-    test_cases: List[TestCaseDB],
-    params: Optional[Dict[str, Any]]
-):
-    """执行批量测试（后台任务）"""
-    from app.utils.database import SessionLocal
+@router.get("/batches/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    """获取批次执行状态（各状态的组合数量）"""
+    batch = await db.get(BatchDB, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return await db.run_sync(BatchQueue.status, batch)
+
+
+async def _count_pending(db: AsyncSession, batch_id: str) -> int:
+    """批次中待执行的组合数量"""
+    return await db.scalar(select(func.count(BatchItemDB.id)).where(
+        BatchItemDB.batch_id == batch_id,
+        BatchItemDB.status == ITEM_PENDING
+    ))
+
+
+@router.post("/batches/{batch_id}/resume", response_model=BatchRunResponse)
+async def resume_batch(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    """续跑批次（包括已暂停、已取消的批次）：重新执行失败、取消和中断的组合，已完成的组合不会重复调用"""
+    batch = await db.get(BatchDB, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
     
-    db = SessionLocal()
-    results = []
+    requeued = await db.run_sync(BatchQueue.reset_for_resume, batch_id)
+    pending = await _count_pending(db, batch_id)
+    BatchWorker.wake()
     
-    try:
-        for test_case in test_cases:
-            # 加载测试用例关联的工具定义
-            tools = None
-            tools_config = {}
-            if test_case.tools:
-                tool_definitions = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.id.in_(test_case.tools)).all()
-                # 转换为OpenAI API格式
-                tools = [
-                    {
-                        "type": "function",
-                        "function": {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "parameters": tool.parameters
-                        }
-                    }
-                    for tool in tool_definitions
-                ]
-                # 构建工具配置字典（用于mock）
-                tools_config = {tool.name: tool.mock_responses for tool in tool_definitions}
-            
-            for model in models:
-                # 判断是否使用Agent模式
-                # 如果测试用例配置了use_mock或有工具定义，使用Agent模式
-                use_agent_mode = tools is not None
-                use_mock = test_case.use_mock if test_case.use_mock is not None else False
-                
-                if use_agent_mode:
-                    # 使用Agent服务（支持多轮工具调用）
-                    result = await AgentService.run_agent(
-                        model_config=model,
-                        content=test_case.prompt,
-                        system_prompt=test_case.system_prompt,
-                        params=params,
-                        tools=tools,
-                        tools_config=tools_config,
-                        conversation_history=test_case.conversation_history,
-                        use_mock=use_mock,
-                        max_iterations=5
-                    )
-                else:
-                    # 使用原有的单次调用（无工具）
-                    result = await LLMService.call_model(
-                        model_config=model,
-                        content=test_case.prompt,
-                        system_prompt=test_case.system_prompt,
-                        params=params,
-                        tools=None,
-                        stream=False,
-                        conversation_history=test_case.conversation_history
-                    )
-                
-                # 评估结果
-                score = None
-                if result.get("status") == "success":
-                    # 从tool_call_history提取工具调用（如果有）
-                    tool_calls_for_eval = None
-                    if result.get("tool_call_history"):
-                        # 转换为评估服务期望的格式
-                        tool_calls_for_eval = [
-                            {
-                                "function": {
-                                    "name": tc["tool_name"],
-                                    "arguments": tc["arguments"]
-                                }
-                            }
-                            for tc in result.get("tool_call_history", [])
-                        ]
-                    
-                    score, eval_details = EvaluationService.evaluate_result(
-                        output=result.get("output", ""),
-                        expected_output=test_case.expected_output,
-                        tool_calls=tool_calls_for_eval or result.get("tool_calls"),
-                        expected_tool_calls=test_case.expected_tool_calls,
-                        evaluation_criteria=test_case.evaluation_criteria,
-                        evaluation_weights=test_case.evaluation_weights,
-                        conversation_history=result.get("conversation_history"),
-                        tool_call_history=result.get("tool_call_history")
-                    )
-                    # 将评估详情添加到metrics中
-                    metrics = result.get("metrics", {})
-                    metrics['evaluation'] = eval_details
-                else:
-                    metrics = result.get("metrics", {})
-                
-                # 保存结果到数据库
-                db_result = TestResultDB(
-                    test_case_id=test_case.id,
-                    model_id=model.id,
-                    output=result.get("output", ""),
-                    metrics=metrics,
-                    score=score,
-                    status=result.get("status", "success"),
-                    error_message=result.get("error_message")
-                )
-                db.add(db_result)
-                
-                results.append({
-                    "test_case_id": test_case.id,
-                    "model_id": model.id,
-                    "status": result.get("status"),
-                    "metrics": result.get("metrics")
-                })
-        
-        db.commit()
-        
-        # 保存批次结果到JSON文件
-        result_file = settings.RESULTS_DIR / f"{batch_id}.json"
-        with open(result_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "batch_id": batch_id,
-                "timestamp": datetime.now().isoformat(),
-                "models": [{"id": m.id, "name": m.name} for m in models],
-                "test_cases": [{"id": tc.id, "title": tc.title} for tc in test_cases],
-                "results": results
-            }, f, ensure_ascii=False, indent=2)
-        
-    except Exception as e:
-        print(f"Error in batch test: {e}")
-    finally:
-        db.close()
+    return BatchRunResponse(
+        batch_id=batch_id,
+        status="running",
+        message=f"Batch resumed: {pending} pending items ({requeued} requeued)"
+    )
+
+
+@router.post("/batches/{batch_id}/pause", response_model=BatchRunResponse)
+async def pause_batch(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    """暂停批次：停止派发新组合，中断执行中的调用（这些组合在续跑时重新执行）"""
+    batch = await db.get(BatchDB, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if batch.status not in (BATCH_PENDING, BATCH_RUNNING):
+        raise HTTPException(status_code=400, detail=f"Batch is {batch.status}, cannot pause")
+    
+    interrupted = await db.run_sync(BatchQueue.pause, batch_id)
+    BatchWorker.check_revoked()
+    
+    return BatchRunResponse(
+        batch_id=batch_id,
+        status=BATCH_PAUSED,
+        message=f"Batch paused: {interrupted} in-flight items interrupted"
+    )
+
+
+@router.post("/batches/{batch_id}/cancel", response_model=BatchRunResponse)
+async def cancel_batch(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    """取消批次：停止派发新组合并中断执行中的调用，已完成的结果保留"""
+    batch = await db.get(BatchDB, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if batch.status not in (BATCH_PENDING, BATCH_RUNNING, BATCH_PAUSED):
+        raise HTTPException(status_code=400, detail=f"Batch is {batch.status}, cannot cancel")
+    
+    cancelled = await db.run_sync(BatchQueue.cancel, batch_id)
+    BatchWorker.check_revoked()
+    
+    return BatchRunResponse(
+        batch_id=batch_id,
+        status=BATCH_CANCELLED,
+        message=f"Batch cancelled: {cancelled} unfinished items cancelled"
+    )
+
+
+@router.put("/batches/{batch_id}/priority", response_model=BatchStatusResponse)
+async def update_batch_priority(batch_id: str, request: BatchPriorityRequest, db: AsyncSession = Depends(get_async_db)):
+    """调整批次优先级（对尚未派发的组合生效）"""
+    if not await db.run_sync(BatchQueue.set_priority, batch_id, request.priority):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch = await db.get(BatchDB, batch_id)
+    return await db.run_sync(BatchQueue.status, batch)
+
+
+@router.get("/batches/{batch_id}/progress")
+async def stream_batch_progress(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    批次实时进度（SSE）
+    
+    事件类型：
+    - result: 每个完成的组合（状态、得分、延迟、token）
+    - progress: 完成/失败数量、ETA、各模型的平均得分/延迟/token
+    - done: 批次结束
+    """
+    if not await db.scalar(select(BatchDB.id).where(BatchDB.id == batch_id)):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    async def event_generator():
+        try:
+            async for event in BatchProgress.stream(batch_id):
+                yield f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'error_message': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 @router.get("/results/{batch_id}")
@@ -248,102 +305,182 @@ async def get_batch_results(batch_id: str):
 async def compare_results(
     model_ids: str,  # 逗号分隔的模型ID
     test_case_ids: str,  # 逗号分隔的测试用例ID
-    db: Session = Depends(get_db)
+    response: Response,
+    skip: int = 0,
+    limit: Optional[int] = Query(None, ge=1, description="每页测试用例数（为空时返回全部）"),
+    batch_id: Optional[str] = Query(None, description="只对比指定批次的结果"),
+    latest_only: bool = Query(False, description="每个 (测试用例, 模型) 只返回最新一条结果"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """多模型对比结果"""
-    # 解析ID列表
-    model_id_list = [int(id) for id in model_ids.split(',')]
-    test_case_id_list = [int(id) for id in test_case_ids.split(',')]
-    
-    # 查询结果
-    results = db.query(TestResultDB).filter(
-        TestResultDB.model_id.in_(model_id_list),
-        TestResultDB.test_case_id.in_(test_case_id_list)
-    ).all()
-    
-    # 按测试用例分组
-    compare_results = {}
-    for result in results:
-        if result.test_case_id not in compare_results:
-            test_case = db.query(TestCaseDB).filter(TestCaseDB.id == result.test_case_id).first()
-            compare_results[result.test_case_id] = {
-                "test_case_id": result.test_case_id,
-                "test_case_title": test_case.title if test_case else "Unknown",
-                "test_case_prompt": test_case.prompt if test_case else "",
-                "expected_output": test_case.expected_output if test_case else "",
-                "expected_tool_calls": test_case.expected_tool_calls if test_case else None,
-                "results": []
-            }
-        
-        model = db.query(ModelConfigDB).filter(ModelConfigDB.id == result.model_id).first()
-        compare_results[result.test_case_id]["results"].append({
-            "result_id": result.id,  # 添加result_id用于删除
-            "model_id": result.model_id,
-            "model_name": model.name if model else "Unknown",
-            "output": result.output,
-            "metrics": result.metrics,
-            "score": result.score,
-            "status": result.status
-        })
-    
-    return list(compare_results.values())
+    """多模型对比结果（按测试用例分组、分页，总数在 X-Total-Count 响应头中）"""
+    model_id_list, test_case_id_list = _parse_compare_ids(model_ids, test_case_ids)
+    results, total = await db.run_sync(
+        CompareService.results, model_id_list, test_case_id_list, skip, limit, batch_id, latest_only
+    )
+    response.headers["X-Total-Count"] = str(total)
+    return results
+
+
+@router.get("/compare/summary", response_model=List[CompareSummary])
+async def compare_summary(
+    model_ids: str,  # 逗号分隔的模型ID
+    test_case_ids: str,  # 逗号分隔的测试用例ID
+    batch_id: Optional[str] = Query(None, description="只统计指定批次的结果"),
+    latest_only: bool = Query(False, description="每个 (测试用例, 模型) 只统计最新一条结果"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """各模型汇总指标：平均得分、成功率、延迟分位数、token（数据库聚合）"""
+    model_id_list, test_case_id_list = _parse_compare_ids(model_ids, test_case_ids)
+    return await db.run_sync(CompareService.summary, model_id_list, test_case_id_list, batch_id, latest_only)
+
+
+def _parse_compare_ids(model_ids: str, test_case_ids: str):
+    """解析逗号分隔的ID列表"""
+    try:
+        return (
+            [int(id) for id in model_ids.split(',') if id],
+            [int(id) for id in test_case_ids.split(',') if id]
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid id list")
 
 
 @router.delete("/results/{result_id}", status_code=204)
 async def delete_test_result(
     result_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除单个测试结果"""
-    result = db.query(TestResultDB).filter(TestResultDB.id == result_id).first()
+    result = await db.get(TestResultDB, result_id)
     if not result:
         raise HTTPException(status_code=404, detail="Test result not found")
     
-    db.delete(result)
-    db.commit()
+    await db.execute(delete(TestResultSampleDB).where(TestResultSampleDB.result_id == result_id))
+    await db.delete(result)
+    await db.commit()
     return None
 
 
 @router.delete("/results/batch/{batch_id}", status_code=204)
 async def delete_batch_results(
     batch_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """删除整个批次的测试结果"""
-    # 删除JSON文件
-    result_file = settings.RESULTS_DIR / f"{batch_id}.json"
-    if result_file.exists():
+    """删除整个批次：批次记录、组合、只属于该批次的测试结果和结果文件（等待中、运行中的批次需先取消）"""
+    batch = await db.get(BatchDB, batch_id)
+    if not batch:
+        # 未导入数据库的旧版本结果文件
+        result_file = settings.RESULTS_DIR / f"{batch_id}.json"
+        if not result_file.exists():
+            raise HTTPException(status_code=404, detail="Batch not found")
         result_file.unlink()
+        return None
+    if batch.status in (BATCH_PENDING, BATCH_RUNNING):
+        raise HTTPException(status_code=400, detail=f"Batch is {batch.status}, cancel it before deleting")
     
-    # 也可以从数据库中删除相关结果（如果有存储）
-    # 这里简单处理，只删除文件
+    await db.run_sync(BatchQueue.delete, batch_id)
     return None
 
 
-@router.get("/history")
-async def get_batch_history():
-    """获取所有批量测试历史记录"""
-    import os
-    from pathlib import Path
+@router.get("/history", response_model=List[BatchHistoryEntry])
+async def get_batch_history(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    status: Optional[str] = Query(None, description="按批次状态过滤"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """批量测试历史记录（按创建时间倒序分页，总数在 X-Total-Count 响应头中）"""
+    history, total = await db.run_sync(BatchQueue.history, skip, limit, status)
+    response.headers["X-Total-Count"] = str(total)
+    return history
+
+
+@router.post("/benchmark", response_model=BatchRunResponse)
+async def run_benchmark(
+    request: BenchmarkRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """执行压测：在递增的并发级别下回放测试用例，测量吞吐、延迟分位数和饱和点"""
+    model = await db.get(ModelConfigDB, request.model_id)
+    if not model:
+        raise HTTPException(status_code=404, detail="Model not found")
     
-    results_dir = settings.RESULTS_DIR
-    if not results_dir.exists():
-        return []
+    test_cases = (await db.scalars(select(TestCaseDB).where(TestCaseDB.id.in_(request.test_case_ids)))).all()
+    if len(test_cases) != len(set(request.test_case_ids)):
+        raise HTTPException(status_code=404, detail="Some test cases not found")
     
-    history = []
-    for file in sorted(results_dir.glob("batch_*.json"), reverse=True):
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                history.append({
-                    "batch_id": data.get("batch_id"),
-                    "timestamp": data.get("timestamp"),
-                    "models": data.get("models", []),
-                    "test_cases": data.get("test_cases", []),
-                    "total_tests": len(data.get("models", [])) * len(data.get("test_cases", []))
-                })
-        except Exception as e:
-            print(f"Error reading batch file {file}: {e}")
-            continue
+    levels = sorted(set(request.concurrency_levels)) if request.concurrency_levels else \
+        BenchmarkService.default_levels(request.max_concurrency)
+    if levels[0] < 1:
+        raise HTTPException(status_code=400, detail="Concurrency levels must be positive")
     
-    return history
+    # 与批次ID相同：时间戳加随机后缀，同一秒内发起的压测不会互相覆盖结果文件
+    benchmark_id = f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    header = {
+        "benchmark_id": benchmark_id,
+        "timestamp": datetime.now().isoformat(),
+        "model": {"id": model.id, "name": model.name},
+        "test_cases": [{"id": tc.id, "title": tc.title} for tc in test_cases],
+        "concurrency_levels": levels,
+        "stream": request.stream
+    }
+    _write_benchmark(benchmark_id, {**header, "status": "running"})
+    
+    background_tasks.add_task(
+        execute_benchmark,
+        header,
+        model,
+        test_cases,
+        levels,
+        request.requests_per_level,
+        request.params,
+        request.stream
+    )
+    
+    return BatchRunResponse(
+        batch_id=benchmark_id,
+        status="running",
+        message=f"Benchmark started for {model.name} at concurrency levels {levels}"
+    )
+
+
+async def execute_benchmark(
+    header: Dict[str, Any],
+    model: ModelConfigDB,
+    test_cases: List[TestCaseDB],
+    levels: List[int],
+    requests_per_level: Optional[int],
+    params: Optional[Dict[str, Any]],
+    stream: bool
+):
+    """执行压测（后台任务），结果写入 RESULTS_DIR/benchmark_*.json"""
+    try:
+        report = await BenchmarkService.run_sweep(
+            model, test_cases, levels, requests_per_level, params, stream
+        )
+        _write_benchmark(header["benchmark_id"], {**header, "status": "completed", **report})
+    except Exception as e:
+        logger.exception(f"❌ 压测失败 {header['benchmark_id']}: {e}")
+        _write_benchmark(header["benchmark_id"], {**header, "status": "error", "error_message": str(e)})
+
+
+def _write_benchmark(benchmark_id: str, data: Dict[str, Any]):
+    result_file = settings.RESULTS_DIR / f"{benchmark_id}.json"
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+@router.get("/benchmark/{benchmark_id}")
+async def get_benchmark_results(benchmark_id: str):
+    """获取压测结果"""
+    if not benchmark_id.startswith("benchmark_"):
+        raise HTTPException(status_code=404, detail="Benchmark results not found")
+    result_file = settings.RESULTS_DIR / f"{benchmark_id}.json"
+    
+    if not result_file.exists():
+        raise HTTPException(status_code=404, detail="Benchmark results not found")
+    
+    with open(result_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
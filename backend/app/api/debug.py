@@ -1,17 +1,20 @@
 """调试API - 单次对话测试"""
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, Union, List
+import asyncio
 import json
 
-from app.utils.database import get_db
+from app.config import settings
+from app.utils.database import get_async_db
 from app.models.model_config import ModelConfigDB
-from app.models.tool_definition import ToolDefinitionDB
 from app.services.llm_service import LLMService
 from app.services.mock_tool_executor import MockToolExecutor
 from app.services.agent_service import AgentService
+from app.services.response_cache import ResponseCache
+from app.services.tool_registry import ToolRegistry
 
 router = APIRouter()
 
@@ -30,6 +33,8 @@ class ChatRequest(BaseModel):
     use_agent: bool = Field(True, description="是否使用Agent模式（支持多轮工具调用）")
     max_iterations: int = Field(5, description="Agent最大迭代次数")
     stream: bool = Field(False, description="是否使用流式输出")
+    use_cache: Optional[bool] = Field(None, description="是否使用响应缓存（为空时使用全局配置，仅非流式）")
+    virtual_clock: Optional[bool] = Field(None, description="Mock工具虚拟时钟：只记录模拟延迟不实际等待（为空时使用全局配置）")
 
 
 class ChatResponse(BaseModel):
@@ -47,37 +52,38 @@ class ChatResponse(BaseModel):
 @router.post("/chat")
 async def debug_chat(
     request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """单次对话测试，支持流式和非流式，支持Agent多轮工具调用"""
     # 获取模型配置
-    model_config = db.query(ModelConfigDB).filter(ModelConfigDB.id == request.model_id).first()
+    model_config = await db.get(ModelConfigDB, request.model_id)
     if not model_config:
         raise HTTPException(status_code=404, detail="Model not found")
 
-    # 加载工具定义
-    tools = None
-    tool_definitions_dict = {}  # 用于mock执行
-    if request.tool_ids:
-        tool_definitions = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.id.in_(request.tool_ids)).all()
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": tool.parameters
-                }
-            }
-            for tool in tool_definitions
-        ]
-        # 构建工具配置字典
-        tool_definitions_dict = {tool.name: tool.mock_responses for tool in tool_definitions}
+    # 加载工具定义（tool_definitions_dict 用于mock执行）
+    tools, tool_definitions_dict = await db.run_sync(ToolRegistry.resolve, request.tool_ids)
 
-    # 流式模式暂不支持Agent（需要等待工具执行完成）
+    # 流式模式：启用Agent且有工具时逐个推送Agent事件，否则推送单次调用的文本增量
     if request.stream:
         async def event_generator():
             try:
+                if request.use_agent and tools:
+                    async for event in AgentService.run_agent_stream(
+                        model_config=model_config,
+                        content=request.content,
+                        system_prompt=request.system_prompt,
+                        params=request.params,
+                        tools=tools,
+                        tools_config=tool_definitions_dict,
+                        conversation_history=request.conversation_history,
+                        use_mock=request.use_mock,
+                        max_iterations=request.max_iterations,
+                        virtual_clock=request.virtual_clock
+                    ):
+                        yield f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+                    yield "data: [DONE]\n\n"
+                    return
+                
                 stream_result = await LLMService.call_model(
                     model_config=model_config,
                     content=request.content,
@@ -87,8 +93,18 @@ async def debug_chat(
                     conversation_history=request.conversation_history,
                     stream=True
                 )
-                async for chunk in stream_result:
+                if isinstance(stream_result, dict):
+                    # 重试后仍失败、被熔断或不支持流式的提供商返回完整结果，作为完成块推送
+                    chunk = {
+                        "done": True,
+                        "final_response": stream_result,
+                        "status": stream_result.get("status"),
+                        "error": stream_result.get("error_message")
+                    }
                     yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                else:
+                    async for chunk in stream_result:
+                        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
                 yield "data: [DONE]\n\n"
             except Exception as e:
                 yield f"data: {json.dumps({'error': str(e), 'done': True, 'status': 'error'})}\n\n"
@@ -114,7 +130,9 @@ async def debug_chat(
             tools_config=tool_definitions_dict,
             conversation_history=request.conversation_history,
             use_mock=request.use_mock,
-            max_iterations=request.max_iterations
+            max_iterations=request.max_iterations,
+            use_cache=request.use_cache,
+            virtual_clock=request.virtual_clock
         )
         
         # Agent返回完整的工具调用历史
@@ -136,14 +154,16 @@ async def debug_chat(
             params=request.params,
             tools=tools,
             conversation_history=request.conversation_history,
-            stream=False
+            stream=False,
+            use_cache=request.use_cache
         )
         
         # 如果启用了mock模式且有工具调用，执行模拟工具调用（旧逻辑，仅用于兼容）
         if request.use_mock and result.get("tool_calls"):
             tool_calls = result.get("tool_calls", [])
-            mock_results = MockToolExecutor.execute_multiple_tool_calls(
-                tool_calls, tool_definitions_dict
+            virtual_clock = settings.MOCK_VIRTUAL_CLOCK if request.virtual_clock is None else request.virtual_clock
+            mock_results = await MockToolExecutor.execute_multiple_tool_calls_async(
+                tool_calls, tool_definitions_dict, virtual_clock
             )
             result["mock_tool_results"] = mock_results
         
@@ -155,3 +175,16 @@ async def debug_chat(
             tool_calls=result.get("tool_calls"),
             mock_tool_results=result.get("mock_tool_results")
         )
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """获取响应缓存统计"""
+    return await asyncio.to_thread(ResponseCache.stats)
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """清空响应缓存"""
+    deleted = await asyncio.to_thread(ResponseCache.clear)
+    return {"deleted": deleted}
@@ -1,9 +1,10 @@
 """模型模板管理API"""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.models.model_template import (
     ModelTemplateDB, ModelTemplateCreate, ModelTemplateUpdate, 
     ModelTemplateResponse, BatchCreateModelsRequest, BatchCreateModelsResponse
@@ -19,20 +20,20 @@ async def list_templates(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取模型模板列表"""
-    query = db.query(ModelTemplateDB)
+    query = select(ModelTemplateDB)
     if active_only:
-        query = query.filter(ModelTemplateDB.is_active == True)
-    templates = query.offset(skip).limit(limit).all()
+        query = query.where(ModelTemplateDB.is_active == True)
+    templates = (await db.scalars(query.offset(skip).limit(limit))).all()
     return templates
 
 
 @router.get("/{template_id}", response_model=ModelTemplateResponse)
-async def get_template(template_id: int, db: Session = Depends(get_db)):
+async def get_template(template_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取单个模型模板"""
-    template = db.query(ModelTemplateDB).filter(ModelTemplateDB.id == template_id).first()
+    template = await db.get(ModelTemplateDB, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     return template
@@ -41,7 +42,7 @@ async def get_template(template_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=ModelTemplateResponse, status_code=status.HTTP_201_CREATED)
 async def create_template(
     template: ModelTemplateCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建模型模板"""
     # 验证API端点
@@ -49,7 +50,7 @@ async def create_template(
         raise HTTPException(status_code=400, detail="Invalid API endpoint")
     
     # 检查名称是否已存在
-    existing = db.query(ModelTemplateDB).filter(ModelTemplateDB.name == template.name).first()
+    existing = await db.scalar(select(ModelTemplateDB).where(ModelTemplateDB.name == template.name))
     if existing:
         raise HTTPException(status_code=400, detail="Template name already exists")
     
@@ -67,8 +68,8 @@ async def create_template(
     )
     
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 
@@ -76,10 +77,10 @@ async def create_template(
 async def update_template(
     template_id: int,
     template: ModelTemplateUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新模型模板"""
-    db_template = db.query(ModelTemplateDB).filter(ModelTemplateDB.id == template_id).first()
+    db_template = await db.get(ModelTemplateDB, template_id)
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
     
@@ -101,20 +102,20 @@ async def update_template(
     for key, value in update_data.items():
         setattr(db_template, key, value)
     
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 
 @router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_template(template_id: int, db: Session = Depends(get_db)):
+async def delete_template(template_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除模型模板"""
-    db_template = db.query(ModelTemplateDB).filter(ModelTemplateDB.id == template_id).first()
+    db_template = await db.get(ModelTemplateDB, template_id)
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    db.delete(db_template)
-    db.commit()
+    await db.delete(db_template)
+    await db.commit()
     return None
 
 
@@ -122,11 +123,11 @@ async def delete_template(template_id: int, db: Session = Depends(get_db)):
 async def batch_create_models(
     template_id: int,
     request: BatchCreateModelsRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """从模板批量创建模型"""
     # 获取模板
-    template = db.query(ModelTemplateDB).filter(ModelTemplateDB.id == template_id).first()
+    template = await db.get(ModelTemplateDB, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
@@ -154,7 +155,7 @@ async def batch_create_models(
             config_name = f"{request.name_prefix or template.name}_{model_info.get('display_name', model_name)}"
             
             # 检查名称是否已存在
-            existing = db.query(ModelConfigDB).filter(ModelConfigDB.name == config_name).first()
+            existing = await db.scalar(select(ModelConfigDB).where(ModelConfigDB.name == config_name))
             if existing:
                 errors.append(f"Model name '{config_name}' already exists")
                 continue
@@ -177,7 +178,7 @@ async def batch_create_models(
             )
             
             db.add(db_model)
-            db.flush()  # 获取ID但不提交
+            await db.flush()  # 获取ID但不提交
             
             created_models.append({
                 "id": db_model.id,
@@ -191,9 +192,9 @@ async def batch_create_models(
     
     # 提交所有成功的创建
     if created_models:
-        db.commit()
+        await db.commit()
     else:
-        db.rollback()
+        await db.rollback()
     
     return BatchCreateModelsResponse(
         created_count=len(created_models),
@@ -1,12 +1,13 @@
 """模型配置管理API"""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
 from pydantic import BaseModel
 import httpx
 import asyncio
 
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.models.model_config import (
     ModelConfigDB, ModelConfigCreate, ModelConfigUpdate, ModelConfigResponse
 )
@@ -194,17 +195,17 @@ class FetchModelsRequest(BaseModel):
 async def list_models(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取模型列表"""
-    models = db.query(ModelConfigDB).offset(skip).limit(limit).all()
+    models = (await db.scalars(select(ModelConfigDB).offset(skip).limit(limit))).all()
     return models
 
 
 @router.get("/{model_id}", response_model=ModelConfigResponse)
-async def get_model(model_id: int, db: Session = Depends(get_db)):
+async def get_model(model_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取单个模型配置"""
-    model = db.query(ModelConfigDB).filter(ModelConfigDB.id == model_id).first()
+    model = await db.get(ModelConfigDB, model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Model not found")
     return model
@@ -213,7 +214,7 @@ async def get_model(model_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=ModelConfigResponse, status_code=status.HTTP_201_CREATED)
 async def create_model(
     model_config: ModelConfigCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建模型配置"""
     # 验证API端点
@@ -221,7 +222,7 @@ async def create_model(
         raise HTTPException(status_code=400, detail="Invalid API endpoint")
     
     # 检查名称是否已存在
-    existing = db.query(ModelConfigDB).filter(ModelConfigDB.name == model_config.name).first()
+    existing = await db.scalar(select(ModelConfigDB).where(ModelConfigDB.name == model_config.name))
     if existing:
         raise HTTPException(status_code=400, detail="Model name already exists")
     
@@ -238,13 +239,17 @@ async def create_model(
         api_key=encrypted_key,
         model_name=model_config.model_name,
         default_params=model_config.default_params or {},
+        max_concurrency=model_config.max_concurrency,
+        rpm_limit=model_config.rpm_limit,
+        tpm_limit=model_config.tpm_limit,
+        resilience_policy=model_config.resilience_policy.model_dump(exclude_none=True) if model_config.resilience_policy else None,
         tags=model_config.tags,
         description=model_config.description
     )
     
     db.add(db_model)
-    db.commit()
-    db.refresh(db_model)
+    await db.commit()
+    await db.refresh(db_model)
     return db_model
 
 
@@ -252,10 +257,10 @@ async def create_model(
 async def update_model(
     model_id: int,
     model_config: ModelConfigUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新模型配置"""
-    db_model = db.query(ModelConfigDB).filter(ModelConfigDB.id == model_id).first()
+    db_model = await db.get(ModelConfigDB, model_id)
     if not db_model:
         raise HTTPException(status_code=404, detail="Model not found")
     
@@ -271,25 +276,31 @@ async def update_model(
     if "api_key" in update_data and update_data["api_key"]:
         update_data["api_key"] = encrypt_api_key(update_data["api_key"])
     
+    # 容错策略只保存显式设置的字段
+    if update_data.get("resilience_policy"):
+        update_data["resilience_policy"] = {
+            k: v for k, v in update_data["resilience_policy"].items() if v is not None
+        }
+    
     # default_params已经是字典，不需要额外处理
     
     for key, value in update_data.items():
         setattr(db_model, key, value)
     
-    db.commit()
-    db.refresh(db_model)
+    await db.commit()
+    await db.refresh(db_model)
     return db_model
 
 
 @router.delete("/{model_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_model(model_id: int, db: Session = Depends(get_db)):
+async def delete_model(model_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除模型配置"""
-    db_model = db.query(ModelConfigDB).filter(ModelConfigDB.id == model_id).first()
+    db_model = await db.get(ModelConfigDB, model_id)
     if not db_model:
         raise HTTPException(status_code=404, detail="Model not found")
     
-    db.delete(db_model)
-    db.commit()
+    await db.delete(db_model)
+    await db.commit()
     return None
 
 
@@ -320,7 +331,7 @@ async def get_preset_templates():
 @router.post("/quick-setup")
 async def quick_setup_models(
     request: QuickSetupRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """快速设置模型（从预设中批量创建）"""
     # 查找对应的预设模板
@@ -366,7 +377,7 @@ async def quick_setup_models(
             # 检查名称是否已存在，如果存在则添加序号
             counter = 1
             original_name = config_name
-            while db.query(ModelConfigDB).filter(ModelConfigDB.name == config_name).first():
+            while await db.scalar(select(ModelConfigDB).where(ModelConfigDB.name == config_name)):
                 config_name = f"{original_name} ({counter})"
                 counter += 1
             
@@ -392,7 +403,7 @@ async def quick_setup_models(
             )
             
             db.add(db_model)
-            db.flush()  # 获取ID但不提交
+            await db.flush()  # 获取ID但不提交
             
             created_models.append({
                 "id": db_model.id,
@@ -407,12 +418,12 @@ async def quick_setup_models(
     # 提交所有成功的创建
     if created_models:
         try:
-            db.commit()
+            await db.commit()
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=500, detail=f"Failed to save models: {str(e)}")
     else:
-        db.rollback()
+        await db.rollback()
     
     return {
         "success": True,
@@ -1,14 +1,15 @@
 """测试用例管理API"""
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import json
 import csv
 import io
 
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.models.test_case import (
-    TestCaseDB, TestCaseCreate, TestCaseUpdate, TestCaseResponse, TestCaseImport
+    TestCaseDB, TestCaseTagDB, TestCaseCreate, TestCaseUpdate, TestCaseResponse, TestCaseImport, parse_tags
 )
 
 router = APIRouter()
@@ -20,25 +21,31 @@ async def list_test_cases(
     limit: int = 100,
     category: str = None,
     tags: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取测试用例列表"""
-    query = db.query(TestCaseDB)
+    """获取测试用例列表（tags 为逗号分隔的标签，返回包含全部这些标签的测试用例）"""
+    query = select(TestCaseDB)
     
     if category:
-        query = query.filter(TestCaseDB.category == category)
+        query = query.where(TestCaseDB.category == category)
     
-    if tags:
-        query = query.filter(TestCaseDB.tags.contains(tags))
+    tag_list = parse_tags(tags)
+    if tag_list:
+        query = query.where(TestCaseDB.id.in_(
+            select(TestCaseTagDB.test_case_id)
+            .where(TestCaseTagDB.tag.in_(tag_list))
+            .group_by(TestCaseTagDB.test_case_id)
+            .having(func.count() == len(tag_list))
+        ))
     
-    test_cases = query.offset(skip).limit(limit).all()
+    test_cases = (await db.scalars(query.offset(skip).limit(limit))).all()
     return test_cases
 
 
 @router.get("/{test_case_id}", response_model=TestCaseResponse)
-async def get_test_case(test_case_id: int, db: Session = Depends(get_db)):
+async def get_test_case(test_case_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取单个测试用例"""
-    test_case = db.query(TestCaseDB).filter(TestCaseDB.id == test_case_id).first()
+    test_case = await db.get(TestCaseDB, test_case_id)
     if not test_case:
         raise HTTPException(status_code=404, detail="Test case not found")
     return test_case
@@ -47,7 +54,7 @@ async def get_test_case(test_case_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=TestCaseResponse, status_code=status.HTTP_201_CREATED)
 async def create_test_case(
     test_case: TestCaseCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建测试用例"""
     db_test_case = TestCaseDB(
@@ -67,8 +74,8 @@ async def create_test_case(
     )
     
     db.add(db_test_case)
-    db.commit()
-    db.refresh(db_test_case)
+    await db.commit()
+    await db.refresh(db_test_case)
     return db_test_case
 
 
@@ -76,10 +83,10 @@ async def create_test_case(
 async def update_test_case(
     test_case_id: int,
     test_case: TestCaseUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新测试用例"""
-    db_test_case = db.query(TestCaseDB).filter(TestCaseDB.id == test_case_id).first()
+    db_test_case = await db.get(TestCaseDB, test_case_id)
     if not db_test_case:
         raise HTTPException(status_code=404, detail="Test case not found")
     
@@ -87,27 +94,27 @@ async def update_test_case(
     for key, value in update_data.items():
         setattr(db_test_case, key, value)
     
-    db.commit()
-    db.refresh(db_test_case)
+    await db.commit()
+    await db.refresh(db_test_case)
     return db_test_case
 
 
 @router.delete("/{test_case_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_test_case(test_case_id: int, db: Session = Depends(get_db)):
+async def delete_test_case(test_case_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除测试用例"""
-    db_test_case = db.query(TestCaseDB).filter(TestCaseDB.id == test_case_id).first()
+    db_test_case = await db.get(TestCaseDB, test_case_id)
     if not db_test_case:
         raise HTTPException(status_code=404, detail="Test case not found")
     
-    db.delete(db_test_case)
-    db.commit()
+    await db.delete(db_test_case)
+    await db.commit()
     return None
 
 
 @router.post("/import", response_model=dict)
 async def import_test_cases(
     test_cases: TestCaseImport,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量导入测试用例（JSON格式）"""
     created_count = 0
@@ -117,7 +124,7 @@ async def import_test_cases(
         db.add(db_test_case)
         created_count += 1
     
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"Successfully imported {created_count} test cases",
@@ -128,7 +135,7 @@ async def import_test_cases(
 @router.post("/import/csv", response_model=dict)
 async def import_test_cases_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量导入测试用例（CSV格式）"""
     if not file.filename.endswith('.csv'):
@@ -151,7 +158,7 @@ async def import_test_cases_csv(
         db.add(db_test_case)
         created_count += 1
     
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"Successfully imported {created_count} test cases from CSV",
@@ -1,10 +1,11 @@
 """工具定义管理API"""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.models.tool_definition import (
     ToolDefinitionDB, ToolDefinitionCreate, ToolDefinitionUpdate, ToolDefinitionResponse
 )
@@ -15,6 +16,7 @@ from app.models.tool_mock_generation import (
 )
 from app.services.mock_tool_executor import MockToolExecutor
 from app.services.tool_mock_generator import ToolMockGeneratorService
+from app.services.tool_registry import ToolRegistry
 
 router = APIRouter()
 
@@ -24,22 +26,22 @@ async def list_tools(
     skip: int = 0,
     limit: int = 100,
     category: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取工具列表"""
-    query = db.query(ToolDefinitionDB)
+    query = select(ToolDefinitionDB)
     
     if category:
-        query = query.filter(ToolDefinitionDB.category == category)
+        query = query.where(ToolDefinitionDB.category == category)
     
-    tools = query.offset(skip).limit(limit).all()
+    tools = (await db.scalars(query.offset(skip).limit(limit))).all()
     return tools
 
 
 @router.get("/{tool_id}", response_model=ToolDefinitionResponse)
-async def get_tool(tool_id: int, db: Session = Depends(get_db)):
+async def get_tool(tool_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取单个工具定义"""
-    tool = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.id == tool_id).first()
+    tool = await db.get(ToolDefinitionDB, tool_id)
     if not tool:
         raise HTTPException(status_code=404, detail="Tool not found")
     return tool
@@ -48,11 +50,11 @@ async def get_tool(tool_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=ToolDefinitionResponse, status_code=status.HTTP_201_CREATED)
 async def create_tool(
     tool: ToolDefinitionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建工具定义"""
     # 检查名称是否已存在
-    existing = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.name == tool.name).first()
+    existing = await db.scalar(select(ToolDefinitionDB).where(ToolDefinitionDB.name == tool.name))
     if existing:
         raise HTTPException(status_code=400, detail="Tool name already exists")
     
@@ -67,8 +69,8 @@ async def create_tool(
     )
     
     db.add(db_tool)
-    db.commit()
-    db.refresh(db_tool)
+    await db.commit()
+    await db.refresh(db_tool)
     return db_tool
 
 
@@ -76,10 +78,10 @@ async def create_tool(
 async def update_tool(
     tool_id: int,
     tool: ToolDefinitionUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新工具定义"""
-    db_tool = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.id == tool_id).first()
+    db_tool = await db.get(ToolDefinitionDB, tool_id)
     if not db_tool:
         raise HTTPException(status_code=404, detail="Tool not found")
     
@@ -88,7 +90,7 @@ async def update_tool(
     
     # 如果更新名称，检查是否重复
     if "name" in update_data and update_data["name"] != db_tool.name:
-        existing = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.name == update_data["name"]).first()
+        existing = await db.scalar(select(ToolDefinitionDB).where(ToolDefinitionDB.name == update_data["name"]))
         if existing:
             raise HTTPException(status_code=400, detail="Tool name already exists")
     
@@ -102,8 +104,9 @@ async def update_tool(
     for key, value in update_data.items():
         setattr(db_tool, key, value)
     
-    db.commit()
-    db.refresh(db_tool)
+    await db.commit()
+    await db.refresh(db_tool)
+    ToolRegistry.invalidate(tool_id)
     return db_tool
 
 
@@ -111,15 +114,15 @@ async def update_tool(
 async def generate_mock_config(
     tool_id: int,
     request: ToolMockGenerationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """使用大模型生成指定工具的 mock 配置"""
 
-    db_tool = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.id == tool_id).first()
+    db_tool = await db.get(ToolDefinitionDB, tool_id)
     if not db_tool:
         raise HTTPException(status_code=404, detail="Tool not found")
 
-    model = db.query(ModelConfigDB).filter(ModelConfigDB.id == request.model_id).first()
+    model = await db.get(ModelConfigDB, request.model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Model config not found")
 
@@ -133,36 +136,38 @@ async def generate_mock_config(
 
     if result.status == "success" and request.persist:
         db_tool.mock_responses = result.mock_config
-        db.commit()
-        db.refresh(db_tool)
+        await db.commit()
+        await db.refresh(db_tool)
+        ToolRegistry.invalidate(tool_id)
         result = result.model_copy(update={"saved": True})
 
     return result
 
 
 @router.delete("/{tool_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_tool(tool_id: int, db: Session = Depends(get_db)):
+async def delete_tool(tool_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除工具定义"""
-    db_tool = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.id == tool_id).first()
+    db_tool = await db.get(ToolDefinitionDB, tool_id)
     if not db_tool:
         raise HTTPException(status_code=404, detail="Tool not found")
     
-    db.delete(db_tool)
-    db.commit()
+    await db.delete(db_tool)
+    await db.commit()
+    ToolRegistry.invalidate(tool_id)
     return None
 
 
 @router.get("/categories/list")
-async def get_categories(db: Session = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_async_db)):
     """获取所有工具分类"""
-    categories = db.query(ToolDefinitionDB.category).distinct().all()
+    categories = (await db.execute(select(ToolDefinitionDB.category).distinct())).all()
     return [cat[0] for cat in categories if cat[0]]
 
 
 @router.post("/batch-import")
 async def batch_import_tools(
     tools: List[ToolDefinitionCreate],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量导入工具定义"""
     result = {
@@ -177,9 +182,9 @@ async def batch_import_tools(
     for tool_data in tools:
         try:
             # 检查名称是否已存在
-            existing = db.query(ToolDefinitionDB).filter(
+            existing = await db.scalar(select(ToolDefinitionDB).where(
                 ToolDefinitionDB.name == tool_data.name
-            ).first()
+            ))
             
             if existing:
                 result["skipped"] += 1
@@ -200,7 +205,7 @@ async def batch_import_tools(
             )
             
             db.add(db_tool)
-            db.flush()  # 获取ID但不提交
+            await db.flush()  # 获取ID但不提交
             
             result["created"] += 1
             result["created_tools"].append({
@@ -217,7 +222,7 @@ async def batch_import_tools(
     
     # 如果有成功创建的，提交事务
     if result["created"] > 0:
-        db.commit()
+        await db.commit()
     
     return result
 
@@ -225,7 +230,7 @@ async def batch_import_tools(
 @router.post("/batch", status_code=status.HTTP_201_CREATED)
 async def batch_import_tools(
     tools: List[ToolDefinitionCreate],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量导入工具定义"""
     created_tools = []
@@ -235,7 +240,7 @@ async def batch_import_tools(
     for tool in tools:
         try:
             # 检查名称是否已存在
-            existing = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.name == tool.name).first()
+            existing = await db.scalar(select(ToolDefinitionDB).where(ToolDefinitionDB.name == tool.name))
             if existing:
                 skipped_tools.append({
                     "name": tool.name,
@@ -254,7 +259,7 @@ async def batch_import_tools(
             )
             
             db.add(db_tool)
-            db.flush()  # 获取ID但不提交
+            await db.flush()  # 获取ID但不提交
             created_tools.append({
                 "id": db_tool.id,
                 "name": db_tool.name
@@ -267,7 +272,7 @@ async def batch_import_tools(
     
     # 提交所有成功的创建
     if created_tools:
-        db.commit()
+        await db.commit()
     
     return {
         "created": len(created_tools),
@@ -282,7 +287,7 @@ async def batch_import_tools(
 @router.post("/batch", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def batch_import_tools(
     tools: List[ToolDefinitionCreate],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量导入工具定义
     
@@ -296,7 +301,7 @@ async def batch_import_tools(
     for idx, tool in enumerate(tools):
         try:
             # 检查名称是否已存在
-            existing = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.name == tool.name).first()
+            existing = await db.scalar(select(ToolDefinitionDB).where(ToolDefinitionDB.name == tool.name))
             if existing:
                 failed_count += 1
                 errors.append({
@@ -317,7 +322,7 @@ async def batch_import_tools(
             )
             
             db.add(db_tool)
-            db.flush()  # 获取ID但不提交
+            await db.flush()  # 获取ID但不提交
             created_tools.append({
                 "id": db_tool.id,
                 "name": db_tool.name
@@ -333,7 +338,7 @@ async def batch_import_tools(
             })
     
     # 提交所有成功的记录
-    db.commit()
+    await db.commit()
     
     return {
         "success_count": success_count,
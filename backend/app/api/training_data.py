@@ -1,19 +1,21 @@
 """训练数据生成和导出API"""
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import json
 import io
 from datetime import datetime
 
-from app.utils.database import get_db
+from app.utils.database import get_async_db
 from app.models.test_case import TestCaseDB
 from app.models.tool_definition import ToolDefinitionDB
 from app.models.model_config import ModelConfigDB
 from app.services.llm_service import LLMService
 from app.services.mock_tool_executor import MockToolExecutor
+from app.services.tool_registry import ToolRegistry
 
 router = APIRouter()
 
@@ -36,7 +38,7 @@ class TrainingSample(BaseModel):
 @router.post("/generate")
 async def generate_training_data(
     request: TrainingDataRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     生成训练数据
@@ -45,18 +47,20 @@ async def generate_training_data(
     生成用于Agent训练的数据集
     """
     # 获取模型配置
-    model_config = db.query(ModelConfigDB).filter(ModelConfigDB.id == request.model_id).first()
+    model_config = await db.get(ModelConfigDB, request.model_id)
     if not model_config:
         raise HTTPException(status_code=404, detail="Model not found")
     
     # 获取测试用例
-    test_cases = db.query(TestCaseDB).filter(TestCaseDB.id.in_(request.test_case_ids)).all()
+    test_cases = (await db.scalars(select(TestCaseDB).where(TestCaseDB.id.in_(request.test_case_ids)))).all()
     if not test_cases:
         raise HTTPException(status_code=404, detail="No test cases found")
     
     training_samples = []
+    # 一次解析全部测试用例的工具定义
+    toolsets = await db.run_sync(ToolRegistry.resolve_many, [test_case.tools for test_case in test_cases])
     
-    for test_case in test_cases:
+    for test_case, (tools, tool_definitions_dict) in zip(test_cases, toolsets):
         try:
             # 构建消息列表
             messages = []
@@ -78,30 +82,6 @@ async def generate_training_data(
                 "content": test_case.prompt
             })
             
-            # 加载工具定义
-            tools = None
-            tool_definitions_dict = {}
-            if test_case.tools:
-                tool_definitions = db.query(ToolDefinitionDB).filter(
-                    ToolDefinitionDB.id.in_(test_case.tools)
-                ).all()
-                
-                tools = [
-                    {
-                        "type": "function",
-                        "function": {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "parameters": tool.parameters
-                        }
-                    }
-                    for tool in tool_definitions
-                ]
-                
-                tool_definitions_dict = {
-                    tool.name: tool.mock_responses for tool in tool_definitions
-                }
-            
             # 调用LLM获取响应
             result = await LLMService.call_model(
                 model_config=model_config,
@@ -127,9 +107,11 @@ async def generate_training_data(
                 
                 # 如果需要模拟工具执行
                 if request.include_mock_results and (test_case.use_mock or True):
-                    mock_results = MockToolExecutor.execute_multiple_tool_calls(
+                    # 训练数据只需要模拟结果，不需要真实等待模拟延迟
+                    mock_results = await MockToolExecutor.execute_multiple_tool_calls_async(
                         result["tool_calls"],
-                        tool_definitions_dict
+                        tool_definitions_dict,
+                        virtual_clock=True
                     )
                     
                     # 添加工具结果到消息中
@@ -179,7 +161,7 @@ async def generate_training_data(
 @router.post("/export")
 async def export_training_data(
     request: TrainingDataRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     导出训练数据为指定格式的文件
@@ -313,18 +295,22 @@ def _export_csv_format(training_data: Dict[str, Any]) -> str:
 
 
 @router.get("/stats")
-async def get_training_stats(db: Session = Depends(get_db)):
+async def get_training_stats(db: AsyncSession = Depends(get_async_db)):
     """获取训练数据统计信息"""
-    total_test_cases = db.query(TestCaseDB).count()
-    mock_enabled_cases = db.query(TestCaseDB).filter(TestCaseDB.use_mock == True).count()
-    cases_with_tools = db.query(TestCaseDB).filter(TestCaseDB.tools != None).count()
+    total_test_cases, mock_enabled_cases, cases_with_tools = (await db.execute(select(
+        func.count(TestCaseDB.id),
+        func.count(case((TestCaseDB.use_mock == True, 1))),
+        func.count(case((TestCaseDB.tools != None, 1)))
+    ))).one()
+    total_tools, tools_with_mock = (await db.execute(select(
+        func.count(ToolDefinitionDB.id),
+        func.count(case((ToolDefinitionDB.mock_responses != None, 1)))
+    ))).one()
     
     return {
         "total_test_cases": total_test_cases,
         "mock_enabled_cases": mock_enabled_cases,
         "cases_with_tools": cases_with_tools,
-        "total_tools": db.query(ToolDefinitionDB).count(),
-        "tools_with_mock": db.query(ToolDefinitionDB).filter(
-            ToolDefinitionDB.mock_responses != None
-        ).count()
+        "total_tools": total_tools,
+        "tools_with_mock": tools_with_mock
     }
@@ -21,8 +21,86 @@ class Settings(BaseSettings):
     BASE_DIR: Path = Path(__file__).parent.parent
     DATA_DIR: Path = BASE_DIR / "data"
     DATABASE_URL: str = f"sqlite:///{DATA_DIR}/models.db"
+    ASYNC_DATABASE_URL: Optional[str] = None  # API 使用的异步驱动 URL，为空时根据 DATABASE_URL 推导（sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg）
     RESULTS_DIR: Path = DATA_DIR / "results"
     
+    # 连接池配置（PostgreSQL 等服务端数据库；SQLite 忽略）。每个 API/worker 进程的同步、异步引擎各有一个连接池
+    DATABASE_POOL_SIZE: int = 5  # 常驻连接数
+    DATABASE_MAX_OVERFLOW: int = 10  # 高峰时额外允许的连接数
+    DATABASE_POOL_TIMEOUT: int = 30  # 连接池耗尽时等待空闲连接的时间(秒)
+    DATABASE_POOL_RECYCLE: int = 1800  # 连接最长复用时间(秒)，避免被数据库或中间代理断开的陈旧连接
+    
+    MIGRATION_CHUNK_SIZE: int = 5000  # 迁移改写大表时每个事务处理的行数
+    
+    # SQLite 调优（每个连接建立时执行 PRAGMA，其他数据库忽略）
+    SQLITE_TUNING_ENABLED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL 模式下读写并发，写入结果时不阻塞页面查询
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL 下使用 NORMAL 即可保证数据库不损坏
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 写锁冲突时的等待时间(毫秒)，超时才报 database is locked
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 每个连接的页缓存大小(KiB)
+    SQLITE_MMAP_SIZE_MB: int = 256  # 内存映射读取的大小(MB)，0 表示关闭
+    
+    # 批量测试并发配置
+    BATCH_MAX_CONCURRENCY: int = 8  # 每个 worker 进程跨所有批次的全局最大并发调用数（单批次上限由请求的 max_concurrency 指定）
+    BATCH_MODEL_CONCURRENCY: int = 4  # 模型未配置 max_concurrency 时的默认单模型并发数（按 worker 进程计，N 个 worker 对同一模型最多 N 倍并发）
+    BATCH_INPROCESS_WORKER: bool = True  # 在 API 进程内运行 worker（多 worker 部署时关闭，改用 python -m app.worker）
+    BATCH_LEASE_SECONDS: int = 120  # 组合租约时长，worker 失联超过此时间后组合可被重新领取
+    BATCH_WORKER_POLL_INTERVAL: float = 2.0  # worker 空闲时轮询新组合的间隔(秒)
+    BATCH_PROGRESS_INTERVAL: float = 1.0  # 批次进度流读取增量状态的间隔(秒)
+    BATCH_PASS_SCORE: float = 0.6  # 多次采样时单次采样视为通过的最低得分（0-1，用于 pass@k）
+    BATCH_REUSE_MAX_AGE_HOURS: int = 168  # 增量重跑时可复用结果的最长时间(小时)，0 表示不限
+    BATCH_ADAPTIVE_CONFIDENCE: float = 0.95  # 自适应早停的置信水平
+    BATCH_ADAPTIVE_MIN_CASES: int = 5  # 自适应早停前每个模型至少完成的用例数
+    BATCH_WRITE_INTERVAL: float = 0.1  # 结果写入的最长攒批时间(秒)，期间完成的结果在同一个事务中提交，0 表示不等待
+    BATCH_WRITE_MAX_ITEMS: int = 100  # 单个写入事务最多包含的结果数
+    
+    # 模型调用连接池配置
+    HTTP_MAX_CONNECTIONS: int = 100  # 每个连接池的最大连接数
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 每个连接池保持的空闲长连接数
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 空闲长连接过期时间(秒)
+    HTTP_CONNECT_TIMEOUT: float = 10.0  # 建立连接超时(秒)
+    HTTP_TIMEOUT: float = 120.0  # 默认请求超时(秒)
+    HTTP2_ENABLED: bool = False  # 启用HTTP/2（需要安装 httpx[http2]）
+    
+    # 限流配置（RPM/TPM预算在模型配置中设置）
+    RATE_LIMIT_BURST_SECONDS: float = 10.0  # RPM令牌桶允许的突发量（按秒数折算）
+    RATE_LIMIT_MAX_RETRIES: int = 5  # 遇到429时的最大重试次数
+    RATE_LIMIT_DECREASE_FACTOR: float = 0.5  # 遇到429时速率乘以该系数
+    RATE_LIMIT_RECOVERY_STEP: float = 0.05  # 每次成功后速率恢复的比例
+    RATE_LIMIT_MIN_FACTOR: float = 0.1  # 速率最低降至配置值的比例
+    RATE_LIMIT_DEFAULT_BACKOFF: float = 2.0  # 无 Retry-After 时的初始冷却时间(秒)
+    RATE_LIMIT_MAX_BACKOFF: float = 60.0  # 单次冷却时间上限(秒)
+    
+    # 容错策略默认值（可在模型配置的 resilience_policy 中覆盖）
+    RETRY_MAX_RETRIES: int = 2  # 瞬时错误（超时、连接失败、5xx）的最大重试次数
+    RETRY_BASE_DELAY: float = 0.5  # 指数退避的初始等待(秒)
+    RETRY_MAX_DELAY: float = 8.0  # 单次退避等待上限(秒)
+    CALL_DEADLINE: Optional[float] = None  # 单次调用（含重试和Agent多轮迭代）的整体截止时间(秒)
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续失败多少次后打开熔断
+    CIRCUIT_RECOVERY_TIME: float = 30.0  # 熔断打开后多久放行探测请求(秒)
+    
+    # 响应缓存配置（也可在单次请求中通过 use_cache 开启）
+    LLM_CACHE_ENABLED: bool = False  # 默认是否启用响应缓存
+    LLM_CACHE_PATH: Path = DATA_DIR / "llm_cache.db"  # 缓存数据库文件
+    LLM_CACHE_TTL: int = 7 * 24 * 3600  # 缓存有效期(秒)，0表示永不过期
+    LLM_CACHE_MAX_ENTRIES: int = 10000  # 最大缓存条目数
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 缓存总大小上限(字节)
+    LLM_CACHE_DETERMINISTIC_ONLY: bool = True  # 只缓存 temperature=0 的调用
+    
+    # Mock 工具配置
+    MOCK_VIRTUAL_CLOCK: bool = False  # 虚拟时钟：只记录模拟延迟，不实际等待
+    
+    # Agent 配置
+    AGENT_MAX_PARALLEL_TOOLS: int = 4  # 同一轮工具调用的最大并行数
+    
+    # 流式配置
+    STREAM_INCLUDE_USAGE: bool = False  # 流式请求附带 stream_options.include_usage（端点需支持）
+    
+    # 压测配置
+    BENCHMARK_REQUESTS_PER_WORKER: int = 4  # 每个并发级别默认请求数 = 并发数 × 此值
+    BENCHMARK_SATURATION_GAIN: float = 0.1  # 吞吐提升低于此比例视为饱和
+    BENCHMARK_MAX_ERROR_RATE: float = 0.05  # 错误率超过此值视为饱和
+    
     # CORS配置
     CORS_ORIGINS: list = ["http://localhost:8000", "http://127.0.0.1:8000"]
     
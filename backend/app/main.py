@@ -5,10 +5,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import uvicorn
+import asyncio
 import logging
 
 from app.config import settings
-from app.utils.database import init_db
+from app.utils.database import init_db, engine, async_engine
+from app.utils.migrations import current_version
+from app.services.client_pool import ClientPool
+from app.services.batch_worker import BatchWorker
 from app.api import models, testcases, debug, batch, tools, vl, system_prompts, training_data
 
 # 配置日志
@@ -30,11 +34,20 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info(f"🚀 {settings.APP_NAME} v{settings.APP_VERSION} starting...")
     init_db()
-    logger.info(f"✅ Database initialized at {settings.DATABASE_URL}")
+    logger.info(f"✅ Database initialized at {settings.DATABASE_URL} (schema version {current_version(engine)})")
     logger.info(f"📁 Results directory: {settings.RESULTS_DIR}")
+    worker_task = None
+    if settings.BATCH_INPROCESS_WORKER:
+        # 进程内 worker；多 worker 部署时关闭此项，改为运行 python -m app.worker
+        worker_task = asyncio.create_task(BatchWorker().run())
     yield
     # Shutdown
     logger.info("Shutting down...")
+    if worker_task is not None:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+    await ClientPool.close_all()
+    await async_engine.dispose()
 
 
 # 创建FastAPI应用
@@ -0,0 +1,110 @@
+"""批量测试任务数据模型 - 持久化的批次与组合队列"""
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, JSON, ForeignKey, Index
+from sqlalchemy.sql import func
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+
+from app.utils.database import Base
+
+
+# 组合状态
+ITEM_PENDING = "pending"
+ITEM_RUNNING = "running"
+ITEM_DONE = "done"
+ITEM_FAILED = "failed"
+ITEM_CANCELLED = "cancelled"
+ITEM_SKIPPED = "skipped"  # 自适应早停跳过
+
+# 批次状态
+BATCH_PENDING = "pending"
+BATCH_RUNNING = "running"
+BATCH_PAUSED = "paused"
+BATCH_COMPLETED = "completed"
+BATCH_FAILED = "failed"
+BATCH_CANCELLED = "cancelled"
+
+
+# SQLAlchemy ORM模型
+class BatchDB(Base):
+    """批量测试批次"""
+    __tablename__ = "batches"
+    __table_args__ = (
+        Index("ix_batches_created_at", "created_at"),
+    )
+
+    id = Column(String(64), primary_key=True)  # batch_YYYYmmdd_HHMMSS_<随机后缀>
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, running, paused, completed, failed, cancelled
+    priority = Column(Integer, nullable=False, default=0)  # 数值越大越先调度
+    model_ids = Column(JSON, nullable=False)
+    test_case_ids = Column(JSON, nullable=False)
+    params = Column(JSON)  # 覆盖模型参数
+    options = Column(JSON)  # 执行选项：max_concurrency, use_cache, virtual_clock, force_stream, n_samples, adaptive ...
+    total_items = Column(Integer, default=0)
+    # 汇总计数（结果写入时增量更新，历史记录直接读取）
+    done_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    cancelled_items = Column(Integer, nullable=False, default=0)
+    skipped_items = Column(Integer, nullable=False, default=0)
+    scored_items = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    early_stopping = Column(JSON)  # 自适应早停决策：领先模型、各模型得分区间、是否停止
+    error_message = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class BatchItemDB(Base):
+    """批次中的单个 (测试用例, 模型) 组合"""
+    __tablename__ = "batch_items"
+    __table_args__ = (
+        Index("ix_batch_items_batch_status", "batch_id", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String(64), ForeignKey("batches.id"), nullable=False)
+    position = Column(Integer, nullable=False)  # 在批次中的顺序
+    test_case_id = Column(Integer, ForeignKey("test_cases.id"), nullable=False)
+    model_id = Column(Integer, ForeignKey("models.id"), nullable=False)
+    status = Column(String(20), nullable=False, default=ITEM_PENDING)  # pending, running, done, failed, cancelled, skipped
+    result_id = Column(Integer, ForeignKey("test_results.id"))
+    attempts = Column(Integer, default=0)
+    lease_owner = Column(String(128))  # 领取该组合的 worker
+    lease_expires_at = Column(DateTime)  # 租约到期后其他 worker 可以重新领取
+    error_message = Column(Text)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+# Pydantic模型
+class BatchStatusResponse(BaseModel):
+    """批次状态响应"""
+    model_config = {"protected_namespaces": ()}
+
+    id: str
+    status: str
+    priority: int = 0
+    model_ids: List[int]
+    test_case_ids: List[int]
+    total_items: int
+    counts: Dict[str, int]
+    early_stopping: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class BatchHistoryEntry(BaseModel):
+    """批次历史记录"""
+    batch_id: str
+    timestamp: Optional[datetime] = None
+    status: str
+    priority: int = 0
+    models: List[Dict[str, Any]]
+    test_cases: List[Dict[str, Any]]
+    total_tests: int
+    counts: Dict[str, int]
+    score_mean: Optional[float] = None
+    finished_at: Optional[datetime] = None
@@ -20,6 +20,10 @@ class ModelConfigDB(Base):
     api_key = Column(Text)  # 加密存储
     model_name = Column(String(100), nullable=False)
     default_params = Column(JSON)  # temperature, top_p, max_tokens等
+    max_concurrency = Column(Integer)  # 单个 worker 进程内的单模型最大并发请求数（为空时使用全局默认值）
+    rpm_limit = Column(Integer)  # 每分钟请求数上限（为空时不限制）
+    tpm_limit = Column(Integer)  # 每分钟token数上限（为空时不限制）
+    resilience_policy = Column(JSON)  # 重试/超时/熔断策略（为空时使用全局默认值）
     tags = Column(String(200))
     description = Column(Text)
     created_at = Column(DateTime, default=func.now())
@@ -38,6 +42,17 @@ class ModelParams(BaseModel):
     presence_penalty: float = Field(default=0, ge=-2, le=2)
 
 
+class ResiliencePolicy(BaseModel):
+    """模型调用容错策略（字段为空时使用全局默认值）"""
+    max_retries: Optional[int] = Field(None, ge=0, le=10, description="瞬时错误最大重试次数")
+    base_delay: Optional[float] = Field(None, ge=0, description="指数退避初始等待(秒)")
+    max_delay: Optional[float] = Field(None, ge=0, description="单次退避等待上限(秒)")
+    timeout: Optional[float] = Field(None, gt=0, description="单次请求超时(秒)")
+    deadline: Optional[float] = Field(None, gt=0, description="整体截止时间，含重试和Agent多轮迭代(秒)")
+    failure_threshold: Optional[int] = Field(None, ge=1, description="连续失败多少次后熔断")
+    recovery_time: Optional[float] = Field(None, gt=0, description="熔断后多久放行探测请求(秒)")
+
+
 class ModelConfigCreate(BaseModel):
     """创建模型配置"""
     model_config = {"protected_namespaces": ()}
@@ -48,6 +63,10 @@ class ModelConfigCreate(BaseModel):
     api_key: Optional[str] = None
     model_name: str = Field(..., min_length=1)
     default_params: Optional[Dict[str, Any]] = None
+    max_concurrency: Optional[int] = Field(None, ge=1, description="单模型最大并发请求数（按 worker 进程计，多 worker 时成倍增加）")
+    rpm_limit: Optional[int] = Field(None, ge=1, description="每分钟请求数上限")
+    tpm_limit: Optional[int] = Field(None, ge=1, description="每分钟token数上限")
+    resilience_policy: Optional[ResiliencePolicy] = None
     tags: Optional[str] = None
     description: Optional[str] = None
 
@@ -62,6 +81,10 @@ class ModelConfigUpdate(BaseModel):
     api_key: Optional[str] = None
     model_name: Optional[str] = None
     default_params: Optional[Dict[str, Any]] = None
+    max_concurrency: Optional[int] = Field(None, ge=1, description="单模型最大并发请求数（按 worker 进程计，多 worker 时成倍增加）")
+    rpm_limit: Optional[int] = Field(None, ge=1, description="每分钟请求数上限")
+    tpm_limit: Optional[int] = Field(None, ge=1, description="每分钟token数上限")
+    resilience_policy: Optional[ResiliencePolicy] = None
     tags: Optional[str] = None
     description: Optional[str] = None
 
@@ -76,6 +99,10 @@ class ModelConfigResponse(BaseModel):
     api_endpoint: Optional[str]
     model_name: str
     default_params: Dict[str, Any]
+    max_concurrency: Optional[int] = None
+    rpm_limit: Optional[int] = None
+    tpm_limit: Optional[int] = None
+    resilience_policy: Optional[Dict[str, Any]] = None
     tags: Optional[str]
     description: Optional[str]
     created_at: datetime
@@ -1,11 +1,14 @@
 """测试用例数据模型"""
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Boolean
+import re
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Boolean, ForeignKey, event, delete, insert, inspect
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
-from app.utils.database import Base
+from app.utils.database import Base, JSONVariant
 
 
 # SQLAlchemy ORM模型
@@ -18,19 +21,52 @@ class TestCaseDB(Base):
     category = Column(String(50))
     prompt = Column(Text, nullable=False)
     system_prompt = Column(Text)  # 系统提示词
-    conversation_history = Column(JSON)  # 多轮对话历史 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]
+    conversation_history = Column(JSONVariant)  # 多轮对话历史 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]
     expected_output = Column(Text)
     evaluation_criteria = Column(JSON)  # 评估标准
-    tools = Column(JSON)  # 关联的工具ID列表
+    tools = Column(JSONVariant)  # 关联的工具ID列表
     expected_tool_calls = Column(JSON)  # 期望的工具调用（用于评估）
     evaluation_weights = Column(JSON)  # 评分权重配置 {tool_calls: 70, text_similarity: 20, custom_criteria: 10}
     use_mock = Column(Boolean, default=False)  # 是否使用模拟工具执行
-    tags = Column(String(200))
+    tags = Column(String(200))  # 逗号分隔，同步到 test_case_tags 表用于按标签查询
     meta_data = Column(JSON)  # 其他元数据
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
 
+class TestCaseTagDB(Base):
+    """测试用例标签（由 TestCaseDB.tags 自动同步，按标签过滤时走 tag 索引）"""
+    __tablename__ = "test_case_tags"
+
+    test_case_id = Column(Integer, ForeignKey("test_cases.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(50), primary_key=True, index=True)
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """拆分逗号分隔的标签（支持中文逗号），去除空白和重复项"""
+    if not tags:
+        return []
+    return list(dict.fromkeys(t.strip() for t in re.split(r"[,，]", tags) if t.strip()))
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_test_case_tags(session, flush_context):
+    """测试用例新增、修改 tags 或删除时同步 test_case_tags（同步和异步会话都会触发）"""
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, TestCaseDB) and obj.id is not None and inspect(obj).attrs.tags.history.has_changes()
+    ]
+    removed = [obj.id for obj in session.deleted if isinstance(obj, TestCaseDB)]
+    stale = [obj.id for obj in changed] + removed
+    if not stale:
+        return
+    connection = session.connection()
+    connection.execute(delete(TestCaseTagDB).where(TestCaseTagDB.test_case_id.in_(stale)))
+    rows = [{"test_case_id": obj.id, "tag": tag} for obj in changed for tag in parse_tags(obj.tags)]
+    if rows:
+        connection.execute(insert(TestCaseTagDB), rows)
+
+
 # Pydantic模型
 class TestCaseCreate(BaseModel):
     """创建测试用例"""
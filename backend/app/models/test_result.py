@@ -1,26 +1,51 @@
 """测试结果数据模型"""
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 
-from app.utils.database import Base
+from app.utils.database import Base, JSONVariant
 
 
 # SQLAlchemy ORM模型
 class TestResultDB(Base):
     """测试结果数据库模型"""
     __tablename__ = "test_results"
+    __table_args__ = (
+        # 多模型对比：按 测试用例 IN (...) 和 模型 IN (...) 过滤、按 (测试用例, 模型) 取最新结果
+        Index("ix_test_results_case_model", "test_case_id", "model_id"),
+        # 按执行时间排序的结果列表
+        Index("ix_test_results_executed_at", "executed_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     test_case_id = Column(Integer, ForeignKey("test_cases.id"), nullable=False)
     model_id = Column(Integer, ForeignKey("models.id"), nullable=False)
     output = Column(Text, nullable=False)
-    metrics = Column(JSON)  # 性能指标
+    metrics = Column(JSONVariant)  # 性能指标
     score = Column(Float)  # 评分
     status = Column(String(20))  # success, error, timeout
     error_message = Column(Text)
+    fingerprint = Column(String(64), index=True)  # 输入内容指纹（提示词、系统提示、历史、工具、模型、参数），用于增量重跑
+    executed_at = Column(DateTime, default=func.now())
+
+
+class TestResultSampleDB(Base):
+    """多次采样时每次采样的结果（test_results 中保存汇总统计）"""
+    __tablename__ = "test_result_samples"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    result_id = Column(Integer, ForeignKey("test_results.id"), nullable=False, index=True)
+    sample_index = Column(Integer, nullable=False)
+    output = Column(Text, nullable=False)
+    status = Column(String(20))
+    score = Column(Float)
+    passed = Column(Boolean, nullable=False, default=False)  # 是否通过（用于 pass@k）
+    response_time = Column(Float)
+    total_tokens = Column(Integer)
+    metrics = Column(JSONVariant)
+    error_message = Column(Text)
     executed_at = Column(DateTime, default=func.now())
 
 
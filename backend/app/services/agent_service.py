@@ -1,10 +1,14 @@
 """Agent服务 - 支持完整的工具调用闭环"""
+import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+import time
+from typing import Dict, Any, Optional, List, Tuple, AsyncGenerator
+from app.config import settings
 from app.models.model_config import ModelConfigDB
 from app.services.llm_service import LLMService
 from app.services.mock_tool_executor import MockToolExecutor
+from app.services.resilience import Deadline, resolve_policy
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +26,11 @@ class AgentService:
         tools_config: Optional[Dict[str, Dict[str, Any]]] = None,
         conversation_history: Optional[List[Dict[str, Any]]] = None,
         use_mock: bool = False,
-        max_iterations: int = 5
+        max_iterations: int = 5,
+        deadline: Optional[float] = None,
+        use_cache: Optional[bool] = None,
+        virtual_clock: Optional[bool] = None,
+        max_parallel_tools: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         运行 Agent，支持多轮工具调用
@@ -37,14 +45,42 @@ class AgentService:
             conversation_history: 对话历史
             use_mock: 是否使用模拟工具执行
             max_iterations: 最大迭代次数（防止无限循环）
+            deadline: 整体截止时间(秒)，在所有迭代的模型调用之间共享；为空时使用模型容错策略
+            use_cache: 是否使用响应缓存（为空时使用全局配置）
+            virtual_clock: Mock 工具虚拟时钟，只记录模拟延迟不实际等待（为空时使用全局配置）
+            max_parallel_tools: 同一轮工具调用的最大并行数（为空时使用全局配置）
         
         Returns:
             包含最终输出、指标、工具调用历史等信息的字典
         """
+        with Deadline.scope(deadline or resolve_policy(model_config).deadline):
+            return await AgentService._run_agent_loop(
+                model_config, content, system_prompt, params, tools, tools_config,
+                conversation_history, use_mock, max_iterations, use_cache,
+                settings.MOCK_VIRTUAL_CLOCK if virtual_clock is None else virtual_clock,
+                max_parallel_tools or settings.AGENT_MAX_PARALLEL_TOOLS
+            )
+    
+    @staticmethod
+    async def _run_agent_loop(
+        model_config: ModelConfigDB,
+        content: list,
+        system_prompt: Optional[str],
+        params: Optional[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        tools_config: Optional[Dict[str, Dict[str, Any]]],
+        conversation_history: Optional[List[Dict[str, Any]]],
+        use_mock: bool,
+        max_iterations: int,
+        use_cache: Optional[bool] = None,
+        virtual_clock: bool = False,
+        max_parallel_tools: int = 1
+    ) -> Dict[str, Any]:
+        """Agent 迭代主循环"""
         logger.info("=" * 80)
         logger.info("🤖 启动 Agent 运行")
         logger.info(f"模型: {model_config.name}")
-        logger.info(f"Mock模式: {use_mock}")
+        logger.info(f"Mock模式: {use_mock}{'（虚拟时钟）' if use_mock and virtual_clock else ''}")
         logger.info(f"最大迭代: {max_iterations}")
         
         # 构建消息历史
@@ -65,6 +101,10 @@ class AgentService:
         total_prompt_tokens = 0
         total_completion_tokens = 0
         total_cost = 0.0
+        cache_hits = 0
+        cache_misses = 0
+        simulated_tool_latency_ms = 0
+        tool_execution_time = 0.0
         
         # 迭代执行
         for iteration in range(max_iterations):
@@ -80,7 +120,8 @@ class AgentService:
                 params=params,
                 tools=tools,
                 conversation_history=messages[:-1] if iteration == 0 else messages,
-                stream=False
+                stream=False,
+                use_cache=use_cache
             )
             
             # 累计指标
@@ -88,6 +129,9 @@ class AgentService:
             total_prompt_tokens += metrics.get("prompt_tokens", 0)
             total_completion_tokens += metrics.get("completion_tokens", 0)
             total_cost += metrics.get("estimated_cost", 0)
+            if "cache_hit" in metrics:
+                cache_hits += 1 if metrics["cache_hit"] else 0
+                cache_misses += 0 if metrics["cache_hit"] else 1
             
             # 检查是否有工具调用
             tool_calls = result.get("tool_calls")
@@ -112,7 +156,11 @@ class AgentService:
                         "total_completion_tokens": total_completion_tokens,
                         "total_tokens": total_prompt_tokens + total_completion_tokens,
                         "estimated_cost": total_cost,
-                        "response_time": metrics.get("response_time", 0)
+                        "response_time": metrics.get("response_time", 0),
+                        "cache_hits": cache_hits,
+                        "cache_misses": cache_misses,
+                        "simulated_tool_latency_ms": simulated_tool_latency_ms,
+                        "tool_execution_time": tool_execution_time
                     },
                     "status": result.get("status", "success"),
                     "tool_call_history": tool_call_history,
@@ -131,55 +179,22 @@ class AgentService:
             }
             messages.append(assistant_message)
             
-            # 执行工具调用
-            tool_results = []
-            for tool_call in tool_calls:
-                function_info = tool_call.get("function", {})
-                tool_name = function_info.get("name")
-                tool_call_id = tool_call.get("id")
-                
-                logger.info(f"  🔨 执行工具: {tool_name}")
-                
-                # 解析参数
-                arguments_str = function_info.get("arguments", "{}")
-                try:
-                    arguments = json.loads(arguments_str) if isinstance(arguments_str, str) else arguments_str
-                except json.JSONDecodeError:
-                    logger.error(f"❌ 无法解析工具参数: {arguments_str}")
-                    arguments = {}
-                
-                # 执行工具（mock 或真实）
-                if use_mock:
-                    mock_config = tools_config.get(tool_name) if tools_config else None
-                    tool_result = MockToolExecutor.execute_tool_call(
-                        tool_name, arguments, mock_config
-                    )
-                else:
-                    # TODO: 实现真实工具执行
-                    tool_result = {
-                        "success": False,
-                        "error": "真实工具执行尚未实现",
-                        "note": "请使用 use_mock=True 进行测试"
-                    }
-                
-                logger.info(f"  ✅ 工具执行完成: {json.dumps(tool_result, ensure_ascii=False)[:100]}")
-                
-                # 记录工具调用历史
-                tool_call_record = {
-                    "iteration": iteration + 1,
-                    "tool_name": tool_name,
-                    "arguments": arguments,
-                    "result": tool_result,
-                    "tool_call_id": tool_call_id
-                }
+            # 并发执行同一轮的工具调用（受并行上限限制），结果按原始顺序追加
+            tools_started = time.time()
+            tool_results = await AgentService._execute_tool_calls(
+                tool_calls, iteration + 1, use_mock, tools_config, virtual_clock, max_parallel_tools
+            )
+            tool_execution_time += time.time() - tools_started
+            
+            for tool_call_record in tool_results:
+                simulated_tool_latency_ms += tool_call_record["simulated_latency_ms"]
                 tool_call_history.append(tool_call_record)
-                tool_results.append(tool_call_record)
                 
                 # 将工具结果添加到消息历史
                 tool_message = {
                     "role": "tool",
-                    "tool_call_id": tool_call_id,
-                    "content": json.dumps(tool_result, ensure_ascii=False)
+                    "tool_call_id": tool_call_record["tool_call_id"],
+                    "content": json.dumps(tool_call_record["result"], ensure_ascii=False)
                 }
                 messages.append(tool_message)
             
@@ -196,7 +211,11 @@ class AgentService:
                         "total_completion_tokens": total_completion_tokens,
                         "total_tokens": total_prompt_tokens + total_completion_tokens,
                         "estimated_cost": total_cost,
-                        "response_time": metrics.get("response_time", 0)
+                        "response_time": metrics.get("response_time", 0),
+                        "cache_hits": cache_hits,
+                        "cache_misses": cache_misses,
+                        "simulated_tool_latency_ms": simulated_tool_latency_ms,
+                        "tool_execution_time": tool_execution_time
                     },
                     "status": "max_iterations_reached",
                     "tool_call_history": tool_call_history,
@@ -212,6 +231,276 @@ class AgentService:
             "error_message": "Agent 执行异常终止"
         }
     
+    @staticmethod
+    async def run_agent_stream(
+        model_config: ModelConfigDB,
+        content: list,
+        system_prompt: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tools_config: Optional[Dict[str, Dict[str, Any]]] = None,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        use_mock: bool = False,
+        max_iterations: int = 5,
+        deadline: Optional[float] = None,
+        virtual_clock: Optional[bool] = None,
+        max_parallel_tools: Optional[int] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        流式运行 Agent，逐个产出运行事件
+        
+        事件类型（type 字段）：
+            iteration_start: 开始一轮迭代
+            content: 模型输出的文本增量
+            tool_call_start / tool_call_end: 工具开始执行 / 执行完成（按完成顺序）
+            iteration_end: 一轮迭代结束，附带本轮模型调用指标
+            done: 运行结束，附带最终输出、汇总指标、工具调用历史和对话历史
+        
+        参数含义同 run_agent。
+        """
+        virtual_clock = settings.MOCK_VIRTUAL_CLOCK if virtual_clock is None else virtual_clock
+        max_parallel_tools = max_parallel_tools or settings.AGENT_MAX_PARALLEL_TOOLS
+        deadline = deadline or resolve_policy(model_config).deadline
+        # 生成器跨 yield 执行，不使用 contextvars，直接比较绝对截止时间
+        deadline_at = time.monotonic() + deadline if deadline else None
+        
+        logger.info("=" * 80)
+        logger.info("🤖 启动流式 Agent 运行")
+        logger.info(f"模型: {model_config.name}")
+        
+        messages = []
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({
+            "role": "user",
+            "content": content
+        })
+        
+        tool_call_history = []
+        totals = {
+            "total_iterations": 0,
+            "total_prompt_tokens": 0,
+            "total_completion_tokens": 0,
+            "estimated_cost": 0.0,
+            "simulated_tool_latency_ms": 0,
+            "tool_execution_time": 0.0,
+            "chunk_count": 0
+        }
+        start_time = time.time()
+        first_token_time = None
+        
+        def done_event(output: str, status: str, error_message: Optional[str] = None) -> Dict[str, Any]:
+            metrics = {
+                **totals,
+                "total_tokens": totals["total_prompt_tokens"] + totals["total_completion_tokens"],
+                "response_time": time.time() - start_time,
+                "time_to_first_token": first_token_time
+            }
+            return {
+                "type": "done",
+                "output": output,
+                "status": status,
+                "error_message": error_message,
+                "metrics": metrics,
+                "tool_call_history": tool_call_history,
+                "conversation_history": messages
+            }
+        
+        for iteration in range(max_iterations):
+            if deadline_at is not None and time.monotonic() >= deadline_at:
+                yield done_event("", "timeout", "已超过 Agent 截止时间")
+                return
+            
+            totals["total_iterations"] += 1
+            yield {"type": "iteration_start", "iteration": iteration + 1}
+            
+            stream_result = await LLMService.call_model(
+                model_config=model_config,
+                content=messages[-1]["content"] if iteration == 0 else "",
+                system_prompt=system_prompt if iteration == 0 else None,
+                params=params,
+                tools=tools,
+                conversation_history=messages[:-1] if iteration == 0 else messages,
+                stream=True
+            )
+            
+            result = None
+            if isinstance(stream_result, dict):
+                # 不支持流式的提供商（或调用前被拒绝）直接返回完整结果
+                result = stream_result
+                if result.get("output"):
+                    first_token_time = first_token_time or time.time() - start_time
+                    yield {"type": "content", "iteration": iteration + 1, "content": result["output"]}
+            else:
+                async for chunk in stream_result:
+                    if chunk.get("done"):
+                        result = chunk.get("final_response") or {
+                            "output": "",
+                            "metrics": {},
+                            "status": chunk.get("status", "error"),
+                            "error_message": chunk.get("error")
+                        }
+                    elif chunk.get("content"):
+                        first_token_time = first_token_time or time.time() - start_time
+                        yield {"type": "content", "iteration": iteration + 1, "content": chunk["content"]}
+                    if deadline_at is not None and time.monotonic() >= deadline_at and result is None:
+                        await stream_result.aclose()
+                        result = {"output": "", "metrics": {}, "status": "timeout", "error_message": "已超过 Agent 截止时间"}
+                        break
+            if result is None:
+                result = {"output": "", "metrics": {}, "status": "error", "error_message": "流式响应意外结束"}
+            
+            metrics = result.get("metrics", {})
+            totals["total_prompt_tokens"] += metrics.get("prompt_tokens", 0)
+            totals["total_completion_tokens"] += metrics.get("completion_tokens", 0)
+            totals["estimated_cost"] += metrics.get("estimated_cost", 0)
+            totals["chunk_count"] += metrics.get("chunk_count", 0)
+            yield {"type": "iteration_end", "iteration": iteration + 1, "metrics": metrics}
+            
+            if result.get("status", "success") != "success":
+                yield done_event(result.get("output", ""), result.get("status"), result.get("error_message"))
+                return
+            
+            tool_calls = result.get("tool_calls")
+            if not tool_calls:
+                messages.append({"role": "assistant", "content": result.get("output", "")})
+                logger.info(f"✅ 流式 Agent 完成，共 {totals['total_iterations']} 轮")
+                yield done_event(result.get("output", ""), "success")
+                return
+            
+            messages.append({
+                "role": "assistant",
+                "content": result.get("output") or "",
+                "tool_calls": tool_calls
+            })
+            
+            for tool_call in tool_calls:
+                function_info = tool_call.get("function", {})
+                yield {
+                    "type": "tool_call_start",
+                    "iteration": iteration + 1,
+                    "tool_call_id": tool_call.get("id"),
+                    "tool_name": function_info.get("name"),
+                    "arguments": function_info.get("arguments")
+                }
+            
+            # 并发执行工具，按完成顺序推送结果，按原始顺序写入对话历史
+            semaphore = asyncio.Semaphore(max(1, max_parallel_tools))
+            
+            async def run_one(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+                async with semaphore:
+                    return await AgentService._execute_tool_call(
+                        tool_call, iteration + 1, use_mock, tools_config, virtual_clock
+                    )
+            
+            tools_started = time.time()
+            tasks = [asyncio.create_task(run_one(tool_call)) for tool_call in tool_calls]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    record = await finished
+                    yield {"type": "tool_call_end", **record}
+            finally:
+                # 客户端断开时取消尚未完成的工具
+                for task in tasks:
+                    task.cancel()
+            totals["tool_execution_time"] += time.time() - tools_started
+            
+            for task in tasks:
+                record = task.result()
+                totals["simulated_tool_latency_ms"] += record["simulated_latency_ms"]
+                tool_call_history.append(record)
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": record["tool_call_id"],
+                    "content": json.dumps(record["result"], ensure_ascii=False)
+                })
+        
+        logger.warning(f"⚠️ 达到最大迭代次数 {max_iterations}，强制终止")
+        yield done_event("达到最大工具调用次数，可能未完成全部任务", "max_iterations_reached")
+    
+    @staticmethod
+    async def _execute_tool_calls(
+        tool_calls: List[Dict[str, Any]],
+        iteration: int,
+        use_mock: bool,
+        tools_config: Optional[Dict[str, Dict[str, Any]]],
+        virtual_clock: bool,
+        max_parallel_tools: int
+    ) -> List[Dict[str, Any]]:
+        """
+        并发执行同一轮 assistant 消息中的多个工具调用
+        
+        Returns:
+            与 tool_calls 顺序一致的工具调用记录列表
+        """
+        semaphore = asyncio.Semaphore(max(1, max_parallel_tools))
+        
+        async def run_one(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await AgentService._execute_tool_call(
+                    tool_call, iteration, use_mock, tools_config, virtual_clock
+                )
+        
+        if len(tool_calls) > 1:
+            logger.info(f"⚡ 并发执行 {len(tool_calls)} 个工具调用，并行上限 {max_parallel_tools}")
+        return list(await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls)))
+    
+    @staticmethod
+    async def _execute_tool_call(
+        tool_call: Dict[str, Any],
+        iteration: int,
+        use_mock: bool,
+        tools_config: Optional[Dict[str, Dict[str, Any]]],
+        virtual_clock: bool
+    ) -> Dict[str, Any]:
+        """执行单个工具调用并生成工具调用记录"""
+        function_info = tool_call.get("function", {})
+        tool_name = function_info.get("name")
+        tool_call_id = tool_call.get("id")
+        
+        logger.info(f"  🔨 执行工具: {tool_name}")
+        
+        # 解析参数
+        arguments_str = function_info.get("arguments", "{}")
+        try:
+            arguments = json.loads(arguments_str) if isinstance(arguments_str, str) else arguments_str
+        except json.JSONDecodeError:
+            logger.error(f"❌ 无法解析工具参数: {arguments_str}")
+            arguments = {}
+        
+        # 执行工具（mock 或真实）
+        started = time.time()
+        simulated_latency = 0
+        if use_mock:
+            mock_config = tools_config.get(tool_name) if tools_config else None
+            try:
+                tool_result, simulated_latency = await MockToolExecutor.execute_tool_call_async(
+                    tool_name, arguments, mock_config, virtual_clock
+                )
+            except Exception as e:
+                logger.error(f"❌ 工具执行异常: {tool_name}: {e}")
+                tool_result = {"success": False, "error": str(e), "tool_name": tool_name}
+        else:
+            # TODO: 实现真实工具执行
+            tool_result = {
+                "success": False,
+                "error": "真实工具执行尚未实现",
+                "note": "请使用 use_mock=True 进行测试"
+            }
+        duration_ms = round((time.time() - started) * 1000, 2)
+        
+        logger.info(f"  ✅ 工具执行完成 ({duration_ms}ms): {json.dumps(tool_result, ensure_ascii=False)[:100]}")
+        
+        return {
+            "iteration": iteration,
+            "tool_name": tool_name,
+            "arguments": arguments,
+            "result": tool_result,
+            "tool_call_id": tool_call_id,
+            "simulated_latency_ms": simulated_latency,
+            "duration_ms": duration_ms
+        }
+    
     @staticmethod
     def format_tool_call_history(tool_call_history: List[Dict[str, Any]]) -> str:
         """格式化工具调用历史为可读文本"""
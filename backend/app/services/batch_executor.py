@@ -0,0 +1,241 @@
+"""批量测试执行器 - 并发执行 (测试用例 × 模型) 组合"""
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.config import settings
+from app.models.model_config import ModelConfigDB
+from app.models.test_case import TestCaseDB
+from app.services.llm_service import LLMService
+from app.services.agent_service import AgentService
+from app.services.evaluation_service import EvaluationService
+
+logger = logging.getLogger(__name__)
+
+
+class PrioritySemaphore:
+    """
+    按优先级唤醒等待者的信号量
+
+    优先级高的等待者先获得槽位，同优先级先到先得。
+    用于让高优先级批次的组合越过同一模型上排队的低优先级组合。
+    """
+
+    def __init__(self, value: int):
+        self.limit = value
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int = 0):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (-priority, next(self._counter), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已经分到槽位但调用方被取消，把槽位交给下一个等待者
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        if self._value < 0:
+            # 缩容后超出新上限的槽位：归还时直接收回，不唤醒等待者
+            self._value += 1
+            return
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+    def resize(self, limit: int):
+        """
+        调整槽位上限（执行中的持有者不受影响）
+
+        缩容时可用槽位可能变为负数，持有者归还槽位后逐步回到新上限；扩容时立即唤醒等待者
+        """
+        self._value += limit - self.limit
+        self.limit = limit
+        while self._value > 0 and self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self._value -= 1
+
+    @asynccontextmanager
+    async def hold(self, priority: int = 0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class ConcurrencyLimiter:
+    """
+    两级并发限制：全局限制 + 单模型限制
+
+    单模型信号量按 model_id 缓存在类级别，
+    因此同时运行的多个批次共享同一个模型的并发额度。
+    模型的 max_concurrency 修改后原地调整同一个信号量的上限，执行中和新领取的组合共用一个额度。
+    排队时按批次优先级分配槽位。
+    """
+
+    _model_semaphores: Dict[int, PrioritySemaphore] = {}
+
+    def __init__(self, global_limit: Optional[int] = None):
+        self.global_limit = max(1, global_limit or settings.BATCH_MAX_CONCURRENCY)
+        self._global_semaphore = PrioritySemaphore(self.global_limit)
+
+    @staticmethod
+    def model_limit(model: ModelConfigDB) -> int:
+        """获取模型的并发上限"""
+        return max(1, getattr(model, "max_concurrency", None) or settings.BATCH_MODEL_CONCURRENCY)
+
+    @classmethod
+    def _model_semaphore(cls, model: ModelConfigDB) -> PrioritySemaphore:
+        limit = cls.model_limit(model)
+        semaphore = cls._model_semaphores.get(model.id)
+        if semaphore is None:
+            semaphore = PrioritySemaphore(limit)
+            cls._model_semaphores[model.id] = semaphore
+        elif semaphore.limit != limit:
+            logger.info(f"🔧 模型 {model.id} 并发上限 {semaphore.limit} → {limit}")
+            semaphore.resize(limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, model: ModelConfigDB, priority: int = 0):
+        """获取一个执行槽位（先占模型槽位，再占全局槽位，避免排队的模型占用全局额度）"""
+        async with self._model_semaphore(model).hold(priority):
+            async with self._global_semaphore.hold(priority):
+                yield
+
+
+class BatchExecutor:
+    """批量测试执行器"""
+
+    @staticmethod
+    async def execute_pair(
+        test_case: TestCaseDB,
+        model: ModelConfigDB,
+        tools: Optional[List[Dict[str, Any]]],
+        tools_config: Dict[str, Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+        use_cache: Optional[bool] = None,
+        virtual_clock: Optional[bool] = None,
+        force_stream: bool = False
+    ) -> Dict[str, Any]:
+        """
+        执行单个 (测试用例, 模型) 组合并评估
+
+        force_stream=True 时以流式方式调用模型，指标中包含首token延迟、token间隔等流式指标
+
+        Returns:
+            {"result": 模型调用结果, "metrics": 指标（含评估详情）, "score": 评分}
+        """
+        # 判断是否使用Agent模式
+        # 如果测试用例配置了use_mock或有工具定义，使用Agent模式
+        use_agent_mode = tools is not None
+        use_mock = test_case.use_mock if test_case.use_mock is not None else False
+
+        if use_agent_mode and force_stream:
+            # 流式Agent，取最终的 done 事件作为结果
+            result = {"output": "", "metrics": {}, "status": "error", "error_message": "流式Agent未返回结果"}
+            async for event in AgentService.run_agent_stream(
+                model_config=model,
+                content=test_case.prompt,
+                system_prompt=test_case.system_prompt,
+                params=params,
+                tools=tools,
+                tools_config=tools_config,
+                conversation_history=test_case.conversation_history,
+                use_mock=use_mock,
+                max_iterations=5,
+                virtual_clock=virtual_clock
+            ):
+                if event["type"] == "done":
+                    result = {key: value for key, value in event.items() if key != "type"}
+        elif use_agent_mode:
+            # 使用Agent服务（支持多轮工具调用）
+            result = await AgentService.run_agent(
+                model_config=model,
+                content=test_case.prompt,
+                system_prompt=test_case.system_prompt,
+                params=params,
+                tools=tools,
+                tools_config=tools_config,
+                conversation_history=test_case.conversation_history,
+                use_mock=use_mock,
+                max_iterations=5,
+                use_cache=use_cache,
+                virtual_clock=virtual_clock
+            )
+        elif force_stream:
+            # 流式单次调用（无工具），收集完整结果
+            result = await LLMService.collect_stream(await LLMService.call_model(
+                model_config=model,
+                content=test_case.prompt,
+                system_prompt=test_case.system_prompt,
+                params=params,
+                tools=None,
+                stream=True,
+                conversation_history=test_case.conversation_history
+            ))
+        else:
+            # 使用原有的单次调用（无工具）
+            result = await LLMService.call_model(
+                model_config=model,
+                content=test_case.prompt,
+                system_prompt=test_case.system_prompt,
+                params=params,
+                tools=None,
+                stream=False,
+                conversation_history=test_case.conversation_history,
+                use_cache=use_cache
+            )
+
+        # 评估结果
+        score = None
+        metrics = result.get("metrics", {})
+        if result.get("status") == "success":
+            # 从tool_call_history提取工具调用（如果有）
+            tool_calls_for_eval = None
+            if result.get("tool_call_history"):
+                # 转换为评估服务期望的格式
+                tool_calls_for_eval = [
+                    {
+                        "function": {
+                            "name": tc["tool_name"],
+                            "arguments": tc["arguments"]
+                        }
+                    }
+                    for tc in result.get("tool_call_history", [])
+                ]
+
+            score, eval_details = EvaluationService.evaluate_result(
+                output=result.get("output", ""),
+                expected_output=test_case.expected_output,
+                tool_calls=tool_calls_for_eval or result.get("tool_calls"),
+                expected_tool_calls=test_case.expected_tool_calls,
+                evaluation_criteria=test_case.evaluation_criteria,
+                evaluation_weights=test_case.evaluation_weights,
+                conversation_history=result.get("conversation_history"),
+                tool_call_history=result.get("tool_call_history")
+            )
+            # 将评估详情添加到metrics中
+            metrics['evaluation'] = eval_details
+
+        return {"result": result, "metrics": metrics, "score": score}
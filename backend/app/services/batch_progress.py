@@ -0,0 +1,237 @@
+"""批量测试进度 - 从数据库增量读取批次状态，生成进度事件"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, List, AsyncGenerator
+
+from sqlalchemy import func
+
+from app.config import settings
+from app.models.batch_job import (
+    BatchDB, BatchItemDB, ITEM_PENDING, ITEM_RUNNING, ITEM_DONE, ITEM_FAILED, ITEM_CANCELLED, ITEM_SKIPPED,
+    BATCH_PAUSED, BATCH_COMPLETED, BATCH_FAILED, BATCH_CANCELLED
+)
+from app.models.model_config import ModelConfigDB
+from app.models.test_result import TestResultDB
+from app.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 批次结束状态，进入这些状态后进度流结束
+FINISHED_BATCH_STATUSES = (BATCH_COMPLETED, BATCH_FAILED, BATCH_CANCELLED)
+
+
+class ModelStats:
+    """单个模型的累计指标（滚动平均），组合重试后用 remove 撤销上一次结果"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.failed = 0
+        self._score_sum = 0.0
+        self._score_count = 0
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._tokens_sum = 0
+        self._tokens_count = 0
+
+    def add(self, event: Dict[str, Any], sign: int = 1):
+        self.count += sign
+        if event["status"] not in ("success", "max_iterations_reached"):
+            self.failed += sign
+        if event["score"] is not None:
+            self._score_sum += sign * event["score"]
+            self._score_count += sign
+        if event["response_time"] is not None:
+            self._latency_sum += sign * event["response_time"]
+            self._latency_count += sign
+        if event["total_tokens"] is not None:
+            self._tokens_sum += sign * event["total_tokens"]
+            self._tokens_count += sign
+
+    def remove(self, event: Dict[str, Any]):
+        self.add(event, -1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "count": self.count,
+            "failed": self.failed,
+            "avg_score": self._score_sum / self._score_count if self._score_count else None,
+            "avg_latency": self._latency_sum / self._latency_count if self._latency_count else None,
+            "avg_tokens": self._tokens_sum / self._tokens_count if self._tokens_count else None
+        }
+
+
+class BatchProgress:
+    """
+    批次进度流
+
+    新结果以组合（batch_items）的状态为准，而不是按结果ID递增的游标：多个 worker 并发写入时
+    结果ID的分配顺序与提交顺序不一致（PostgreSQL 上较小的ID可能更晚可见），
+    重试的组合也会用新结果替换旧结果。
+    """
+
+    # 每次查询结果详情的组合数量上限（受数据库绑定参数数量限制）
+    DETAIL_CHUNK_SIZE = 500
+
+    @staticmethod
+    def fetch(batch_id: str, seen: Dict[int, int]) -> Optional[Dict[str, Any]]:
+        """
+        读取批次当前状态和尚未推送（或已被重试替换）的结果
+
+        Args:
+            seen: 已推送的 {item_id: result_id}
+
+        Returns:
+            {"batch": 批次信息, "counts": 各状态数量, "finished": 当前已结束组合的 {item_id: result_id},
+             "results": 新结果列表}；批次不存在返回 None
+        """
+        db = SessionLocal()
+        try:
+            batch = db.query(BatchDB).filter(BatchDB.id == batch_id).first()
+            if batch is None:
+                return None
+            counts = {state: 0 for state in (ITEM_PENDING, ITEM_RUNNING, ITEM_DONE, ITEM_FAILED, ITEM_CANCELLED, ITEM_SKIPPED)}
+            for state, count in db.query(BatchItemDB.status, func.count(BatchItemDB.id)).filter(
+                BatchItemDB.batch_id == batch_id
+            ).group_by(BatchItemDB.status):
+                counts[state] = count
+            finished = dict(db.query(BatchItemDB.id, BatchItemDB.result_id).filter(
+                BatchItemDB.batch_id == batch_id,
+                BatchItemDB.status.in_((ITEM_DONE, ITEM_FAILED)),
+                BatchItemDB.result_id.isnot(None)
+            ).all())
+            changed = [item_id for item_id, result_id in finished.items() if seen.get(item_id) != result_id]
+            rows = []
+            for start in range(0, len(changed), BatchProgress.DETAIL_CHUNK_SIZE):
+                rows.extend(db.query(BatchItemDB, TestResultDB).join(
+                    TestResultDB, BatchItemDB.result_id == TestResultDB.id
+                ).filter(
+                    BatchItemDB.id.in_(changed[start:start + BatchProgress.DETAIL_CHUNK_SIZE])
+                ).all())
+            rows.sort(key=lambda row: (row[0].finished_at or datetime.min, row[0].id))
+            results = []
+            for item, result in rows:
+                metrics = result.metrics or {}
+                results.append({
+                    "item_id": item.id,
+                    "result_id": result.id,
+                    "test_case_id": item.test_case_id,
+                    "model_id": item.model_id,
+                    "item_status": item.status,
+                    "status": result.status,
+                    "score": result.score,
+                    "response_time": metrics.get("response_time"),
+                    "total_tokens": metrics.get("total_tokens"),
+                    "error_message": result.error_message
+                })
+            return {
+                "batch": {
+                    "id": batch.id,
+                    "status": batch.status,
+                    "total_items": batch.total_items or 0,
+                    "model_ids": batch.model_ids or [],
+                    "started_at": batch.started_at,
+                    "early_stopping": batch.early_stopping
+                },
+                "counts": counts,
+                "finished": finished,
+                "results": results
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def model_names(model_ids: List[int]) -> Dict[int, str]:
+        db = SessionLocal()
+        try:
+            return {m.id: m.name for m in db.query(ModelConfigDB).filter(ModelConfigDB.id.in_(model_ids))}
+        finally:
+            db.close()
+
+    @staticmethod
+    def progress_event(
+        snapshot: Dict[str, Any],
+        model_stats: Dict[int, ModelStats],
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """根据批次快照生成进度事件（含 ETA 和各模型滚动平均）"""
+        batch = snapshot["batch"]
+        counts = snapshot["counts"]
+        total = batch["total_items"]
+        # 早停跳过的组合不再执行，计入已结束
+        finished = counts[ITEM_DONE] + counts[ITEM_FAILED] + counts[ITEM_SKIPPED]
+        elapsed = None
+        eta = None
+        if batch["started_at"] is not None:
+            elapsed = max(0.0, ((now or datetime.utcnow()) - batch["started_at"]).total_seconds())
+            if batch["status"] == BATCH_PAUSED:
+                eta = None
+            elif finished and finished < total:
+                eta = elapsed / finished * (total - finished)
+            elif finished >= total:
+                eta = 0.0
+        return {
+            "type": "progress",
+            "batch_id": batch["id"],
+            "status": batch["status"],
+            "total": total,
+            "completed": counts[ITEM_DONE],
+            "failed": counts[ITEM_FAILED],
+            "running": counts[ITEM_RUNNING],
+            "pending": counts[ITEM_PENDING],
+            "cancelled": counts[ITEM_CANCELLED],
+            "skipped": counts[ITEM_SKIPPED],
+            "percent": round(finished / total * 100, 1) if total else 100.0,
+            "elapsed_seconds": elapsed,
+            "eta_seconds": eta,
+            "models": {model_id: stats.to_dict() for model_id, stats in model_stats.items()},
+            "early_stopping": batch["early_stopping"]
+        }
+
+    @staticmethod
+    async def stream(batch_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        批次进度事件流
+
+        首先推送已完成结果和当前进度，之后每隔 BATCH_PROGRESS_INTERVAL 秒增量读取：
+        每个新完成（或重试后结果变化）的组合推送一个 result 事件，状态变化时推送 progress 事件，
+        批次结束时推送 done 事件并结束。各模型的滚动平均只计入每个组合的当前结果。
+        """
+        reported: Dict[int, Dict[str, Any]] = {}  # 已推送的 {item_id: result 事件}
+        model_stats: Dict[int, ModelStats] = {}
+        last_progress = None
+        while True:
+            seen = {item_id: event["result_id"] for item_id, event in reported.items()}
+            snapshot = await asyncio.to_thread(BatchProgress.fetch, batch_id, seen)
+            if snapshot is None:
+                yield {"type": "error", "error_message": "Batch not found"}
+                return
+            if not model_stats:
+                names = await asyncio.to_thread(BatchProgress.model_names, snapshot["batch"]["model_ids"])
+                model_stats = {model_id: ModelStats(names.get(model_id, "Unknown")) for model_id in snapshot["batch"]["model_ids"]}
+
+            # 重新排队（续跑、重试）的组合撤销上一次结果，新结果到达时再计入
+            for item_id in [item_id for item_id in reported if item_id not in snapshot["finished"]]:
+                previous = reported.pop(item_id)
+                model_stats[previous["model_id"]].remove(previous)
+            for result in snapshot["results"]:
+                stats = model_stats.setdefault(result["model_id"], ModelStats("Unknown"))
+                previous = reported.get(result["item_id"])
+                if previous is not None:
+                    stats.remove(previous)
+                stats.add(result)
+                reported[result["item_id"]] = result
+                yield {"type": "result", **result}
+
+            progress = BatchProgress.progress_event(snapshot, model_stats)
+            key = (progress["status"], progress["completed"], progress["failed"], progress["running"], progress["cancelled"], progress["skipped"])
+            if key != last_progress:
+                last_progress = key
+                yield progress
+
+            if snapshot["batch"]["status"] in FINISHED_BATCH_STATUSES:
+                yield {"type": "done", "batch_id": batch_id, "status": snapshot["batch"]["status"]}
+                return
+            await asyncio.sleep(settings.BATCH_PROGRESS_INTERVAL)
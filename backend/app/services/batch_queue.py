@@ -0,0 +1,775 @@
+"""批量测试任务队列 - 持久化批次与组合状态，基于租约领取组合，增量保存结果"""
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.batch_job import (
+    BatchDB, BatchItemDB, ITEM_PENDING, ITEM_RUNNING, ITEM_DONE, ITEM_FAILED, ITEM_CANCELLED, ITEM_SKIPPED,
+    BATCH_PENDING, BATCH_RUNNING, BATCH_PAUSED, BATCH_COMPLETED, BATCH_CANCELLED
+)
+from app.models.model_config import ModelConfigDB
+from app.models.test_case import TestCaseDB
+from app.models.test_result import TestResultDB, TestResultSampleDB
+from app.services.early_stopping import EarlyStopping
+from app.services.sample_stats import SampleStats
+from app.services.tool_registry import ToolRegistry
+from app.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 视为组合执行完成的结果状态，其余状态（error、timeout 等）记为失败，续跑时重试
+COMPLETED_RESULT_STATUSES = ("success", "max_iterations_reached")
+
+
+class BatchQueue:
+    """
+    持久化批量测试队列
+
+    批次和每个 (测试用例, 模型) 组合都保存在数据库中。worker 通过条件更新领取组合并持有租约，
+    执行期间定期续约；worker 崩溃后租约过期，组合会被其他 worker 重新领取。
+    每个组合完成后立即提交结果，已完成的组合不会重复调用。
+    优先级高的批次先被领取；暂停或取消批次会收回执行中组合的租约，worker 发现后中断对应调用。
+
+    租约时间使用 UTC，多机部署时各机器需保持时钟同步。
+    """
+
+    @staticmethod
+    def fingerprint(
+        test_case: TestCaseDB,
+        model: ModelConfigDB,
+        tools: Optional[List[Dict[str, Any]]],
+        tools_config: Dict[str, Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+        options: Dict[str, Any]
+    ) -> str:
+        """
+        计算组合输入内容的指纹
+
+        包含提示词、系统提示、对话历史、工具定义及 mock 配置、模型、生效参数和采样次数；
+        只影响评估的字段（期望输出、评估标准）不参与计算。
+        """
+        payload = {
+            "prompt": test_case.prompt,
+            "system_prompt": test_case.system_prompt,
+            "history": test_case.conversation_history,
+            "use_mock": bool(test_case.use_mock),
+            "tools": tools,
+            "tools_config": tools_config,
+            "provider": model.provider,
+            "endpoint": model.api_endpoint or "",
+            "model": model.model_name,
+            "params": {**(model.default_params or {}), **(params or {})},
+            "n_samples": options.get("n_samples") or 1
+        }
+        canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def new_batch_id() -> str:
+        """生成批次ID：时间戳便于按时间排序和辨认，随机后缀保证同一秒内创建的批次也不会冲突"""
+        return f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def create_batch(
+        db: Session,
+        batch_id: str,
+        models: List[ModelConfigDB],
+        test_cases: List[TestCaseDB],
+        params: Optional[Dict[str, Any]],
+        options: Dict[str, Any],
+        priority: int = 0,
+        only_stale: bool = False,
+        max_age_hours: Optional[int] = None
+    ) -> BatchDB:
+        """
+        创建批次及其全部组合（按 测试用例 × 模型 的顺序）
+
+        only_stale=True 时，输入指纹与近期成功结果一致的组合直接复用该结果（标记为已完成，不再调用模型）；
+        max_age_hours 为可复用结果的最长时间，为空时使用 BATCH_REUSE_MAX_AGE_HOURS。
+        """
+        reusable: Dict[Tuple[int, int], int] = {}
+        if only_stale:
+            reusable = BatchQueue._find_reusable(db, models, test_cases, params, options, max_age_hours)
+
+        batch = BatchDB(
+            id=batch_id,
+            status=BATCH_PENDING,
+            priority=priority,
+            model_ids=[m.id for m in models],
+            test_case_ids=[tc.id for tc in test_cases],
+            params=params,
+            options=options,
+            total_items=len(models) * len(test_cases)
+        )
+        db.add(batch)
+        position = 0
+        now = datetime.utcnow()
+        for test_case in test_cases:
+            for model in models:
+                result_id = reusable.get((test_case.id, model.id))
+                db.add(BatchItemDB(
+                    batch_id=batch_id,
+                    position=position,
+                    test_case_id=test_case.id,
+                    model_id=model.id,
+                    status=ITEM_DONE if result_id else ITEM_PENDING,
+                    result_id=result_id,
+                    finished_at=now if result_id else None
+                ))
+                position += 1
+        db.commit()
+        if reusable:
+            logger.info(f"♻️ 批次 {batch_id} 复用 {len(reusable)} 个未变化组合的结果")
+            BatchQueue._recount(db, batch_id)
+            # 全部组合都已复用时直接完成
+            BatchQueue._finalize_if_complete(db, batch_id)
+        return batch
+
+    @staticmethod
+    def _find_reusable(
+        db: Session,
+        models: List[ModelConfigDB],
+        test_cases: List[TestCaseDB],
+        params: Optional[Dict[str, Any]],
+        options: Dict[str, Any],
+        max_age_hours: Optional[int]
+    ) -> Dict[Tuple[int, int], int]:
+        """查找输入指纹与近期成功结果一致的组合，返回 {(test_case_id, model_id): result_id}"""
+        fingerprints: Dict[str, List[Tuple[int, int]]] = {}
+        toolsets = ToolRegistry.resolve_many(db, [test_case.tools for test_case in test_cases])
+        for test_case, (tools, tools_config) in zip(test_cases, toolsets):
+            for model in models:
+                key = BatchQueue.fingerprint(test_case, model, tools, tools_config, params, options)
+                fingerprints.setdefault(key, []).append((test_case.id, model.id))
+
+        query = db.query(TestResultDB.id, TestResultDB.fingerprint).filter(
+            TestResultDB.fingerprint.in_(list(fingerprints)),
+            TestResultDB.status.in_(COMPLETED_RESULT_STATUSES)
+        )
+        if max_age_hours is None:
+            max_age_hours = settings.BATCH_REUSE_MAX_AGE_HOURS
+        if max_age_hours:
+            # executed_at 由数据库 func.now() 写入（UTC）
+            query = query.filter(TestResultDB.executed_at >= datetime.utcnow() - timedelta(hours=max_age_hours))
+
+        reusable: Dict[Tuple[int, int], int] = {}
+        for result_id, key in query.order_by(TestResultDB.id):
+            # 按 id 升序遍历，同一指纹保留最新的结果
+            for pair in fingerprints[key]:
+                reusable[pair] = result_id
+        return reusable
+
+    @staticmethod
+    def _claimable(now: datetime):
+        """可领取的组合：待执行，或执行中但租约已过期（worker 崩溃或失联）"""
+        return or_(
+            BatchItemDB.status == ITEM_PENDING,
+            and_(
+                BatchItemDB.status == ITEM_RUNNING,
+                or_(BatchItemDB.lease_expires_at.is_(None), BatchItemDB.lease_expires_at < now)
+            )
+        )
+
+    @staticmethod
+    def claim_items(
+        worker_id: str,
+        limit: int,
+        lease_seconds: float,
+        batch_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        领取最多 limit 个组合并加租约
+
+        先查询候选组合，再用带条件的 UPDATE 抢占；多个 worker 竞争同一组合时只有一个能更新成功。
+        PostgreSQL 上候选查询加 FOR UPDATE SKIP LOCKED，其他节点正在领取的组合直接跳过而不是等待锁
+        （SQLite 整库只有一个写者，忽略该子句）。
+
+        按批次优先级（高优先）、创建时间、组合顺序领取。
+
+        Returns:
+            领取到的组合列表，每项包含 item_id、batch_id、priority、test_case、model、tools、tools_config、params、options、fingerprint
+        """
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            now = datetime.utcnow()
+            query = db.query(BatchItemDB.id).join(BatchDB, BatchDB.id == BatchItemDB.batch_id).filter(
+                BatchDB.status.in_((BATCH_PENDING, BATCH_RUNNING)),
+                BatchQueue._claimable(now)
+            )
+            if batch_id:
+                query = query.filter(BatchItemDB.batch_id == batch_id)
+            candidate_ids = [row.id for row in query.order_by(
+                BatchDB.priority.desc(), BatchDB.created_at, BatchItemDB.position
+            ).limit(limit).with_for_update(skip_locked=True, of=BatchItemDB)]
+            if not candidate_ids:
+                return []
+
+            db.query(BatchItemDB).filter(
+                BatchItemDB.id.in_(candidate_ids),
+                BatchQueue._claimable(now)
+            ).update({
+                BatchItemDB.status: ITEM_RUNNING,
+                BatchItemDB.lease_owner: worker_id,
+                BatchItemDB.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                BatchItemDB.started_at: now,
+                BatchItemDB.attempts: func.coalesce(BatchItemDB.attempts, 0) + 1
+            }, synchronize_session=False)
+            db.commit()
+
+            items = db.query(BatchItemDB).filter(
+                BatchItemDB.id.in_(candidate_ids),
+                BatchItemDB.lease_owner == worker_id,
+                BatchItemDB.status == ITEM_RUNNING
+            ).all()
+            if not items:
+                return []
+            # 保持领取顺序（优先级高的先派发）
+            order = {item_id: index for index, item_id in enumerate(candidate_ids)}
+            items.sort(key=lambda item: order[item.id])
+
+            batch_ids = {item.batch_id for item in items}
+            db.query(BatchDB).filter(BatchDB.id.in_(batch_ids), BatchDB.status == BATCH_PENDING).update(
+                {BatchDB.status: BATCH_RUNNING, BatchDB.started_at: now}, synchronize_session=False
+            )
+            db.commit()
+            batches = {b.id: b for b in db.query(BatchDB).filter(BatchDB.id.in_(batch_ids))}
+            models = {m.id: m for m in db.query(ModelConfigDB).filter(
+                ModelConfigDB.id.in_({item.model_id for item in items})
+            )}
+            test_cases = {tc.id: tc for tc in db.query(TestCaseDB).filter(
+                TestCaseDB.id.in_({item.test_case_id for item in items})
+            )}
+
+            # 一次解析本次领取涉及的全部测试用例的工具
+            case_list = list(test_cases.values())
+            tools_by_case = dict(zip(
+                [tc.id for tc in case_list],
+                ToolRegistry.resolve_many(db, [tc.tools for tc in case_list])
+            ))
+
+            claimed = []
+            for item in items:
+                model = models.get(item.model_id)
+                test_case = test_cases.get(item.test_case_id)
+                if model is None or test_case is None:
+                    # 已删除的模型或用例直接记为失败，与结果写入一样在同一事务中原子递增失败计数
+                    failed = db.query(BatchItemDB).filter(
+                        BatchItemDB.id == item.id,
+                        BatchItemDB.lease_owner == worker_id,
+                        BatchItemDB.status == ITEM_RUNNING
+                    ).update({
+                        BatchItemDB.status: ITEM_FAILED,
+                        BatchItemDB.error_message: "模型或测试用例已删除",
+                        BatchItemDB.lease_owner: None,
+                        BatchItemDB.lease_expires_at: None,
+                        BatchItemDB.finished_at: datetime.utcnow()
+                    }, synchronize_session=False)
+                    if failed:
+                        db.query(BatchDB).filter(BatchDB.id == item.batch_id).update(
+                            {BatchDB.failed_items: BatchDB.failed_items + 1}, synchronize_session=False
+                        )
+                    db.commit()
+                    BatchQueue._finalize_if_complete(db, item.batch_id)
+                    continue
+                tools, tools_config = tools_by_case[test_case.id]
+                batch = batches[item.batch_id]
+                options = batch.options or {}
+                claimed.append({
+                    "item_id": item.id,
+                    "batch_id": item.batch_id,
+                    "priority": batch.priority or 0,
+                    "test_case": test_case,
+                    "model": model,
+                    "tools": tools,
+                    "tools_config": tools_config,
+                    "params": batch.params,
+                    "options": options,
+                    "fingerprint": BatchQueue.fingerprint(test_case, model, tools, tools_config, batch.params, options)
+                })
+            return claimed
+        finally:
+            db.close()
+
+    @staticmethod
+    def renew_leases(worker_id: str, item_ids: List[int], lease_seconds: float) -> int:
+        """为执行中的组合续约，返回续约成功的数量"""
+        if not item_ids:
+            return 0
+        db = SessionLocal()
+        try:
+            count = db.query(BatchItemDB).filter(
+                BatchItemDB.id.in_(item_ids),
+                BatchItemDB.lease_owner == worker_id,
+                BatchItemDB.status == ITEM_RUNNING
+            ).update(
+                {BatchItemDB.lease_expires_at: datetime.utcnow() + timedelta(seconds=lease_seconds)},
+                synchronize_session=False
+            )
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    @staticmethod
+    def revoked_items(worker_id: str, item_ids: List[int]) -> List[int]:
+        """返回 item_ids 中已不再由该 worker 持有的组合（批次被暂停/取消，或租约被接管）"""
+        if not item_ids:
+            return []
+        db = SessionLocal()
+        try:
+            held = {row.id for row in db.query(BatchItemDB.id).filter(
+                BatchItemDB.id.in_(item_ids),
+                BatchItemDB.lease_owner == worker_id,
+                BatchItemDB.status == ITEM_RUNNING
+            )}
+            return [item_id for item_id in item_ids if item_id not in held]
+        finally:
+            db.close()
+
+    @staticmethod
+    def release_leases(worker_id: str) -> int:
+        """释放 worker 持有的全部租约，组合放回队列（worker 退出时调用）"""
+        db = SessionLocal()
+        try:
+            count = db.query(BatchItemDB).filter(
+                BatchItemDB.lease_owner == worker_id,
+                BatchItemDB.status == ITEM_RUNNING
+            ).update({
+                BatchItemDB.status: ITEM_PENDING,
+                BatchItemDB.lease_owner: None,
+                BatchItemDB.lease_expires_at: None
+            }, synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    @staticmethod
+    def save_outcome(
+        item_id: int,
+        worker_id: str,
+        outcome: Dict[str, Any],
+        fingerprint: Optional[str] = None
+    ) -> bool:
+        """
+        保存单个组合的结果并立即提交
+
+        只有仍持有租约的 worker 才能写入结果；租约已被其他 worker 接管时丢弃本次结果并返回 False。
+
+        outcome 包含 samples（多次采样）时，每次采样保存到 test_result_samples，
+        test_results 中保存第一个完成的采样作为代表输出，得分为采样均值，metrics["samples"] 为汇总统计。
+        """
+        return BatchQueue.save_outcomes(worker_id, [(item_id, outcome, fingerprint)])[0]
+
+    @staticmethod
+    def save_outcomes(
+        worker_id: str,
+        outcomes: List[Tuple[int, Dict[str, Any], Optional[str]]]
+    ) -> List[bool]:
+        """
+        在同一个事务中保存多个组合的结果 [(item_id, outcome, fingerprint)]
+
+        每个组合的处理与 save_outcome 相同；租约已失效的组合被跳过，不影响其他组合。
+        提交后对涉及的批次各执行一次早停检查和完成检查。
+
+        Returns:
+            各组合是否保存成功
+        """
+        db = SessionLocal()
+        try:
+            saved = [
+                BatchQueue._apply_outcome(db, item_id, worker_id, outcome, fingerprint)
+                for item_id, outcome, fingerprint in outcomes
+            ]
+            db.commit()
+            for batch_id in dict.fromkeys(batch_id for batch_id in saved if batch_id):
+                EarlyStopping.apply(db, batch_id)
+                BatchQueue._finalize_if_complete(db, batch_id)
+            return [bool(batch_id) for batch_id in saved]
+        finally:
+            db.close()
+
+    @staticmethod
+    def _apply_outcome(
+        db: Session,
+        item_id: int,
+        worker_id: str,
+        outcome: Dict[str, Any],
+        fingerprint: Optional[str]
+    ) -> Optional[str]:
+        """写入单个组合的结果（不提交），返回组合所属的批次ID；租约已失效时返回 None"""
+        samples = outcome.get("samples")
+        if samples:
+            representative = next(
+                (s for s in samples if s["result"].get("status", "success") in COMPLETED_RESULT_STATUSES),
+                samples[0]
+            )
+        else:
+            representative = outcome
+        result = representative["result"]
+        status = result.get("status", "success")
+        item_status = ITEM_DONE if status in COMPLETED_RESULT_STATUSES else ITEM_FAILED
+        previous_result_id = db.query(BatchItemDB.result_id).filter(BatchItemDB.id == item_id).scalar()
+        updated = db.query(BatchItemDB).filter(
+            BatchItemDB.id == item_id,
+            BatchItemDB.lease_owner == worker_id,
+            BatchItemDB.status == ITEM_RUNNING
+        ).update({
+            BatchItemDB.status: item_status,
+            BatchItemDB.lease_owner: None,
+            BatchItemDB.lease_expires_at: None,
+            BatchItemDB.error_message: result.get("error_message"),
+            BatchItemDB.finished_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if not updated:
+            logger.warning(f"⚠️ 组合 {item_id} 的租约已失效，丢弃本次结果")
+            return None
+
+        item = db.query(BatchItemDB).filter(BatchItemDB.id == item_id).first()
+        counter = BatchDB.done_items if item_status == ITEM_DONE else BatchDB.failed_items
+        db_result = TestResultDB(
+            test_case_id=item.test_case_id,
+            model_id=item.model_id,
+            output=result.get("output", ""),
+            metrics=representative["metrics"],
+            score=representative["score"],
+            status=status,
+            error_message=result.get("error_message"),
+            fingerprint=fingerprint
+        )
+        db.add(db_result)
+        db.flush()
+        item.result_id = db_result.id
+        if samples:
+            BatchQueue._save_samples(db, db_result, samples)
+        # 在同一事务中原子递增批次计数，多个 worker 并发写入时不会丢失
+        increments = {counter: counter + 1}
+        if db_result.score is not None:
+            increments[BatchDB.scored_items] = BatchDB.scored_items + 1
+            increments[BatchDB.score_sum] = BatchDB.score_sum + db_result.score
+        db.query(BatchDB).filter(BatchDB.id == item.batch_id).update(increments, synchronize_session=False)
+        # 重试的组合替换上一次失败的结果
+        if previous_result_id:
+            db.query(TestResultSampleDB).filter(
+                TestResultSampleDB.result_id == previous_result_id
+            ).delete(synchronize_session=False)
+            db.query(TestResultDB).filter(TestResultDB.id == previous_result_id).delete(synchronize_session=False)
+        return item.batch_id
+
+    @staticmethod
+    def _save_samples(db: Session, db_result: TestResultDB, samples: List[Dict[str, Any]]):
+        """保存每次采样并把汇总统计写入组合结果"""
+        for index, sample in enumerate(samples):
+            sample_result = sample["result"]
+            sample_status = sample_result.get("status", "success")
+            metrics = sample["metrics"] or {}
+            db.add(TestResultSampleDB(
+                result_id=db_result.id,
+                sample_index=index,
+                output=sample_result.get("output", ""),
+                status=sample_status,
+                score=sample["score"],
+                passed=SampleStats.is_passed(sample_status, sample["score"], metrics),
+                response_time=metrics.get("response_time"),
+                total_tokens=metrics.get("total_tokens"),
+                metrics=metrics,
+                error_message=sample_result.get("error_message")
+            ))
+        db.flush()
+        summary = SampleStats.summarize(db, db_result.id)
+        metrics = dict(db_result.metrics or {})
+        metrics["samples"] = summary
+        if summary["latency_mean"] is not None:
+            metrics["response_time"] = summary["latency_mean"]
+        db_result.metrics = metrics
+        db_result.score = summary["score_mean"]
+
+    @staticmethod
+    def _finalize_if_complete(db: Session, batch_id: str):
+        """所有组合都已结束时把批次标记为完成并写出结果文件（只有一个 worker 会执行）"""
+        remaining = db.query(func.count(BatchItemDB.id)).filter(
+            BatchItemDB.batch_id == batch_id,
+            BatchItemDB.status.in_((ITEM_PENDING, ITEM_RUNNING))
+        ).scalar()
+        if remaining:
+            return
+        updated = db.query(BatchDB).filter(
+            BatchDB.id == batch_id,
+            BatchDB.status.in_((BATCH_PENDING, BATCH_RUNNING))
+        ).update({BatchDB.status: BATCH_COMPLETED, BatchDB.finished_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        if updated:
+            batch = db.query(BatchDB).filter(BatchDB.id == batch_id).first()
+            BatchQueue._write_result_file(db, batch)
+            logger.info(f"✅ 批次 {batch_id} 完成")
+
+    @staticmethod
+    def pause(db: Session, batch_id: str) -> int:
+        """
+        暂停批次：停止领取新组合，执行中的组合收回租约并放回队列（worker 会中断对应调用）
+
+        Returns:
+            被中断的执行中组合数量
+        """
+        updated = db.query(BatchDB).filter(
+            BatchDB.id == batch_id,
+            BatchDB.status.in_((BATCH_PENDING, BATCH_RUNNING))
+        ).update({BatchDB.status: BATCH_PAUSED}, synchronize_session=False)
+        if not updated:
+            db.rollback()
+            return 0
+        count = db.query(BatchItemDB).filter(
+            BatchItemDB.batch_id == batch_id,
+            BatchItemDB.status == ITEM_RUNNING
+        ).update({
+            BatchItemDB.status: ITEM_PENDING,
+            BatchItemDB.lease_owner: None,
+            BatchItemDB.lease_expires_at: None
+        }, synchronize_session=False)
+        db.commit()
+        logger.info(f"⏸️ 批次 {batch_id} 已暂停，中断 {count} 个执行中的组合")
+        return count
+
+    @staticmethod
+    def cancel(db: Session, batch_id: str) -> int:
+        """
+        取消批次：未完成的组合（含执行中的）全部标记为已取消，已完成的结果保留
+
+        Returns:
+            被取消的组合数量
+        """
+        now = datetime.utcnow()
+        updated = db.query(BatchDB).filter(
+            BatchDB.id == batch_id,
+            BatchDB.status.in_((BATCH_PENDING, BATCH_RUNNING, BATCH_PAUSED))
+        ).update({BatchDB.status: BATCH_CANCELLED, BatchDB.finished_at: now}, synchronize_session=False)
+        if not updated:
+            db.rollback()
+            return 0
+        count = db.query(BatchItemDB).filter(
+            BatchItemDB.batch_id == batch_id,
+            BatchItemDB.status.in_((ITEM_PENDING, ITEM_RUNNING))
+        ).update({
+            BatchItemDB.status: ITEM_CANCELLED,
+            BatchItemDB.lease_owner: None,
+            BatchItemDB.lease_expires_at: None,
+            BatchItemDB.finished_at: now
+        }, synchronize_session=False)
+        db.query(BatchDB).filter(BatchDB.id == batch_id).update(
+            {BatchDB.cancelled_items: BatchDB.cancelled_items + count}, synchronize_session=False
+        )
+        db.commit()
+        batch = db.query(BatchDB).filter(BatchDB.id == batch_id).first()
+        BatchQueue._write_result_file(db, batch)
+        logger.info(f"🛑 批次 {batch_id} 已取消，{count} 个组合未执行")
+        return count
+
+    @staticmethod
+    def delete(db: Session, batch_id: str) -> bool:
+        """
+        删除批次、组合、结果文件以及只属于该批次的测试结果（被其他批次复用的结果保留）
+
+        等待中和运行中的批次不能删除（需先取消或暂停），返回 False
+        """
+        batch = db.query(BatchDB).filter(BatchDB.id == batch_id).first()
+        if batch is None or batch.status in (BATCH_PENDING, BATCH_RUNNING):
+            return False
+        result_ids = [row.result_id for row in db.query(BatchItemDB.result_id).filter(
+            BatchItemDB.batch_id == batch_id,
+            BatchItemDB.result_id.isnot(None)
+        ).distinct()]
+        shared = {row.result_id for row in db.query(BatchItemDB.result_id).filter(
+            BatchItemDB.batch_id != batch_id,
+            BatchItemDB.result_id.in_(result_ids)
+        )} if result_ids else set()
+        owned = [result_id for result_id in result_ids if result_id not in shared]
+
+        db.query(BatchItemDB).filter(BatchItemDB.batch_id == batch_id).delete(synchronize_session=False)
+        if owned:
+            db.query(TestResultSampleDB).filter(TestResultSampleDB.result_id.in_(owned)).delete(synchronize_session=False)
+            db.query(TestResultDB).filter(TestResultDB.id.in_(owned)).delete(synchronize_session=False)
+        db.query(BatchDB).filter(BatchDB.id == batch_id).delete(synchronize_session=False)
+        db.commit()
+
+        result_file = settings.RESULTS_DIR / f"{batch_id}.json"
+        if result_file.exists():
+            result_file.unlink()
+        logger.info(f"🗑️ 批次 {batch_id} 已删除（{len(owned)} 条测试结果）")
+        return True
+
+    @staticmethod
+    def set_priority(db: Session, batch_id: str, priority: int) -> bool:
+        """调整批次优先级，对之后领取的组合生效"""
+        updated = db.query(BatchDB).filter(BatchDB.id == batch_id).update(
+            {BatchDB.priority: priority}, synchronize_session=False
+        )
+        db.commit()
+        return bool(updated)
+
+    @staticmethod
+    def reset_for_resume(db: Session, batch_id: str) -> int:
+        """
+        续跑批次（包括已暂停、已取消的批次）
+
+        把失败、已取消的组合和租约已过期的中断组合放回队列，返回重新排队的数量
+        """
+        now = datetime.utcnow()
+        count = db.query(BatchItemDB).filter(
+            BatchItemDB.batch_id == batch_id,
+            or_(
+                BatchItemDB.status.in_((ITEM_FAILED, ITEM_CANCELLED)),
+                and_(BatchItemDB.status == ITEM_RUNNING, BatchQueue._claimable(now))
+            )
+        ).update({
+            BatchItemDB.status: ITEM_PENDING,
+            BatchItemDB.lease_owner: None,
+            BatchItemDB.lease_expires_at: None
+        }, synchronize_session=False)
+        started = db.query(BatchDB.started_at).filter(BatchDB.id == batch_id).scalar()
+        db.query(BatchDB).filter(BatchDB.id == batch_id).update(
+            {
+                BatchDB.status: BATCH_RUNNING if started else BATCH_PENDING,
+                BatchDB.finished_at: None,
+                BatchDB.error_message: None
+            },
+            synchronize_session=False
+        )
+        db.commit()
+        BatchQueue._recount(db, batch_id)
+        BatchQueue._finalize_if_complete(db, batch_id)
+        return count
+
+    @staticmethod
+    def _recount(db: Session, batch_id: str):
+        """
+        按组合状态重新计算批次计数
+
+        结果写入、取消、早停时计数增量更新；复用结果、续跑等批量改变组合状态的操作之后调用此方法
+        """
+        counts = dict(db.query(BatchItemDB.status, func.count(BatchItemDB.id)).filter(
+            BatchItemDB.batch_id == batch_id
+        ).group_by(BatchItemDB.status).all())
+        scored, score_sum = db.query(func.count(TestResultDB.score), func.sum(TestResultDB.score)).join(
+            BatchItemDB, BatchItemDB.result_id == TestResultDB.id
+        ).filter(
+            BatchItemDB.batch_id == batch_id,
+            BatchItemDB.status.in_((ITEM_DONE, ITEM_FAILED))
+        ).one()
+        db.query(BatchDB).filter(BatchDB.id == batch_id).update({
+            BatchDB.done_items: counts.get(ITEM_DONE, 0),
+            BatchDB.failed_items: counts.get(ITEM_FAILED, 0),
+            BatchDB.cancelled_items: counts.get(ITEM_CANCELLED, 0),
+            BatchDB.skipped_items: counts.get(ITEM_SKIPPED, 0),
+            BatchDB.scored_items: scored,
+            BatchDB.score_sum: score_sum or 0.0
+        }, synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def history(
+        db: Session,
+        skip: int = 0,
+        limit: int = 50,
+        status: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        批次历史（按创建时间倒序分页，计数直接读取批次表）
+
+        Returns:
+            (当前页的历史记录, 批次总数)
+        """
+        query = db.query(BatchDB)
+        if status:
+            query = query.filter(BatchDB.status == status)
+        total = query.count()
+        batches = query.order_by(BatchDB.created_at.desc(), BatchDB.id.desc()).offset(skip).limit(limit).all()
+
+        model_ids = {m for batch in batches for m in batch.model_ids}
+        test_case_ids = {tc for batch in batches for tc in batch.test_case_ids}
+        model_names = dict(db.query(ModelConfigDB.id, ModelConfigDB.name).filter(
+            ModelConfigDB.id.in_(model_ids)
+        ).all()) if model_ids else {}
+        test_case_titles = dict(db.query(TestCaseDB.id, TestCaseDB.title).filter(
+            TestCaseDB.id.in_(test_case_ids)
+        ).all()) if test_case_ids else {}
+
+        history = []
+        for batch in batches:
+            history.append({
+                "batch_id": batch.id,
+                "timestamp": batch.created_at,
+                "status": batch.status,
+                "priority": batch.priority or 0,
+                "models": [{"id": m, "name": model_names.get(m, "Unknown")} for m in batch.model_ids],
+                "test_cases": [
+                    {"id": tc, "title": test_case_titles.get(tc, "Unknown")} for tc in batch.test_case_ids
+                ],
+                "total_tests": batch.total_items or 0,
+                "counts": {
+                    ITEM_DONE: batch.done_items or 0,
+                    ITEM_FAILED: batch.failed_items or 0,
+                    ITEM_CANCELLED: batch.cancelled_items or 0,
+                    ITEM_SKIPPED: batch.skipped_items or 0
+                },
+                "score_mean": batch.score_sum / batch.scored_items if batch.scored_items else None,
+                "finished_at": batch.finished_at
+            })
+        return history, total
+
+    @staticmethod
+    def status(db: Session, batch: BatchDB) -> Dict[str, Any]:
+        """批次状态及各状态的组合数量"""
+        counts = {state: 0 for state in (ITEM_PENDING, ITEM_RUNNING, ITEM_DONE, ITEM_FAILED, ITEM_CANCELLED, ITEM_SKIPPED)}
+        for state, count in db.query(BatchItemDB.status, func.count(BatchItemDB.id)).filter(
+            BatchItemDB.batch_id == batch.id
+        ).group_by(BatchItemDB.status):
+            counts[state] = count
+        return {
+            "id": batch.id,
+            "status": batch.status,
+            "priority": batch.priority or 0,
+            "model_ids": batch.model_ids,
+            "test_case_ids": batch.test_case_ids,
+            "total_items": batch.total_items,
+            "counts": counts,
+            "early_stopping": batch.early_stopping,
+            "error_message": batch.error_message,
+            "created_at": batch.created_at,
+            "started_at": batch.started_at,
+            "finished_at": batch.finished_at
+        }
+
+    @staticmethod
+    def _write_result_file(db: Session, batch: BatchDB):
+        """把批次结果写入 JSON 文件（兼容 /results/{batch_id} 和历史记录接口）"""
+        rows = db.query(BatchItemDB, TestResultDB).join(
+            TestResultDB, BatchItemDB.result_id == TestResultDB.id
+        ).filter(BatchItemDB.batch_id == batch.id).order_by(BatchItemDB.position).all()
+        models = db.query(ModelConfigDB).filter(ModelConfigDB.id.in_(batch.model_ids)).all()
+        test_cases = db.query(TestCaseDB).filter(TestCaseDB.id.in_(batch.test_case_ids)).all()
+
+        result_file = settings.RESULTS_DIR / f"{batch.id}.json"
+        with open(result_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "batch_id": batch.id,
+                "timestamp": (batch.created_at or datetime.now()).isoformat(),
+                "models": [{"id": m.id, "name": m.name} for m in models],
+                "test_cases": [{"id": tc.id, "title": tc.title} for tc in test_cases],
+                "early_stopping": batch.early_stopping,
+                "results": [
+                    {
+                        "test_case_id": item.test_case_id,
+                        "model_id": item.model_id,
+                        "status": result.status,
+                        "metrics": result.metrics
+                    }
+                    for item, result in rows
+                ]
+            }, f, ensure_ascii=False, indent=2, default=str)
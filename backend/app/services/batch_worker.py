@@ -0,0 +1,239 @@
+"""批量测试 worker - 从数据库领取组合并发执行，可运行在 API 进程内或独立进程中"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Dict, Any, Optional
+
+from app.config import settings
+from app.services.batch_executor import BatchExecutor, ConcurrencyLimiter
+from app.services.batch_queue import BatchQueue
+from app.services.result_writer import ResultWriter
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWorker:
+    """
+    批量测试 worker
+
+    循环领取组合（带租约）并发执行，执行期间定期续约，完成后保存结果
+    （由 ResultWriter 把同一时间段内完成的结果合并到一个事务中提交）。
+    多个 worker（同机多进程或多台机器）可以同时消费同一个批次。
+
+    并发限制：concurrency 为本 worker 的全局上限；批次的 max_concurrency
+    和模型的 max_concurrency 在每个 worker 内分别生效。排队等待槽位时按批次优先级分配。
+
+    批次被暂停或取消时组合的租约被收回，worker 定期检查并中断对应的执行中调用。
+    """
+
+    _wakeup: Optional[asyncio.Event] = None
+    _revoke_check: Optional[asyncio.Event] = None
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        batch_id: Optional[str] = None
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = max(1, concurrency or settings.BATCH_MAX_CONCURRENCY)
+        self.batch_id = batch_id
+        self._inflight: Dict[int, asyncio.Task] = {}
+        # 批次级并发限制：本 worker 中该批次还有执行中的组合时才保留（批次结束、取消或不再领取后释放）
+        self._batch_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._batch_inflight: Dict[str, int] = {}
+        self._stopping = False
+        self._writer: Optional[ResultWriter] = None
+
+    @classmethod
+    def wake(cls):
+        """通知本进程内的 worker 立即领取新组合（新建或续跑批次后调用）"""
+        if cls._wakeup is not None:
+            cls._wakeup.set()
+
+    @classmethod
+    def check_revoked(cls):
+        """通知本进程内的 worker 立即检查被收回的组合（暂停或取消批次后调用）"""
+        if cls._revoke_check is not None:
+            cls._revoke_check.set()
+
+    def stop(self):
+        """停止领取新组合，执行中的组合完成后退出"""
+        logger.info(f"🛑 worker {self.worker_id} 正在停止，等待 {len(self._inflight)} 个执行中的组合")
+        self._stopping = True
+        self.wake()
+
+    async def run(self, drain: bool = False):
+        """
+        运行 worker
+
+        Args:
+            drain: 为 True 时没有可领取的组合且本地无执行中的组合即退出（用于一次性消费）
+        """
+        wakeup = asyncio.Event()
+        revoke_check = asyncio.Event()
+        BatchWorker._wakeup = wakeup
+        BatchWorker._revoke_check = revoke_check
+        limiter = ConcurrencyLimiter(self.concurrency)
+        self._writer = ResultWriter(self.worker_id)
+        self._writer.start()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        watcher = asyncio.create_task(self._watch_revoked(revoke_check))
+        logger.info(f"👷 worker {self.worker_id} 启动，并发上限 {self.concurrency}")
+
+        try:
+            while not self._stopping:
+                wakeup.clear()
+                claimed = []
+                free = self.concurrency - len(self._inflight)
+                if free > 0:
+                    claimed = await asyncio.to_thread(
+                        BatchQueue.claim_items, self.worker_id, free, settings.BATCH_LEASE_SECONDS, self.batch_id
+                    )
+                for entry in claimed:
+                    task = asyncio.create_task(self._execute(entry, limiter))
+                    self._inflight[entry["item_id"]] = task
+                    task.add_done_callback(
+                        lambda _, item_id=entry["item_id"]: (self._inflight.pop(item_id, None), wakeup.set())
+                    )
+                if claimed:
+                    continue
+                if drain and not self._inflight:
+                    break
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=settings.BATCH_WORKER_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+            if self._inflight:
+                await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        except asyncio.CancelledError:
+            # 被取消（进程关闭）：中断执行中的组合，保存已完成的结果后释放租约，由其他 worker 或下次启动继续
+            for task in self._inflight.values():
+                task.cancel()
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+            await self._writer.close()
+            released = await asyncio.to_thread(BatchQueue.release_leases, self.worker_id)
+            logger.warning(f"⏸️ worker {self.worker_id} 被中断，释放 {released} 个组合")
+            raise
+        finally:
+            await self._writer.close()
+            heartbeat.cancel()
+            watcher.cancel()
+            await asyncio.gather(heartbeat, watcher, return_exceptions=True)
+            if BatchWorker._wakeup is wakeup:
+                BatchWorker._wakeup = None
+            if BatchWorker._revoke_check is revoke_check:
+                BatchWorker._revoke_check = None
+            logger.info(f"👋 worker {self.worker_id} 已退出")
+
+    async def _heartbeat(self):
+        """定期为执行中的组合续约"""
+        interval = max(1.0, settings.BATCH_LEASE_SECONDS / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(
+                    BatchQueue.renew_leases, self.worker_id, list(self._inflight), settings.BATCH_LEASE_SECONDS
+                )
+            except Exception as e:
+                logger.error(f"❌ 续约失败: {e}")
+
+    async def _watch_revoked(self, revoke_check: asyncio.Event):
+        """定期检查执行中的组合是否被收回，被收回的立即取消（不再消耗模型调用额度）"""
+        while True:
+            try:
+                await asyncio.wait_for(revoke_check.wait(), timeout=settings.BATCH_WORKER_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            revoke_check.clear()
+            if not self._inflight:
+                continue
+            try:
+                revoked = await asyncio.to_thread(BatchQueue.revoked_items, self.worker_id, list(self._inflight))
+            except Exception as e:
+                logger.error(f"❌ 检查组合状态失败: {e}")
+                continue
+            for item_id in revoked:
+                task = self._inflight.get(item_id)
+                if task is not None:
+                    logger.info(f"✂️ 组合 {item_id} 已被收回，中断执行")
+                    task.cancel()
+
+    def _batch_semaphore(self, batch_id: str, options: Dict[str, Any]) -> Optional[asyncio.Semaphore]:
+        limit = options.get("max_concurrency")
+        if not limit:
+            return None
+        if batch_id not in self._batch_semaphores:
+            self._batch_semaphores[batch_id] = asyncio.Semaphore(limit)
+        self._batch_inflight[batch_id] = self._batch_inflight.get(batch_id, 0) + 1
+        return self._batch_semaphores[batch_id]
+
+    def _release_batch_semaphore(self, batch_id: str):
+        """本 worker 中该批次的最后一个组合结束时删除批次信号量"""
+        remaining = self._batch_inflight.get(batch_id, 0) - 1
+        if remaining > 0:
+            self._batch_inflight[batch_id] = remaining
+        else:
+            self._batch_inflight.pop(batch_id, None)
+            self._batch_semaphores.pop(batch_id, None)
+
+    async def _execute(self, entry: Dict[str, Any], limiter: ConcurrencyLimiter):
+        """执行一个已领取的组合，结果交给 ResultWriter 写入（只有自适应批次等待写入完成）"""
+        semaphore = self._batch_semaphore(entry["batch_id"], entry["options"])
+        if semaphore is None:
+            outcome = await self._execute_pair(entry, limiter)
+        else:
+            try:
+                async with semaphore:
+                    outcome = await self._execute_pair(entry, limiter)
+            finally:
+                self._release_batch_semaphore(entry["batch_id"])
+        # 自适应批次的早停决策在写入结果时作出，需等待写入完成再领取下一个组合，否则会多执行已被早停的组合
+        adaptive = bool(entry["options"].get("adaptive"))
+        saved = self._writer.submit(entry["item_id"], outcome, entry.get("fingerprint"), urgent=adaptive)
+        if adaptive:
+            await asyncio.shield(saved)
+
+    @staticmethod
+    async def _execute_pair(entry: Dict[str, Any], limiter: ConcurrencyLimiter) -> Dict[str, Any]:
+        """执行组合；n_samples > 1 时并发采样多次（每次采样各占一个执行槽位）"""
+        n_samples = entry["options"].get("n_samples") or 1
+        if n_samples <= 1:
+            return await BatchWorker._execute_sample(entry, limiter, entry["options"].get("use_cache"))
+        # 多次采样必须真实调用，不能命中响应缓存
+        samples = await asyncio.gather(*(
+            BatchWorker._execute_sample(entry, limiter, False) for _ in range(n_samples)
+        ))
+        return {"samples": list(samples)}
+
+    @staticmethod
+    async def _execute_sample(
+        entry: Dict[str, Any],
+        limiter: ConcurrencyLimiter,
+        use_cache: Optional[bool]
+    ) -> Dict[str, Any]:
+        test_case = entry["test_case"]
+        model = entry["model"]
+        options = entry["options"]
+        async with limiter.slot(model, entry.get("priority", 0)):
+            try:
+                return await BatchExecutor.execute_pair(
+                    test_case,
+                    model,
+                    entry["tools"],
+                    entry["tools_config"],
+                    entry["params"],
+                    use_cache,
+                    options.get("virtual_clock"),
+                    options.get("force_stream", False)
+                )
+            except Exception as e:
+                logger.error(f"❌ 组合执行失败 (case={test_case.id}, model={model.id}): {e}")
+                return {
+                    "result": {"output": "", "status": "error", "error_message": str(e)},
+                    "metrics": {},
+                    "score": None
+                }
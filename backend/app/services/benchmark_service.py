@@ -0,0 +1,204 @@
+"""压测服务 - 在递增的并发级别下回放测试用例，测量端点吞吐与延迟"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, List
+
+from app.config import settings
+from app.models.model_config import ModelConfigDB
+from app.models.test_case import TestCaseDB
+from app.services.client_pool import ClientPool
+from app.services.llm_service import LLMService
+from app.services.resilience import resolve_policy
+from app.utils import stats
+
+logger = logging.getLogger(__name__)
+
+
+class BenchmarkService:
+    """
+    并发扫描压测
+
+    每个并发级别使用闭环负载：N 个 worker 持续从请求队列取任务，
+    一个请求完成后立即发起下一个，直到本级别的请求全部完成。
+
+    压测直接调用端点（绕过限流、重试、熔断和响应缓存），并使用按最大并发级别设置连接数的
+    独立连接池，测得的是端点本身的容量，而不是本地客户端的节流策略。
+    """
+
+    @staticmethod
+    def default_levels(max_concurrency: int) -> List[int]:
+        """生成 1, 2, 4, ... 直到 max_concurrency 的并发级别"""
+        levels = []
+        level = 1
+        while level < max_concurrency:
+            levels.append(level)
+            level *= 2
+        levels.append(max_concurrency)
+        return levels
+
+    @staticmethod
+    async def run_sweep(
+        model: ModelConfigDB,
+        test_cases: List[TestCaseDB],
+        concurrency_levels: List[int],
+        requests_per_level: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+        stream: bool = True
+    ) -> Dict[str, Any]:
+        """
+        依次在每个并发级别下压测
+
+        Args:
+            model: 模型配置
+            test_cases: 回放的测试用例（按顺序循环使用）
+            concurrency_levels: 并发级别列表
+            requests_per_level: 每个级别的请求数（为空时取 并发数×倍数 与用例数的较大值）
+            params: 覆盖模型参数
+            stream: 是否流式调用（流式时可测量首token延迟）
+
+        Returns:
+            {"levels": 各级别汇总, "saturation": 饱和点分析}
+        """
+        levels = []
+        async with ClientPool.dedicated(max(concurrency_levels)):
+            for concurrency in concurrency_levels:
+                total = requests_per_level or max(
+                    concurrency * settings.BENCHMARK_REQUESTS_PER_WORKER, len(test_cases)
+                )
+                logger.info(f"🏋️ 压测 {model.name}: 并发 {concurrency}，请求数 {total}")
+                samples, wall_time = await BenchmarkService._run_level(
+                    model, test_cases, concurrency, total, params, stream
+                )
+                summary = BenchmarkService.summarize_level(concurrency, samples, wall_time)
+                levels.append(summary)
+                logger.info(
+                    f"📊 并发 {concurrency}: {summary['throughput_rps']:.2f} req/s, "
+                    f"p95 {summary['latency_p95']}, 错误率 {summary['error_rate']:.1%}"
+                )
+        return {"levels": levels, "saturation": BenchmarkService.find_saturation(levels)}
+
+    @staticmethod
+    async def _run_level(
+        model: ModelConfigDB,
+        test_cases: List[TestCaseDB],
+        concurrency: int,
+        total: int,
+        params: Optional[Dict[str, Any]],
+        stream: bool
+    ):
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(total):
+            queue.put_nowait(test_cases[i % len(test_cases)])
+        samples = []
+
+        async def worker():
+            while True:
+                try:
+                    test_case = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                samples.append(await BenchmarkService._one_request(model, test_case, params, stream))
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples, time.monotonic() - started
+
+    @staticmethod
+    async def _one_request(
+        model: ModelConfigDB,
+        test_case: TestCaseDB,
+        params: Optional[Dict[str, Any]],
+        stream: bool
+    ) -> Dict[str, Any]:
+        """
+        直接发起单个请求并记录延迟
+
+        不经过 call_model：限流会让请求在本地排队、重试会掩盖429、熔断会快速失败，
+        这些都会把客户端策略计入端点的延迟和错误率。429 原样计为错误。
+        """
+        model_params = {**(model.default_params or {}), **(params or {})}
+        timeout = resolve_policy(model).timeout
+        started = time.monotonic()
+
+        async def request():
+            result = await LLMService._dispatch(
+                model, test_case.prompt, test_case.system_prompt, model_params,
+                stream, None, test_case.conversation_history
+            )
+            if stream and not isinstance(result, dict):
+                result = await LLMService.collect_stream(result)
+            return result
+
+        try:
+            result = await asyncio.wait_for(request(), timeout=timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "timeout", "metrics": {}, "error_message": f"请求超时（{timeout:.1f}s）"}
+        except Exception as e:
+            result = {"status": "error", "metrics": {}, "error_message": str(e)}
+        metrics = result.get("metrics") or {}
+        return {
+            "latency": time.monotonic() - started,
+            "success": result.get("status") == "success",
+            "rate_limited": result.get("status_code") == 429,
+            "ttft": metrics.get("time_to_first_token"),
+            "completion_tokens": metrics.get("completion_tokens", 0)
+        }
+
+    @staticmethod
+    def summarize_level(concurrency: int, samples: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+        """汇总单个并发级别的指标（延迟单位：秒）"""
+        succeeded = [s for s in samples if s["success"]]
+        latencies = [s["latency"] for s in succeeded]
+        ttfts = [s["ttft"] for s in succeeded if s["ttft"] is not None]
+        output_tokens = sum(s["completion_tokens"] for s in succeeded)
+        return {
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "successes": len(succeeded),
+            "rate_limited": sum(1 for s in samples if s.get("rate_limited")),
+            "error_rate": (len(samples) - len(succeeded)) / len(samples) if samples else 0.0,
+            "wall_time": wall_time,
+            "throughput_rps": len(succeeded) / wall_time if wall_time > 0 else 0.0,
+            "output_tokens_per_second": output_tokens / wall_time if wall_time > 0 else 0.0,
+            "latency_mean": stats.mean(latencies),
+            "latency_p50": stats.percentile(latencies, 50),
+            "latency_p95": stats.percentile(latencies, 95),
+            "latency_p99": stats.percentile(latencies, 99),
+            "ttft_p50": stats.percentile(ttfts, 50),
+            "ttft_p95": stats.percentile(ttfts, 95)
+        }
+
+    @staticmethod
+    def find_saturation(levels: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        识别饱和点
+
+        从低到高检查各级别，出现以下任一情况即视为已饱和，饱和点取上一个级别：
+        - 吞吐提升低于 BENCHMARK_SATURATION_GAIN（例如并发翻倍但吞吐只增加不到10%）
+        - 错误率超过 BENCHMARK_MAX_ERROR_RATE
+        """
+        if not levels:
+            return {"concurrency": None, "reason": "无压测数据"}
+        best = levels[0]
+        if best["error_rate"] > settings.BENCHMARK_MAX_ERROR_RATE:
+            return {"concurrency": None, "reason": f"并发 {best['concurrency']} 时错误率已达 {best['error_rate']:.1%}"}
+        for level in levels[1:]:
+            if level["error_rate"] > settings.BENCHMARK_MAX_ERROR_RATE:
+                return {
+                    "concurrency": best["concurrency"],
+                    "throughput_rps": best["throughput_rps"],
+                    "reason": f"并发 {level['concurrency']} 时错误率升至 {level['error_rate']:.1%}"
+                }
+            if level["throughput_rps"] < best["throughput_rps"] * (1 + settings.BENCHMARK_SATURATION_GAIN):
+                return {
+                    "concurrency": best["concurrency"],
+                    "throughput_rps": best["throughput_rps"],
+                    "reason": f"并发 {level['concurrency']} 时吞吐不再显著提升"
+                }
+            best = level
+        return {
+            "concurrency": best["concurrency"],
+            "throughput_rps": best["throughput_rps"],
+            "reason": "在测试的最大并发内未饱和"
+        }
@@ -0,0 +1,150 @@
+"""大模型客户端连接池 - 复用长连接，避免每次调用重新握手"""
+import asyncio
+import hashlib
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 当前任务使用的独立连接池：(作用域ID, 最大连接数)，为空时使用共享连接池
+_scope: ContextVar[Optional[Tuple[str, int]]] = ContextVar("client_pool_scope", default=None)
+
+
+class ClientPool:
+    """
+    按 (provider, endpoint, api_key) 缓存的客户端注册表
+
+    每个键对应一个共享连接池的 httpx.AsyncClient，OpenAI/Anthropic SDK 客户端
+    复用该连接池。httpx 连接池绑定事件循环，因此键中还包含当前事件循环，
+    避免在不同事件循环（如测试或独立 worker）之间复用失效的连接。
+
+    dedicated() 作用域内（包括其中创建的子任务）使用独立的连接池，连接数上限由调用方指定。
+    """
+
+    _http_clients: Dict[Tuple, httpx.AsyncClient] = {}
+    _sdk_clients: Dict[Tuple, Any] = {}
+    _http2_warned: bool = False
+
+    @staticmethod
+    def _key(provider: str, endpoint: Optional[str], api_key: Optional[str]) -> Tuple:
+        """构建注册表键（API密钥只保存摘要）"""
+        key_digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else ""
+        scope = _scope.get()
+        return (id(asyncio.get_running_loop()), provider, endpoint or "", key_digest, scope[0] if scope else "")
+
+    @classmethod
+    def _http2_enabled(cls) -> bool:
+        """HTTP/2 需要可选依赖 h2（pip install httpx[http2]）"""
+        if not settings.HTTP2_ENABLED:
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            if not cls._http2_warned:
+                logger.warning("⚠️ 已启用 HTTP2_ENABLED 但未安装 h2，回退到 HTTP/1.1")
+                cls._http2_warned = True
+            return False
+
+    @classmethod
+    def _get_http_client(cls, key: Tuple) -> httpx.AsyncClient:
+        client = cls._http_clients.get(key)
+        if client is None or client.is_closed:
+            scope = _scope.get()
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=scope[1] if scope else settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=scope[1] if scope else settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+                http2=cls._http2_enabled()
+            )
+            cls._http_clients[key] = client
+            # 连接池重建后，依赖它的SDK客户端也需要重建
+            cls._sdk_clients.pop(key, None)
+            logger.info(f"🔌 创建连接池: {key[1]} {key[2] or '(default endpoint)'}")
+        return client
+
+    @classmethod
+    def get_openai_client(cls, api_key: Optional[str], base_url: Optional[str]) -> AsyncOpenAI:
+        """获取（或创建）OpenAI兼容客户端"""
+        key = cls._key("openai", base_url, api_key)
+        http_client = cls._get_http_client(key)
+        client = cls._sdk_clients.get(key)
+        if client is None:
+            # 关闭SDK内置重试，由限流器和容错策略统一处理
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+            cls._sdk_clients[key] = client
+        return client
+
+    @classmethod
+    def get_anthropic_client(cls, api_key: Optional[str]) -> AsyncAnthropic:
+        """获取（或创建）Anthropic客户端"""
+        key = cls._key("anthropic", None, api_key)
+        http_client = cls._get_http_client(key)
+        client = cls._sdk_clients.get(key)
+        if client is None:
+            client = AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
+            cls._sdk_clients[key] = client
+        return client
+
+    @classmethod
+    def get_http_client(cls, provider: str, endpoint: str) -> httpx.AsyncClient:
+        """获取（或创建）原生HTTP客户端（本地模型等）"""
+        return cls._get_http_client(cls._key(provider, endpoint, None))
+
+    @classmethod
+    @asynccontextmanager
+    async def dedicated(cls, max_connections: int):
+        """
+        在独立连接池中执行（退出时关闭）
+
+        压测按最大并发级别设置连接数：共享连接池的 HTTP_MAX_CONNECTIONS 上限会让超过它的并发级别
+        在本地排队，测出虚假的饱和点；独立连接池也不会占用正在运行的批次的连接。
+        """
+        scope_id = uuid.uuid4().hex
+        token = _scope.set((scope_id, max_connections))
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+            keys = [key for key in cls._http_clients if key[-1] == scope_id]
+            for key in keys:
+                cls._sdk_clients.pop(key, None)
+                client = cls._http_clients.pop(key)
+                if not client.is_closed:
+                    await client.aclose()
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """连接池统计"""
+        return {
+            "http_clients": sum(1 for c in cls._http_clients.values() if not c.is_closed),
+            "sdk_clients": len(cls._sdk_clients)
+        }
+
+    @classmethod
+    async def close_all(cls):
+        """关闭所有连接池（应用关闭时调用）"""
+        clients = list(cls._http_clients.values())
+        cls._http_clients.clear()
+        cls._sdk_clients.clear()
+        for client in clients:
+            if client.is_closed:
+                continue
+            try:
+                await client.aclose()
+            except Exception as e:
+                # 其他事件循环创建的连接池可能无法在当前循环中关闭
+                logger.warning(f"⚠️ 关闭连接池失败: {e}")
+        logger.info(f"🔌 已关闭 {len(clients)} 个连接池")
@@ -0,0 +1,209 @@
+"""多模型对比查询 - 连表分页查询结果，SQL 聚合各模型汇总指标"""
+from typing import Dict, Any, Optional, List, Tuple
+
+from sqlalchemy import func, case, or_
+from sqlalchemy.orm import Session
+
+from app.models.batch_job import BatchItemDB
+from app.models.model_config import ModelConfigDB
+from app.models.test_case import TestCaseDB
+from app.models.test_result import TestResultDB
+
+# 视为成功的结果状态（与批量队列一致）
+SUCCESS_STATUSES = ("success", "max_iterations_reached")
+
+# 汇总中计算的延迟分位数
+LATENCY_PERCENTILES = (50, 90, 95)
+
+
+class CompareService:
+    """多模型对比服务"""
+
+    @staticmethod
+    def _filters(
+        db: Session,
+        model_ids: List[int],
+        test_case_ids: List[int],
+        batch_id: Optional[str] = None,
+        latest_only: bool = False
+    ) -> list:
+        """
+        结果过滤条件
+
+        batch_id 不为空时只包含该批次的结果；latest_only=True 时每个 (测试用例, 模型) 只取最新一条
+        """
+        filters = [
+            TestResultDB.model_id.in_(model_ids),
+            TestResultDB.test_case_id.in_(test_case_ids)
+        ]
+        if batch_id:
+            filters.append(TestResultDB.id.in_(
+                db.query(BatchItemDB.result_id).filter(
+                    BatchItemDB.batch_id == batch_id,
+                    BatchItemDB.result_id.isnot(None)
+                )
+            ))
+        if latest_only:
+            filters.append(TestResultDB.id.in_(
+                db.query(func.max(TestResultDB.id)).filter(*filters).group_by(
+                    TestResultDB.test_case_id, TestResultDB.model_id
+                )
+            ))
+        return filters
+
+    @staticmethod
+    def results(
+        db: Session,
+        model_ids: List[int],
+        test_case_ids: List[int],
+        skip: int = 0,
+        limit: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        latest_only: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        按测试用例分组的对比结果（按测试用例分页）
+
+        Returns:
+            (当前页的分组结果, 有结果的测试用例总数)
+        """
+        filters = CompareService._filters(db, model_ids, test_case_ids, batch_id, latest_only)
+
+        case_query = db.query(TestResultDB.test_case_id).filter(*filters).distinct()
+        total = case_query.count()
+        case_query = case_query.order_by(TestResultDB.test_case_id).offset(skip)
+        if limit is not None:
+            case_query = case_query.limit(limit)
+        page_case_ids = [row.test_case_id for row in case_query]
+        if not page_case_ids:
+            return [], total
+
+        rows = db.query(
+            TestResultDB,
+            TestCaseDB.title,
+            TestCaseDB.prompt,
+            TestCaseDB.expected_output,
+            TestCaseDB.expected_tool_calls,
+            ModelConfigDB.name
+        ).outerjoin(
+            TestCaseDB, TestCaseDB.id == TestResultDB.test_case_id
+        ).outerjoin(
+            ModelConfigDB, ModelConfigDB.id == TestResultDB.model_id
+        ).filter(
+            *filters,
+            TestResultDB.test_case_id.in_(page_case_ids)
+        ).order_by(TestResultDB.test_case_id, TestResultDB.id).all()
+
+        grouped: Dict[int, Dict[str, Any]] = {}
+        for result, title, prompt, expected_output, expected_tool_calls, model_name in rows:
+            group = grouped.get(result.test_case_id)
+            if group is None:
+                group = grouped[result.test_case_id] = {
+                    "test_case_id": result.test_case_id,
+                    "test_case_title": title or "Unknown",
+                    "test_case_prompt": prompt or "",
+                    "expected_output": expected_output or "",
+                    "expected_tool_calls": expected_tool_calls,
+                    "results": []
+                }
+            group["results"].append({
+                "result_id": result.id,
+                "model_id": result.model_id,
+                "model_name": model_name or "Unknown",
+                "output": result.output,
+                "metrics": result.metrics,
+                "score": result.score,
+                "status": result.status
+            })
+        return list(grouped.values()), total
+
+    @staticmethod
+    def summary(
+        db: Session,
+        model_ids: List[int],
+        test_case_ids: List[int],
+        batch_id: Optional[str] = None,
+        latest_only: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        各模型的汇总指标（全部在数据库中聚合）
+
+        均值、成功率、token 用 GROUP BY 聚合；延迟分位数用窗口函数按最近秩法取值。
+        缓存命中率只统计这些结果自己的查询（单次调用的 cache_hit，Agent 多轮调用的 cache_hits/cache_misses），
+        按批次过滤时即为该批次的命中率，不受同一进程中其他任务的影响。
+        """
+        filters = CompareService._filters(db, model_ids, test_case_ids, batch_id, latest_only)
+        latency = TestResultDB.metrics["response_time"].as_float()
+        tokens = TestResultDB.metrics["total_tokens"].as_float()
+        success = case((TestResultDB.status.in_(SUCCESS_STATUSES), 1), else_=0)
+        cache_hit = TestResultDB.metrics["cache_hit"].as_boolean()
+        agent_hits = func.coalesce(TestResultDB.metrics["cache_hits"].as_integer(), 0)
+        agent_misses = func.coalesce(TestResultDB.metrics["cache_misses"].as_integer(), 0)
+        cache_hits = case((cache_hit.is_(True), 1), else_=0) + agent_hits
+        cache_lookups = case((cache_hit.isnot(None), 1), else_=0) + agent_hits + agent_misses
+
+        rows = db.query(
+            TestResultDB.model_id,
+            func.count(TestResultDB.id),
+            func.sum(success),
+            func.avg(TestResultDB.score),
+            func.count(TestResultDB.score),
+            func.min(TestResultDB.score),
+            func.max(TestResultDB.score),
+            func.avg(latency),
+            func.avg(tokens),
+            func.sum(tokens),
+            func.count(func.distinct(TestResultDB.test_case_id)),
+            func.sum(cache_hits),
+            func.sum(cache_lookups)
+        ).filter(*filters).group_by(TestResultDB.model_id).all()
+
+        names = dict(db.query(ModelConfigDB.id, ModelConfigDB.name).filter(ModelConfigDB.id.in_(model_ids)).all())
+        summaries = {}
+        for (model_id, total, succeeded, score_mean, scored, score_min, score_max, latency_mean, tokens_mean,
+             tokens_total, cases, hits, lookups) in rows:
+            summaries[model_id] = {
+                "model_id": model_id,
+                "model_name": names.get(model_id, "Unknown"),
+                "total": total,
+                "test_cases": cases,
+                "success_rate": (succeeded or 0) / total if total else None,
+                "score_mean": score_mean,
+                "scored": scored,
+                "score_min": score_min,
+                "score_max": score_max,
+                "latency_mean": latency_mean,
+                "tokens_mean": tokens_mean,
+                "tokens_total": int(tokens_total) if tokens_total is not None else None,
+                "cache_hits": int(hits or 0),
+                "cache_lookups": int(lookups or 0),
+                "cache_hit_rate": hits / lookups if lookups else None,
+                **{f"latency_p{p}": None for p in LATENCY_PERCENTILES}
+            }
+
+        for model_id, percentile, value in CompareService._latency_percentiles(db, filters, latency):
+            if model_id in summaries:
+                summaries[model_id][f"latency_p{percentile}"] = value
+
+        return [summaries[model_id] for model_id in model_ids if model_id in summaries]
+
+    @staticmethod
+    def _latency_percentiles(db: Session, filters: list, latency) -> List[Tuple[int, int, float]]:
+        """延迟分位数（最近秩法：第 ceil(p% × n) 个值），返回 [(model_id, p, value)]"""
+        ranked = db.query(
+            TestResultDB.model_id.label("model_id"),
+            latency.label("latency"),
+            func.row_number().over(partition_by=TestResultDB.model_id, order_by=latency).label("rank"),
+            func.count().over(partition_by=TestResultDB.model_id).label("n")
+        ).filter(*filters, latency.isnot(None)).subquery()
+
+        # 整数运算实现 ceil(n * p / 100)，兼容不支持 ceil 的数据库
+        rows = db.query(ranked.c.model_id, ranked.c.rank, ranked.c.n, ranked.c.latency).filter(
+            or_(*(ranked.c.rank == (ranked.c.n * p + 99) // 100 for p in LATENCY_PERCENTILES))
+        ).all()
+        values = []
+        for model_id, rank, n, value in rows:
+            for p in LATENCY_PERCENTILES:
+                if rank == (n * p + 99) // 100:
+                    values.append((model_id, p, value))
+        return values
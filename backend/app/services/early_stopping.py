@@ -0,0 +1,163 @@
+"""自适应早停 - 模型对比批次中提前停止明显落后模型的调用"""
+import logging
+import math
+from datetime import datetime
+from statistics import NormalDist
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.batch_job import BatchDB, BatchItemDB, ITEM_PENDING, ITEM_DONE, ITEM_FAILED, ITEM_SKIPPED
+from app.models.test_result import TestResultDB
+
+logger = logging.getLogger(__name__)
+
+
+class EarlyStopping:
+    """
+    自适应早停
+
+    批次的组合按 测试用例 × 模型 交错排列，各模型的已完成用例数保持接近。
+    每完成一个组合后，按模型计算得分均值的 Wilson 置信区间（失败或未评分的组合按 0 分计）；
+    当某个模型的区间上界低于领先模型的区间下界时，跳过该模型剩余的组合。
+    多个模型同时与领先模型比较，置信水平按 Bonferroni 方法校正。
+    """
+
+    @staticmethod
+    def confidence_interval(n: int, mean: float, std: float, confidence: float) -> Tuple[float, float]:
+        """
+        得分均值（0-1）的 Wilson 置信区间
+
+        正态近似区间的宽度与样本标准差成正比，前几个用例得分完全相同时宽度为 0，
+        会在极少的样本上就判定停止。Wilson 区间额外包含 z²/4n² 项并向 0.5 收缩，
+        样本方差为 0 时区间仍有宽度，随用例数增加再逐渐收窄；二值得分时即为比例的 Wilson 区间。
+        """
+        if n < 2:
+            return (-math.inf, math.inf)
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        z2_n = z * z / n
+        center = (mean + z2_n / 2) / (1 + z2_n)
+        half_width = z / (1 + z2_n) * math.sqrt(std * std / n + z2_n / (4 * n))
+        return (max(0.0, center - half_width), min(1.0, center + half_width))
+
+    @staticmethod
+    def model_scores(db: Session, batch_id: str) -> Dict[int, Dict[str, float]]:
+        """按模型聚合已完成组合的得分：数量、均值、样本标准差"""
+        score = func.coalesce(TestResultDB.score, 0.0)
+        rows = db.query(
+            BatchItemDB.model_id,
+            func.count(TestResultDB.id),
+            func.avg(score),
+            func.avg(score * score)
+        ).join(TestResultDB, BatchItemDB.result_id == TestResultDB.id).filter(
+            BatchItemDB.batch_id == batch_id,
+            BatchItemDB.status.in_((ITEM_DONE, ITEM_FAILED))
+        ).group_by(BatchItemDB.model_id).all()
+
+        scores = {}
+        for model_id, n, mean, mean_square in rows:
+            variance = max(0.0, (mean_square - mean * mean) * n / (n - 1)) if n > 1 else 0.0
+            scores[model_id] = {"n": n, "mean": mean, "std": math.sqrt(variance)}
+        return scores
+
+    @staticmethod
+    def evaluate(
+        scores: Dict[int, Dict[str, float]],
+        model_ids: list,
+        confidence: float,
+        min_cases: int,
+        stopped: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        根据各模型的得分作出早停决策
+
+        Args:
+            scores: model_scores 的返回值
+            model_ids: 批次中的全部模型
+            confidence: 整体置信水平（如 0.95）
+            min_cases: 每个模型至少完成的用例数，少于此数不作判断
+            stopped: 之前的决策（已停止的模型保持停止）
+
+        Returns:
+            {"leader": 领先模型ID, "models": {model_id: {"n", "mean", "ci", "stopped", ...}}}
+        """
+        stopped = stopped or {}
+        active = [m for m in model_ids if m in scores and not (stopped.get(str(m)) or {}).get("stopped")]
+        comparisons = max(1, len(model_ids) - 1)
+        corrected = 1 - (1 - confidence) / comparisons
+
+        intervals = {
+            m: EarlyStopping.confidence_interval(s["n"], s["mean"], s["std"], corrected)
+            for m, s in scores.items()
+        }
+        leader = max(active, key=lambda m: scores[m]["mean"]) if active else None
+
+        decisions = {}
+        for model_id in model_ids:
+            previous = stopped.get(str(model_id)) or {}
+            stats = scores.get(model_id)
+            entry = {
+                "n": stats["n"] if stats else 0,
+                "mean": stats["mean"] if stats else None,
+                "ci": list(intervals[model_id]) if stats and stats["n"] >= 2 else None,
+                "stopped": bool(previous.get("stopped"))
+            }
+            if entry["stopped"]:
+                entry["stopped_at"] = previous.get("stopped_at")
+                entry["reason"] = previous.get("reason")
+            elif (
+                leader is not None and model_id != leader and stats
+                and stats["n"] >= min_cases and scores[leader]["n"] >= min_cases
+                and intervals[model_id][1] < intervals[leader][0]
+            ):
+                entry["stopped"] = True
+                entry["stopped_at"] = stats["n"]
+                entry["reason"] = (
+                    f"得分区间上界 {intervals[model_id][1]:.3f} 低于领先模型 {leader} 的区间下界 "
+                    f"{intervals[leader][0]:.3f}（{confidence:.0%} 置信）"
+                )
+            decisions[str(model_id)] = entry
+        return {"leader": leader, "confidence": confidence, "min_cases": min_cases, "models": decisions}
+
+    @staticmethod
+    def apply(db: Session, batch_id: str) -> int:
+        """
+        对自适应批次执行早停检查，跳过新停止模型的待执行组合并记录决策
+
+        Returns:
+            本次跳过的组合数量
+        """
+        batch = db.query(BatchDB).filter(BatchDB.id == batch_id).first()
+        options = (batch.options or {}) if batch else {}
+        if not options.get("adaptive"):
+            return 0
+        confidence = options.get("confidence") or settings.BATCH_ADAPTIVE_CONFIDENCE
+        min_cases = options.get("min_cases") or settings.BATCH_ADAPTIVE_MIN_CASES
+
+        previous = (batch.early_stopping or {}).get("models", {})
+        decision = EarlyStopping.evaluate(
+            EarlyStopping.model_scores(db, batch_id), batch.model_ids, confidence, min_cases, previous
+        )
+        newly_stopped = [
+            int(model_id) for model_id, entry in decision["models"].items()
+            if entry["stopped"] and not (previous.get(model_id) or {}).get("stopped")
+        ]
+        skipped = 0
+        if newly_stopped:
+            skipped = db.query(BatchItemDB).filter(
+                BatchItemDB.batch_id == batch_id,
+                BatchItemDB.model_id.in_(newly_stopped),
+                BatchItemDB.status == ITEM_PENDING
+            ).update({
+                BatchItemDB.status: ITEM_SKIPPED,
+                BatchItemDB.error_message: "自适应早停",
+                BatchItemDB.finished_at: datetime.utcnow()
+            }, synchronize_session=False)
+            for model_id in newly_stopped:
+                logger.info(f"⏹️ 批次 {batch_id} 早停模型 {model_id}: {decision['models'][str(model_id)]['reason']}")
+            batch.skipped_items = BatchDB.skipped_items + skipped
+        batch.early_stopping = decision
+        db.commit()
+        return skipped
@@ -3,12 +3,22 @@ import time
 import asyncio
 import logging
 import json
+import math
 from typing import Dict, Any, Optional, AsyncGenerator, List
 import httpx
+import openai
+import anthropic
 from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
 
+from app.config import settings
 from app.models.model_config import ModelConfigDB
+from app.services.client_pool import ClientPool
+from app.services.rate_limiter import EndpointRateLimiter, RateLimiter
+from app.services.response_cache import ResponseCache
+from app.services.resilience import (
+    CircuitBreaker, Deadline, backoff_delay, is_transient, resolve_policy, sleep_within_deadline
+)
+from app.utils import stats
 from app.utils.validators import decrypt_api_key
 
 # 获取日志记录器
@@ -26,7 +36,8 @@ class LLMService:
         params: Optional[Dict[str, Any]] = None,
         stream: bool = False,
         tools: Optional[List[Dict[str, Any]]] = None,
-        conversation_history: Optional[List[Dict[str, Any]]] = None
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        use_cache: Optional[bool] = None
     ):
         """
         调用大模型
@@ -39,9 +50,11 @@ class LLMService:
             stream: 是否流式输出
             tools: 工具定义列表（用于Function Calling）
             conversation_history: 多轮对话历史 [{"role": "user/assistant", "content": "..."}]
+            use_cache: 是否使用响应缓存（为空时使用全局配置，仅对非流式调用生效）
         
         Returns:
-            如果stream=True，返回AsyncGenerator
+            如果stream=True，收到第一个数据块后返回异步迭代器（TrackedStream）；
+                重试后仍失败、被熔断或提供商不支持流式时返回结果字典
             如果stream=False，返回包含output、metrics的字典
         """
         # 记录请求开始
@@ -60,7 +73,201 @@ class LLMService:
             logger.info(f"工具列表: {tool_names}")
         # 合并参数
         model_params = {**(model_config.default_params or {}), **(params or {})}
-        # 根据provider调用不同的模型
+        
+        # 响应缓存：相同模型、端点、消息、工具和参数的确定性调用直接返回缓存结果
+        cache_key = None
+        if not stream and ResponseCache.enabled(use_cache, model_params):
+            cache_key = ResponseCache.make_key(
+                model_config, content, system_prompt, conversation_history, tools, model_params
+            )
+            lookup_start = time.time()
+            cached = await ResponseCache.get(cache_key)
+            if cached is not None:
+                logger.info(f"💾 命中响应缓存: {cache_key[:12]}")
+                metrics = cached.setdefault("metrics", {})
+                metrics["cached_response_time"] = metrics.get("response_time")
+                metrics["saved_cost"] = metrics.get("estimated_cost", 0.0)
+                metrics["response_time"] = time.time() - lookup_start
+                metrics["estimated_cost"] = 0.0
+                metrics["cache_hit"] = True
+                return cached
+        
+        # 容错策略：瞬时错误指数退避重试、整体截止时间、端点熔断
+        policy = resolve_policy(model_config)
+        breaker = CircuitBreaker.for_model(model_config, policy)
+        # 限流：按端点的 RPM/TPM 预算排队，遇到429自适应降速并重试
+        limiter = RateLimiter.for_model(model_config)
+        estimated_tokens = LLMService._estimate_request_tokens(
+            content, system_prompt, conversation_history, model_params
+        )
+        rate_limit_wait = 0.0
+        rate_limit_retries = 0
+        retries = 0
+        start_time = time.time()
+        
+        with Deadline.scope(policy.deadline):
+            while True:
+                remaining = Deadline.remaining()
+                if remaining is not None and remaining <= 0:
+                    result = LLMService._failure_result("timeout", "已超过调用截止时间", start_time)
+                    break
+                if not breaker.allow():
+                    logger.warning(f"🔴 端点熔断中，快速失败（{breaker.retry_in():.0f}s 后重新探测）")
+                    result = LLMService._failure_result("circuit_open", "端点熔断中，请求被快速拒绝", start_time)
+                    break
+                # 本次请求是否为半开状态的探测请求：无论以何种方式结束（取消、异常）都要释放探测名额
+                probe = breaker.state == CircuitBreaker.HALF_OPEN
+                try:
+                    # 限流排队和429冷却同样受截止时间约束
+                    acquire_start = time.time()
+                    try:
+                        rate_limit_wait += await limiter.acquire(estimated_tokens, Deadline.remaining())
+                    except asyncio.TimeoutError:
+                        rate_limit_wait += time.time() - acquire_start
+                        logger.error("❌ 限流等待超过调用截止时间")
+                        result = LLMService._failure_result("timeout", "限流等待超过调用截止时间", start_time)
+                        break
+                    
+                    # 单次请求超时不超过剩余的截止时间
+                    remaining = Deadline.remaining()
+                    timeout = policy.timeout if remaining is None else max(0.0, min(policy.timeout, remaining))
+                    attempt_start = time.time()
+                    try:
+                        # 流式模式等到第一个数据块：此前的失败（429、连接错误、超时）与非流式调用一样重试
+                        result = await asyncio.wait_for(
+                            LLMService._open_stream(
+                                model_config, content, system_prompt, model_params, tools, conversation_history
+                            ) if stream else LLMService._dispatch(
+                                model_config, content, system_prompt, model_params, stream, tools, conversation_history
+                            ),
+                            timeout=timeout
+                        )
+                    except asyncio.TimeoutError:
+                        logger.error(f"❌ 模型调用超时（{timeout:.1f}s）")
+                        result = LLMService._failure_result("timeout", f"请求超时（{timeout:.1f}s）", attempt_start)
+                        result["transient"] = True
+                    
+                    if isinstance(result, tuple):
+                        # 已收到第一个数据块，端点可达；之后的数据块由包装器按空闲超时和截止时间约束
+                        first_chunk, generator = result
+                        breaker.record_success()
+                        remaining = Deadline.remaining()
+                        return TrackedStream(
+                            generator, first_chunk, limiter, estimated_tokens, policy.timeout,
+                            None if remaining is None else time.monotonic() + remaining
+                        )
+                    
+                    LLMService._record_outcome(breaker, result)
+                    if result.get("status") == "success":
+                        limiter.on_success(estimated_tokens, result.get("metrics", {}).get("total_tokens"))
+                        break
+                    
+                    if result.get("status_code") == 429:
+                        # 端点可用但被限流：不计入熔断失败，按 Retry-After 冷却后重试
+                        limiter.on_rate_limited(result.get("retry_after"))
+                        if rate_limit_retries < settings.RATE_LIMIT_MAX_RETRIES:
+                            rate_limit_retries += 1
+                            logger.info(f"🚥 第 {rate_limit_retries} 次限流重试")
+                            continue
+                        result["status"] = "rate_limited"
+                        break
+                    
+                    # 非瞬时错误（参数错误、鉴权失败等）说明端点可达，不重试
+                    if not is_transient(result) or retries >= policy.max_retries:
+                        break
+                finally:
+                    if probe:
+                        breaker.release_probe()
+                retries += 1
+                delay = backoff_delay(retries, policy)
+                logger.info(f"🔁 瞬时错误，{delay:.2f}s 后第 {retries} 次重试")
+                if not await sleep_within_deadline(delay):
+                    break
+        
+        result.setdefault("metrics", {})
+        if cache_key:
+            if result.get("status") == "success":
+                await ResponseCache.set(cache_key, model_config.model_name, result)
+            result["metrics"]["cache_hit"] = False
+        if rate_limit_wait or rate_limit_retries:
+            result["metrics"]["rate_limit_wait"] = rate_limit_wait
+            result["metrics"]["rate_limit_retries"] = rate_limit_retries
+        if retries:
+            result["metrics"]["retries"] = retries
+            result["metrics"]["total_time"] = time.time() - start_time
+        return result
+    
+    @staticmethod
+    def _record_outcome(breaker: CircuitBreaker, result: Dict[str, Any]):
+        """
+        根据一次请求的结果更新熔断器
+
+        瞬时错误计入失败；成功、429 限流和非瞬时错误（参数错误、鉴权失败等）都说明端点可达
+        """
+        if result.get("status") != "success" and result.get("status_code") != 429 and is_transient(result):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    
+    @staticmethod
+    def _settle_rate_limit(limiter: EndpointRateLimiter, estimated_tokens: int, result: Dict[str, Any]):
+        """按结果校正限流器：成功时用实际 token 数修正 TPM 预留，429 时降速冷却"""
+        if result.get("status") == "success":
+            limiter.on_success(estimated_tokens, (result.get("metrics") or {}).get("total_tokens"))
+        elif result.get("status_code") == 429:
+            limiter.on_rate_limited(result.get("retry_after"))
+
+    @staticmethod
+    async def _open_stream(
+        model_config: ModelConfigDB,
+        content: list,
+        system_prompt: Optional[str],
+        model_params: Dict[str, Any],
+        tools: Optional[List[Dict[str, Any]]],
+        conversation_history: Optional[List[Dict[str, Any]]]
+    ):
+        """
+        发起流式调用并等待第一个数据块
+
+        Returns:
+            (第一个数据块, 生成器)；不支持流式的提供商的结果或第一个数据块之前的错误返回结果字典
+        """
+        dispatched = await LLMService._dispatch(
+            model_config, content, system_prompt, model_params, True, tools, conversation_history
+        )
+        if isinstance(dispatched, dict):
+            return dispatched
+        try:
+            first_chunk = await dispatched.__anext__()
+        except StopAsyncIteration:
+            return {"output": "", "metrics": {}, "status": "error", "error_message": "流式响应意外结束"}
+        if first_chunk.get("done") and first_chunk.get("error"):
+            await dispatched.aclose()
+            return LLMService._chunk_result(first_chunk)
+        return first_chunk, dispatched
+
+    @staticmethod
+    def _chunk_result(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """流式完成块转换为结果字典（错误块保留状态码和是否为瞬时错误）"""
+        return chunk.get("final_response") or {
+            "output": "",
+            "metrics": {},
+            "status": chunk.get("status", "error"),
+            "error_message": chunk.get("error"),
+            **{key: chunk[key] for key in ("transient", "status_code", "retry_after") if key in chunk}
+        }
+    
+    @staticmethod
+    async def _dispatch(
+        model_config: ModelConfigDB,
+        content: list,
+        system_prompt: Optional[str],
+        model_params: Dict[str, Any],
+        stream: bool,
+        tools: Optional[List[Dict[str, Any]]],
+        conversation_history: Optional[List[Dict[str, Any]]]
+    ):
+        """根据provider分发调用"""
         if model_config.provider == "openai":
             return await LLMService._call_openai(
                 model_config, content, system_prompt, model_params, stream, tools, conversation_history
@@ -96,7 +303,7 @@ class LLMService:
         api_key = decrypt_api_key(model_config.api_key) if model_config.api_key else None
         base_url = model_config.api_endpoint or None
         
-        client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        client = ClientPool.get_openai_client(api_key, base_url)
         
         # 构建消息列表
         messages = []
@@ -123,6 +330,10 @@ class LLMService:
                 "stream": stream
             }
             
+            # 流式模式请求在最后一个chunk中返回usage（需要端点支持 stream_options）
+            if stream and settings.STREAM_INCLUDE_USAGE:
+                request_params["extra_body"] = {"stream_options": {"include_usage": True}}
+            
             # 如果提供了工具定义，添加到请求中
             if tools:
                 request_params["tools"] = tools
@@ -130,7 +341,7 @@ class LLMService:
                 logger.info(f"🔧 包含 {len(tools)} 个工具定义")
             
             # 记录请求参数（排除messages内容以避免日志过长）
-            log_params = {k: v for k, v in request_params.items() if k != "messages"}
+            log_params = {k: v for k, v in request_params.items() if k not in ("messages", "extra_body")}
             log_params["messages"] = [{"role": msg["role"], "content": f"{msg['content'][:50]}..."} for msg in request_params["messages"]]
             logger.info(f"📤 发送请求参数: {json.dumps(log_params, ensure_ascii=False, indent=2)}")
             
@@ -207,12 +418,7 @@ class LLMService:
         except Exception as e:
             logger.error(f"❌ OpenAI 调用失败: {str(e)}")
             logger.error(f"错误类型: {type(e).__name__}")
-            return {
-                "output": "",
-                "metrics": {"response_time": time.time() - start_time},
-                "status": "error",
-                "error_message": str(e)
-            }
+            return LLMService._error_result(e, start_time)
     
     @staticmethod
     async def _stream_openai_response(
@@ -234,6 +440,7 @@ class LLMService:
         prompt_tokens = 0
         completion_tokens = 0
         total_chunks = 0
+        token_times = []  # 每个携带输出内容的数据块的到达时间
         
         try:
             stream = await client.chat.completions.create(**request_params)
@@ -241,11 +448,22 @@ class LLMService:
             async for chunk in stream:
                 total_chunks += 1
                 
+                # 处理usage信息（include_usage 时在最后一个 choices 为空的chunk中返回）
+                # 注意：不是所有API都会在流式模式返回usage
+                if hasattr(chunk, 'usage') and chunk.usage:
+                    usage = chunk.usage
+                    if getattr(usage, 'prompt_tokens', None):
+                        prompt_tokens = usage.prompt_tokens
+                    if getattr(usage, 'completion_tokens', None):
+                        completion_tokens = usage.completion_tokens
+                
                 # 安全地访问 choices
                 if not chunk.choices or len(chunk.choices) == 0:
                     continue
                 
                 delta = chunk.choices[0].delta
+                if getattr(delta, 'content', None) or getattr(delta, 'tool_calls', None):
+                    token_times.append(time.time())
                 
                 # 处理文本内容
                 if hasattr(delta, 'content') and delta.content:
@@ -255,10 +473,26 @@ class LLMService:
                         "done": False
                     }
                 
-                # 处理工具调用
+                # 处理工具调用（按 index 累积分片的 id / name / arguments）
                 if hasattr(delta, 'tool_calls') and delta.tool_calls:
                     for tool_call in delta.tool_calls:
+                        index = getattr(tool_call, 'index', None)
+                        if index is None:
+                            index = len(tool_calls_info)
+                        while len(tool_calls_info) <= index:
+                            tool_calls_info.append({
+                                "id": None,
+                                "type": "function",
+                                "function": {"name": "", "arguments": ""}
+                            })
+                        accumulated = tool_calls_info[index]
+                        if getattr(tool_call, 'id', None):
+                            accumulated["id"] = tool_call.id
                         if hasattr(tool_call, 'function') and tool_call.function:
+                            if tool_call.function.name:
+                                accumulated["function"]["name"] += tool_call.function.name
+                            if tool_call.function.arguments:
+                                accumulated["function"]["arguments"] += tool_call.function.arguments
                             yield {
                                 "tool_call": {
                                     "id": getattr(tool_call, 'id', None),
@@ -267,25 +501,22 @@ class LLMService:
                                 },
                                 "done": False
                             }
-                
-                # 处理usage信息（通常在最后一个chunk）
-                # 注意：不是所有API都会在流式模式返回usage
-                if hasattr(chunk, 'usage') and chunk.usage:
-                    usage = chunk.usage
-                    if hasattr(usage, 'prompt_tokens'):
-                        prompt_tokens = usage.prompt_tokens
-                    if hasattr(usage, 'completion_tokens'):
-                        completion_tokens = usage.completion_tokens
             
-            response_time = time.time() - start_time
+            end_time = time.time()
+            response_time = end_time - start_time
             
             # 如果没有获取到token信息，进行估算
+            tokens_estimated = False
             if prompt_tokens == 0:
-                # 粗略估算：英文约4字符=1token，中文约1.5字符=1token
-                # 这里简单按2字符=1token估算
-                prompt_tokens = len(request_params.get("messages", [{}])[0].get("content", "")) // 2
+                prompt_tokens = LLMService._estimate_text_tokens(
+                    json.dumps(request_params.get("messages", []), ensure_ascii=False)
+                )
+                tokens_estimated = True
             if completion_tokens == 0:
-                completion_tokens = len(full_content) // 2
+                completion_tokens = LLMService._estimate_text_tokens(
+                    full_content + "".join(tc["function"]["arguments"] for tc in tool_calls_info)
+                )
+                tokens_estimated = True
             
             # 构建最终响应
             metrics = {
@@ -297,7 +528,9 @@ class LLMService:
                     model_config.model_name,
                     prompt_tokens,
                     completion_tokens
-                )
+                ),
+                "tokens_estimated": tokens_estimated,
+                **LLMService._stream_latency_metrics(start_time, end_time, token_times, completion_tokens)
             }
             
             final_response = {
@@ -306,8 +539,10 @@ class LLMService:
                 "status": "success"
             }
             
+            tool_calls_info = [tc for tc in tool_calls_info if tc["function"]["name"]]
             if tool_calls_info:
                 final_response["tool_calls"] = tool_calls_info
+                logger.info(f"🔧 模型请求调用 {len(tool_calls_info)} 个工具（流式）")
             
             # 发送完成信号
             yield {
@@ -318,7 +553,7 @@ class LLMService:
             
             logger.info(f"✅ 流式输出完成")
             logger.info(f"📊 响应时间: {response_time:.2f}s")
-            logger.info(f"📊 总块数: {total_chunks}")
+            logger.info(f"📊 总块数: {total_chunks}，首token延迟: {metrics['time_to_first_token']}")
             logger.info(f"📊 Tokens: {prompt_tokens} + {completion_tokens} = {prompt_tokens + completion_tokens}")
             logger.info(f"📝 完整输出长度: {len(full_content)} 字符")
             
@@ -327,10 +562,13 @@ class LLMService:
             logger.error(f"错误类型: {type(e).__name__}")
             import traceback
             logger.error(f"堆栈跟踪: {traceback.format_exc()}")
+            # 附带状态码和是否为瞬时错误，供熔断和限流判断
+            error = LLMService._error_result(e, start_time)
             yield {
                 "done": True,
                 "error": str(e),
-                "status": "error"
+                "status": "error",
+                **{key: error[key] for key in ("transient", "status_code", "retry_after") if key in error}
             }
     
     @staticmethod
@@ -347,7 +585,7 @@ class LLMService:
         
         api_key = decrypt_api_key(model_config.api_key) if model_config.api_key else None
         
-        client = AsyncAnthropic(api_key=api_key)
+        client = ClientPool.get_anthropic_client(api_key)
         
         start_time = time.time()
         
@@ -397,12 +635,7 @@ class LLMService:
         except Exception as e:
             logger.error(f"❌ Anthropic 调用失败: {str(e)}")
             logger.error(f"错误类型: {type(e).__name__}")
-            return {
-                "output": "",
-                "metrics": {"response_time": time.time() - start_time},
-                "status": "error",
-                "error_message": str(e)
-            }
+            return LLMService._error_result(e, start_time)
     
     @staticmethod
     async def _call_local(
@@ -428,52 +661,49 @@ class LLMService:
             if tools:
                 logger.info(f"🔧 包含 {len(tools)} 个工具定义 (本地模型可能不支持)")
                 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{endpoint}/api/chat",
-                    json={
-                        "model": model_config.model_name,
-                        "messages": messages,
-                        "stream": False,
-                        "options": {
-                            "temperature": params.get("temperature", 0.7),
-                            "top_p": params.get("top_p", 1.0),
-                        }
-                    },
-                    timeout=120.0
-                )
-                
-                response_time = time.time() - start_time
-                result = response.json()
-                output = result.get("message", {}).get("content", "")
-                
-                metrics = {
-                    "response_time": response_time,
-                    "prompt_tokens": 0,  # Ollama不提供token计数
-                    "completion_tokens": 0,
-                    "total_tokens": 0,
-                    "estimated_cost": 0.0
-                }
-                
-                logger.info(f"✅ 本地模型调用成功")
-                logger.info(f"📊 响应时间: {response_time:.2f}s")
-                logger.info(f"📝 输出预览: {output[:200]}{'...' if len(output) > 200 else ''}")
-                
-                return {
-                    "output": output,
-                    "metrics": metrics,
-                    "status": "success"
-                }
-                
+            client = ClientPool.get_http_client("local", endpoint)
+            response = await client.post(
+                f"{endpoint}/api/chat",
+                json={
+                    "model": model_config.model_name,
+                    "messages": messages,
+                    "stream": False,
+                    "options": {
+                        "temperature": params.get("temperature", 0.7),
+                        "top_p": params.get("top_p", 1.0),
+                    }
+                },
+                # 整体超时由 call_model 的容错策略控制，这里只限制建立连接的时间
+                timeout=httpx.Timeout(None, connect=settings.HTTP_CONNECT_TIMEOUT)
+            )
+            response.raise_for_status()
+            
+            response_time = time.time() - start_time
+            result = response.json()
+            output = result.get("message", {}).get("content", "")
+            
+            metrics = {
+                "response_time": response_time,
+                "prompt_tokens": 0,  # Ollama不提供token计数
+                "completion_tokens": 0,
+                "total_tokens": 0,
+                "estimated_cost": 0.0
+            }
+            
+            logger.info(f"✅ 本地模型调用成功")
+            logger.info(f"📊 响应时间: {response_time:.2f}s")
+            logger.info(f"📝 输出预览: {output[:200]}{'...' if len(output) > 200 else ''}")
+            
+            return {
+                "output": output,
+                "metrics": metrics,
+                "status": "success"
+            }
+            
         except Exception as e:
             logger.error(f"❌ 本地模型调用失败: {str(e)}")
             logger.error(f"错误类型: {type(e).__name__}")
-            return {
-                "output": "",
-                "metrics": {"response_time": time.time() - start_time},
-                "status": "error",
-                "error_message": str(e)
-            }
+            return LLMService._error_result(e, start_time)
     
     @staticmethod
     async def _call_custom(
@@ -491,6 +721,116 @@ class LLMService:
             model_config, content, system_prompt, params, stream, tools, conversation_history
         )
     
+    @staticmethod
+    def _failure_result(status: str, error_message: str, start_time: float) -> Dict[str, Any]:
+        """构建未实际完成调用的失败结果（超时、熔断等）"""
+        return {
+            "output": "",
+            "metrics": {"response_time": time.time() - start_time},
+            "status": status,
+            "error_message": error_message
+        }
+    
+    @staticmethod
+    def _error_result(e: Exception, start_time: float) -> Dict[str, Any]:
+        """构建错误结果，附带HTTP状态码、Retry-After和是否为瞬时错误（供限流/重试判断）"""
+        result = {
+            "output": "",
+            "metrics": {"response_time": time.time() - start_time},
+            "status": "error",
+            "error_message": str(e)
+        }
+        # 超时和连接失败属于瞬时错误
+        result["transient"] = isinstance(e, (
+            asyncio.TimeoutError,
+            httpx.TransportError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            anthropic.APITimeoutError,
+            anthropic.APIConnectionError
+        ))
+        # openai/anthropic 的 APIStatusError 带 status_code，httpx.HTTPStatusError 带 response
+        response = getattr(e, "response", None)
+        status_code = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+        if status_code:
+            result["status_code"] = status_code
+            if status_code == 429:
+                result["retry_after"] = RateLimiter.parse_retry_after(getattr(response, "headers", None))
+        return result
+    
+    @staticmethod
+    async def collect_stream(stream_result: Any) -> Dict[str, Any]:
+        """
+        消费流式调用结果，返回与非流式调用相同结构的结果字典
+        
+        不支持流式的提供商（或调用前被拒绝）直接返回字典，原样返回。
+        """
+        if isinstance(stream_result, dict):
+            return stream_result
+        result = None
+        async for chunk in stream_result:
+            if chunk.get("done"):
+                result = LLMService._chunk_result(chunk)
+        return result or {"output": "", "metrics": {}, "status": "error", "error_message": "流式响应意外结束"}
+    
+    @staticmethod
+    def _stream_latency_metrics(
+        start_time: float,
+        end_time: float,
+        token_times: List[float],
+        completion_tokens: int
+    ) -> Dict[str, Any]:
+        """
+        根据数据块到达时间计算流式延迟指标（单位：秒）
+        
+        - time_to_first_token: 首个输出块的延迟
+        - inter_token_latency_mean / _p95: 相邻输出块的间隔
+        - output_tokens_per_second: 首块之后的输出速率
+        - chunk_count: 携带输出内容的数据块数
+        """
+        if not token_times:
+            return {
+                "time_to_first_token": None,
+                "inter_token_latency_mean": None,
+                "inter_token_latency_p95": None,
+                "output_tokens_per_second": None,
+                "chunk_count": 0
+            }
+        intervals = [b - a for a, b in zip(token_times, token_times[1:])]
+        decode_time = end_time - token_times[0]
+        return {
+            "time_to_first_token": token_times[0] - start_time,
+            "inter_token_latency_mean": stats.mean(intervals),
+            "inter_token_latency_p95": stats.percentile(intervals, 95),
+            "output_tokens_per_second": completion_tokens / decode_time if decode_time > 0 else None,
+            "chunk_count": len(token_times)
+        }
+    
+    @staticmethod
+    def _estimate_text_tokens(text: str) -> int:
+        """估算文本token数：CJK字符约1字符=1token，其他字符约4字符=1token"""
+        if not text:
+            return 0
+        cjk = sum(
+            1 for ch in text
+            if "\u2e80" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af" or "\uf900" <= ch <= "\ufaff"
+        )
+        return cjk + math.ceil((len(text) - cjk) / 4)
+    
+    @staticmethod
+    def _estimate_request_tokens(
+        content: Any,
+        system_prompt: Optional[str],
+        conversation_history: Optional[List[Dict[str, Any]]],
+        params: Dict[str, Any]
+    ) -> int:
+        """粗略估算一次请求占用的token数（输入按2字符=1token估算 + max_tokens），用于TPM预留"""
+        text = json.dumps(content, ensure_ascii=False) if not isinstance(content, str) else content
+        chars = len(text) + len(system_prompt or "")
+        if conversation_history:
+            chars += len(json.dumps(conversation_history, ensure_ascii=False))
+        return chars // 2 + int(params.get("max_tokens") or 1000)
+    
     @staticmethod
     def _estimate_openai_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
         """估算OpenAI API成本（USD）"""
@@ -521,3 +861,69 @@ class LLMService:
                 return (input_tokens / 1000 * input_price) + (output_tokens / 1000 * output_price)
         
         return 0.0
+
+
+class TrackedStream:
+    """
+    流式调用结果包装（call_model 已取得第一个数据块并记录熔断结果）
+
+    - 之后每个数据块的等待时间不超过 idle_timeout，也不超过调用截止时间；
+      超时后产出一个超时错误块并结束，挂起的端点不会让调用方无限等待
+    - 收到完成块时按实际 token 数校正 TPM 预留（429 错误块触发限流降速）
+    """
+
+    def __init__(
+        self,
+        stream: AsyncGenerator[Dict[str, Any], None],
+        first_chunk: Dict[str, Any],
+        limiter: EndpointRateLimiter,
+        estimated_tokens: int,
+        idle_timeout: float,
+        deadline_at: Optional[float] = None
+    ):
+        self._stream = stream
+        self._pending: Optional[Dict[str, Any]] = first_chunk
+        self._limiter = limiter
+        self._estimated_tokens = estimated_tokens
+        self._idle_timeout = idle_timeout
+        self._deadline_at = deadline_at
+        self._finished = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if self._finished:
+            raise StopAsyncIteration
+        if self._pending is not None:
+            chunk, self._pending = self._pending, None
+        else:
+            timeout = self._idle_timeout
+            if self._deadline_at is not None:
+                timeout = max(0.0, min(timeout, self._deadline_at - time.monotonic()))
+            try:
+                chunk = await asyncio.wait_for(self._stream.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                self._finished = True
+                raise
+            except asyncio.TimeoutError:
+                logger.error(f"❌ 流式响应超时（{timeout:.1f}s 内未收到数据）")
+                await self.aclose()
+                return {
+                    "done": True,
+                    "error": f"流式响应超时（{timeout:.1f}s 内未收到数据）",
+                    "status": "timeout",
+                    "transient": True
+                }
+        if chunk.get("done"):
+            self._finished = True
+            LLMService._settle_rate_limit(self._limiter, self._estimated_tokens, LLMService._chunk_result(chunk))
+        return chunk
+
+    async def aclose(self):
+        self._finished = True
+        try:
+            await self._stream.aclose()
+        except (RuntimeError, asyncio.CancelledError):
+            # 超时取消后生成器可能仍处于关闭中，忽略
+            pass
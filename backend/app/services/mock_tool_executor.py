@@ -1,4 +1,5 @@
 """Mock工具执行器 - 用于Agent训练的模拟工具调用"""
+import asyncio
 import json
 import random
 import time
@@ -7,6 +8,8 @@ import logging
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+from app.config import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -168,13 +171,69 @@ class MockToolExecutor:
             return MockToolExecutor._default_response(tool_name, tool_arguments)
         
         # 模拟延迟
+        latency = MockToolExecutor._sample_latency(mock_config)
+        time.sleep(latency / 1000.0)
+        
+        response = MockToolExecutor._generate_response(tool_name, tool_arguments, mock_config)
+        
+        logger.info(f"✅ 模拟执行完成，耗时: {latency}ms")
+        logger.info(f"📤 响应: {json.dumps(response, ensure_ascii=False)[:200]}")
+        
+        return response
+    
+    @staticmethod
+    async def execute_tool_call_async(
+        tool_name: str,
+        tool_arguments: Dict[str, Any],
+        mock_config: Optional[Dict[str, Any]] = None,
+        virtual_clock: bool = False
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        异步执行模拟工具调用（不阻塞事件循环）
+        
+        Args:
+            tool_name: 工具名称
+            tool_arguments: 工具调用参数
+            mock_config: 模拟配置
+            virtual_clock: 虚拟时钟模式，只记录模拟延迟而不实际等待
+        
+        Returns:
+            (模拟的工具执行结果, 模拟延迟毫秒数)
+        """
+        logger.info(f"🎭 执行模拟工具调用: {tool_name}")
+        logger.info(f"📥 参数: {json.dumps(tool_arguments, ensure_ascii=False)}")
+        
+        if not mock_config or not mock_config.get("enabled", False):
+            logger.warning(f"⚠️ 工具 {tool_name} 未启用 mock 配置，返回默认响应")
+            return MockToolExecutor._default_response(tool_name, tool_arguments), 0
+        
+        latency = MockToolExecutor._sample_latency(mock_config)
+        if not virtual_clock:
+            await asyncio.sleep(latency / 1000.0)
+        
+        response = MockToolExecutor._generate_response(tool_name, tool_arguments, mock_config)
+        
+        logger.info(f"✅ 模拟执行完成，耗时: {latency}ms{'（虚拟时钟）' if virtual_clock else ''}")
+        logger.info(f"📤 响应: {json.dumps(response, ensure_ascii=False)[:200]}")
+        
+        return response, latency
+    
+    @staticmethod
+    def _sample_latency(mock_config: Dict[str, Any]) -> int:
+        """按配置随机生成模拟延迟（毫秒）"""
         latency_config = mock_config.get("latency_ms", {})
-        latency = random.randint(
+        return random.randint(
             latency_config.get("min", 100),
             latency_config.get("max", 500)
         )
-        time.sleep(latency / 1000.0)
-        
+    
+    @staticmethod
+    def _generate_response(
+        tool_name: str,
+        tool_arguments: Dict[str, Any],
+        mock_config: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """根据错误场景和响应类型生成模拟响应"""
         # 检查错误场景
         error_scenarios = mock_config.get("error_scenarios", [])
         for error_scenario in error_scenarios:
@@ -200,9 +259,6 @@ class MockToolExecutor:
         else:
             response = MockToolExecutor._default_response(tool_name, tool_arguments)
         
-        logger.info(f"✅ 模拟执行完成，耗时: {latency}ms")
-        logger.info(f"📤 响应: {json.dumps(response, ensure_ascii=False)[:200]}")
-        
         return response
     
     @staticmethod
@@ -437,3 +493,54 @@ class MockToolExecutor:
             })
         
         return results
+    
+    @staticmethod
+    async def execute_multiple_tool_calls_async(
+        tool_calls: List[Dict[str, Any]],
+        tools_config: Dict[str, Dict[str, Any]],
+        virtual_clock: bool = False,
+        max_parallel: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        异步并发执行多个工具调用（不阻塞事件循环）
+        
+        Args:
+            tool_calls: 工具调用列表 [{"function": {"name": "...", "arguments": "..."}}]
+            tools_config: 工具配置字典 {tool_name: mock_config}
+            virtual_clock: 虚拟时钟模式，只记录模拟延迟而不实际等待
+            max_parallel: 最大并行数（为空时使用 AGENT_MAX_PARALLEL_TOOLS）
+        
+        Returns:
+            与 tool_calls 顺序一致的工具执行结果列表
+        """
+        semaphore = asyncio.Semaphore(max(1, max_parallel or settings.AGENT_MAX_PARALLEL_TOOLS))
+        
+        async def run_one(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+            function_info = tool_call.get("function", {})
+            tool_name = function_info.get("name")
+            
+            # 解析参数
+            arguments_str = function_info.get("arguments", "{}")
+            try:
+                arguments = json.loads(arguments_str) if isinstance(arguments_str, str) else arguments_str
+            except json.JSONDecodeError:
+                logger.error(f"❌ 无法解析工具参数: {arguments_str}")
+                arguments = {}
+            
+            # 获取工具配置
+            mock_config = tools_config.get(tool_name)
+            
+            # 执行工具调用
+            async with semaphore:
+                result, latency = await MockToolExecutor.execute_tool_call_async(
+                    tool_name, arguments, mock_config, virtual_clock
+                )
+            
+            return {
+                "tool_call_id": tool_call.get("id"),
+                "tool_name": tool_name,
+                "result": result,
+                "simulated_latency_ms": latency
+            }
+        
+        return list(await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls)))
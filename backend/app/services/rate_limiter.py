@@ -0,0 +1,218 @@
+"""限流服务 - 按端点的 RPM/TPM 令牌桶，遇到429时自适应降速"""
+import asyncio
+import hashlib
+import logging
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple
+
+from app.config import settings
+from app.models.model_config import ModelConfigDB
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶（rate 为每分钟令牌数）"""
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.base_rate = rate_per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """获取 amount 个令牌需要等待的秒数（超过桶容量的请求等到桶满即可，之后以欠账方式扣减）"""
+        self._refill()
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        """归还预留但未实际使用的令牌（amount 为负数时补扣）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def scale(self, factor: float):
+        """按比例调整实际速率（自适应降速/恢复）"""
+        self._refill()
+        self.rate = self.base_rate * factor
+
+
+class EndpointRateLimiter:
+    """
+    单个端点的限流器
+
+    - rpm/tpm 为空时不做预算限制，但仍会遵守 429 返回的 Retry-After 冷却时间
+    - 遇到429时速率乘以 RATE_LIMIT_DECREASE_FACTOR，之后每次成功按
+      RATE_LIMIT_RECOVERY_STEP 线性恢复（AIMD），逐步逼近可持续的最高速率
+    - 令牌桶在同一进程内共享；排队用的锁按事件循环区分（asyncio.Lock 只能在一个事件循环中使用，
+      批次 worker、测试等可能在不同的事件循环中调用同一个限流器），事件循环回收后自动释放
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.request_bucket = TokenBucket(rpm, rpm / 60.0 * settings.RATE_LIMIT_BURST_SECONDS) if rpm else None
+        self.token_bucket = TokenBucket(tpm, tpm) if tpm else None
+        self.rate_factor = 1.0
+        self.blocked_until = 0.0
+        self.consecutive_429 = 0
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    def _lock(self) -> asyncio.Lock:
+        """当前事件循环的排队锁"""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    def _buckets(self):
+        return [b for b in (self.request_bucket, self.token_bucket) if b is not None]
+
+    async def acquire(self, estimated_tokens: int = 0, max_wait: Optional[float] = None) -> float:
+        """
+        等待直到预算允许发起一次请求
+
+        Args:
+            estimated_tokens: 预留的 token 数
+            max_wait: 最多等待的秒数（通常为调用截止时间的剩余时间），为空时不限
+
+        Returns:
+            等待的秒数
+
+        Raises:
+            asyncio.TimeoutError: 排队或冷却所需的时间超过 max_wait（预计超过时立即失败，不空等）
+        """
+        started = time.monotonic()
+        deadline = None if max_wait is None else started + max_wait
+        await asyncio.wait_for(self._acquire(estimated_tokens, deadline), timeout=max_wait)
+        return time.monotonic() - started
+
+    async def _acquire(self, estimated_tokens: int, deadline: Optional[float]):
+        # 加锁保证等待者按先来先服务的顺序获取额度
+        async with self._lock():
+            while True:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                if self.request_bucket:
+                    wait = max(wait, self.request_bucket.wait_time(1))
+                if self.token_bucket and estimated_tokens:
+                    wait = max(wait, self.token_bucket.wait_time(estimated_tokens))
+                if wait <= 0:
+                    break
+                if deadline is not None and now + wait > deadline:
+                    raise asyncio.TimeoutError(f"限流需等待 {wait:.1f}s，超过剩余时间")
+                await asyncio.sleep(wait)
+
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket and estimated_tokens:
+                self.token_bucket.consume(estimated_tokens)
+
+    def on_success(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        """请求成功：校正TPM预留并逐步恢复速率"""
+        if self.token_bucket and estimated_tokens and actual_tokens is not None:
+            self.token_bucket.refund(estimated_tokens - actual_tokens)
+        self.consecutive_429 = 0
+        if self.rate_factor < 1.0:
+            self.rate_factor = min(1.0, self.rate_factor + settings.RATE_LIMIT_RECOVERY_STEP)
+            for bucket in self._buckets():
+                bucket.scale(self.rate_factor)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """
+        收到429：降低速率并进入冷却期
+
+        Returns:
+            冷却秒数
+        """
+        self.consecutive_429 += 1
+        self.rate_factor = max(
+            settings.RATE_LIMIT_MIN_FACTOR,
+            self.rate_factor * settings.RATE_LIMIT_DECREASE_FACTOR
+        )
+        for bucket in self._buckets():
+            bucket.scale(self.rate_factor)
+            # 清空已积累的突发额度，避免冷却结束后立刻再次触发429
+            bucket.tokens = min(bucket.tokens, 0.0)
+
+        if retry_after is None:
+            # 服务端未给出 Retry-After 时按连续429次数指数退避
+            retry_after = settings.RATE_LIMIT_DEFAULT_BACKOFF * (2 ** (self.consecutive_429 - 1))
+        cooldown = min(retry_after, settings.RATE_LIMIT_MAX_BACKOFF)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + cooldown)
+        logger.warning(
+            f"🚥 触发限流(429)，冷却 {cooldown:.1f}s，速率降至 {self.rate_factor:.0%}"
+        )
+        return cooldown
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前限流状态"""
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "rate_factor": round(self.rate_factor, 3),
+            "cooldown_remaining": round(max(0.0, self.blocked_until - time.monotonic()), 3)
+        }
+
+
+class RateLimiter:
+    """限流器注册表，同一端点 + API密钥 + 模型共享一个限流器"""
+
+    _limiters: Dict[Tuple, EndpointRateLimiter] = {}
+
+    @staticmethod
+    def _key(model_config: ModelConfigDB) -> Tuple:
+        api_key = model_config.api_key or ""
+        key_digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else ""
+        return (model_config.provider, model_config.api_endpoint or "", key_digest, model_config.model_name)
+
+    @classmethod
+    def for_model(cls, model_config: ModelConfigDB) -> EndpointRateLimiter:
+        """获取模型对应的限流器（配置变化时重建）"""
+        key = cls._key(model_config)
+        rpm = getattr(model_config, "rpm_limit", None)
+        tpm = getattr(model_config, "tpm_limit", None)
+        limiter = cls._limiters.get(key)
+        if limiter is None or limiter.rpm != rpm or limiter.tpm != tpm:
+            limiter = EndpointRateLimiter(rpm, tpm)
+            cls._limiters[key] = limiter
+        return limiter
+
+    @staticmethod
+    def parse_retry_after(headers: Optional[Any]) -> Optional[float]:
+        """解析 Retry-After / retry-after-ms 响应头（秒）"""
+        if not headers:
+            return None
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000.0
+            except ValueError:
+                pass
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            # HTTP-date 格式
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
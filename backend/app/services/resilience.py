@@ -0,0 +1,166 @@
+"""容错策略 - 重试、整体截止时间和熔断器"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+
+from app.config import settings
+from app.models.model_config import ModelConfigDB, ResiliencePolicy
+
+logger = logging.getLogger(__name__)
+
+# 当前调用链的截止时间（time.monotonic()），在 Agent 多轮迭代之间传递
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_call_deadline", default=None)
+
+# 可以重试的HTTP状态码（429由限流器单独处理）
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+
+
+def resolve_policy(model_config: ModelConfigDB) -> ResiliencePolicy:
+    """合并全局默认值与模型自定义的容错策略"""
+    defaults = ResiliencePolicy(
+        max_retries=settings.RETRY_MAX_RETRIES,
+        base_delay=settings.RETRY_BASE_DELAY,
+        max_delay=settings.RETRY_MAX_DELAY,
+        timeout=settings.HTTP_TIMEOUT,
+        deadline=settings.CALL_DEADLINE,
+        failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+        recovery_time=settings.CIRCUIT_RECOVERY_TIME
+    )
+    overrides = getattr(model_config, "resilience_policy", None) or {}
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return defaults.model_copy(update=overrides)
+
+
+def backoff_delay(attempt: int, policy: ResiliencePolicy) -> float:
+    """指数退避 + 全抖动（attempt 从1开始）"""
+    ceiling = min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+def is_transient(result: Dict[str, Any]) -> bool:
+    """判断错误结果是否属于可重试的瞬时错误（超时、连接失败、5xx）"""
+    if result.get("transient"):
+        return True
+    return result.get("status_code") in TRANSIENT_STATUS_CODES
+
+
+class Deadline:
+    """整体截止时间（基于 contextvars，在同一调用链内共享）"""
+
+    @staticmethod
+    @contextmanager
+    def scope(seconds: Optional[float]):
+        """设置截止时间；嵌套时取更早的那个"""
+        current = _deadline.get()
+        if seconds is None:
+            yield current
+            return
+        deadline = time.monotonic() + seconds
+        if current is not None:
+            deadline = min(deadline, current)
+        token = _deadline.set(deadline)
+        try:
+            yield deadline
+        finally:
+            _deadline.reset(token)
+
+    @staticmethod
+    def remaining() -> Optional[float]:
+        """剩余秒数（未设置截止时间时返回 None）"""
+        deadline = _deadline.get()
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    端点熔断器
+
+    连续 failure_threshold 次瞬时错误后打开熔断，recovery_time 秒内直接失败；
+    之后进入半开状态放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _breakers: Dict[Tuple[str, str], "CircuitBreaker"] = {}
+
+    def __init__(self, failure_threshold: int, recovery_time: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    @classmethod
+    def for_model(cls, model_config: ModelConfigDB, policy: ResiliencePolicy) -> "CircuitBreaker":
+        """按 (provider, endpoint) 获取熔断器"""
+        key = (model_config.provider, model_config.api_endpoint or "")
+        breaker = cls._breakers.get(key)
+        if breaker is None:
+            breaker = cls(policy.failure_threshold, policy.recovery_time)
+            cls._breakers[key] = breaker
+        else:
+            breaker.failure_threshold = policy.failure_threshold
+            breaker.recovery_time = policy.recovery_time
+        return breaker
+
+    def allow(self) -> bool:
+        """
+        是否允许发起请求
+
+        半开状态下只放行一个探测请求；调用方必须以 record_success / record_failure / release_probe
+        之一结束该探测，否则熔断器会一直拒绝请求。
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_time:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("🟢 熔断器关闭，端点已恢复")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        """半开状态下的探测请求未产生结果（被取消、抛出异常）时释放探测名额，下一个请求继续探测"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"🔴 熔断器打开：连续 {self.failures} 次失败，{self.recovery_time:.0f}s 内快速失败")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def retry_in(self) -> float:
+        """熔断打开时距离下次探测的秒数"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.recovery_time - (time.monotonic() - self.opened_at))
+
+
+async def sleep_within_deadline(delay: float) -> bool:
+    """在截止时间内等待；剩余时间不足时不等待并返回 False"""
+    remaining = Deadline.remaining()
+    if remaining is not None and remaining <= delay:
+        return False
+    await asyncio.sleep(delay)
+    return True
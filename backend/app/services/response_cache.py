@@ -0,0 +1,210 @@
+"""大模型响应缓存 - 基于内容哈希的SQLite磁盘缓存（LRU淘汰 + TTL）"""
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from app.config import settings
+from app.models.model_config import ModelConfigDB
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    响应缓存
+
+    缓存键为 (模型, 端点, 消息, 工具, 生效参数) 的 SHA-256 哈希；
+    只缓存成功的非流式响应。SQLite 操作在线程池中执行，避免阻塞事件循环。
+    """
+
+    _lock = threading.Lock()
+    _initialized_path: Optional[str] = None
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def enabled(use_cache: Optional[bool], params: Dict[str, Any]) -> bool:
+        """判断本次调用是否使用缓存（默认只缓存 temperature=0 的确定性调用）"""
+        if use_cache is None:
+            use_cache = settings.LLM_CACHE_ENABLED
+        if not use_cache:
+            return False
+        if settings.LLM_CACHE_DETERMINISTIC_ONLY and params.get("temperature", 0.7) != 0:
+            return False
+        return True
+
+    @staticmethod
+    def make_key(
+        model_config: ModelConfigDB,
+        content: Any,
+        system_prompt: Optional[str],
+        conversation_history: Optional[list],
+        tools: Optional[list],
+        params: Dict[str, Any]
+    ) -> str:
+        """计算缓存键"""
+        payload = {
+            "provider": model_config.provider,
+            "endpoint": model_config.api_endpoint or "",
+            "model": model_config.model_name,
+            "system_prompt": system_prompt,
+            "history": conversation_history,
+            "content": content,
+            "tools": tools,
+            "params": params
+        }
+        canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _connect(cls) -> sqlite3.Connection:
+        path = str(settings.LLM_CACHE_PATH)
+        conn = sqlite3.connect(path, timeout=10)
+        if cls._initialized_path != path:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model_name TEXT,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache (last_accessed)")
+            conn.commit()
+            cls._initialized_path = path
+        return conn
+
+    @classmethod
+    def _get_sync(cls, key: str) -> Optional[Dict[str, Any]]:
+        with cls._lock:
+            conn = cls._connect()
+            try:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                response, created_at = row
+                now = time.time()
+                if settings.LLM_CACHE_TTL and now - created_at > settings.LLM_CACHE_TTL:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute(
+                    "UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (now, key)
+                )
+                conn.commit()
+                return json.loads(response)
+            finally:
+                conn.close()
+
+    @classmethod
+    def _set_sync(cls, key: str, model_name: str, result: Dict[str, Any]):
+        response = json.dumps(result, ensure_ascii=False, default=str)
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with cls._lock:
+            conn = cls._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model_name, response, size_bytes, created_at, last_accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_name, response, size, now, now)
+                )
+                cls._evict(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection):
+        """按最近访问时间淘汰，直到条目数和总大小都在上限内"""
+        if settings.LLM_CACHE_TTL:
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - settings.LLM_CACHE_TTL,))
+        count, total_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+        ).fetchone()
+        if count <= settings.LLM_CACHE_MAX_ENTRIES and total_size <= settings.LLM_CACHE_MAX_BYTES:
+            return
+        evicted = 0
+        for key, size in conn.execute(
+            "SELECT key, size_bytes FROM llm_cache ORDER BY last_accessed ASC"
+        ).fetchall():
+            if count <= settings.LLM_CACHE_MAX_ENTRIES and total_size <= settings.LLM_CACHE_MAX_BYTES:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            count -= 1
+            total_size -= size
+            evicted += 1
+        logger.info(f"🧹 缓存淘汰 {evicted} 条")
+
+    @classmethod
+    async def get(cls, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，同时更新命中计数"""
+        try:
+            cached = await asyncio.to_thread(cls._get_sync, key)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 读取响应缓存失败: {e}")
+            cached = None
+        if cached is None:
+            cls.misses += 1
+        else:
+            cls.hits += 1
+        return cached
+
+    @classmethod
+    async def set(cls, key: str, model_name: str, result: Dict[str, Any]):
+        """写入缓存（写入失败只记录日志，不影响调用结果）"""
+        try:
+            await asyncio.to_thread(cls._set_sync, key, model_name, result)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 写入响应缓存失败: {e}")
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """
+        缓存统计
+
+        hits/misses 是本进程启动以来所有调用方（批次、调试、Agent）的累计值；
+        单个批次或对比的命中率见 CompareService.summary 中的 cache_hit_rate。
+        """
+        with cls._lock:
+            conn = cls._connect()
+            try:
+                count, total_size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+                ).fetchone()
+            finally:
+                conn.close()
+        total = cls.hits + cls.misses
+        return {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "entries": count,
+            "size_bytes": total_size,
+            "hits": cls.hits,
+            "misses": cls.misses,
+            "hit_rate": cls.hits / total if total else 0.0
+        }
+
+    @classmethod
+    def clear(cls) -> int:
+        """清空缓存，返回删除的条目数"""
+        with cls._lock:
+            conn = cls._connect()
+            try:
+                deleted = conn.execute("DELETE FROM llm_cache").rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        cls.hits = 0
+        cls.misses = 0
+        return deleted
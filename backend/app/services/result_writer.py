@@ -0,0 +1,108 @@
+"""批量结果写入 - 把 worker 完成的组合结果攒成批，在同一个事务中提交"""
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.config import settings
+from app.services.batch_queue import BatchQueue
+
+logger = logging.getLogger(__name__)
+
+
+class ResultWriter:
+    """
+    组合结果的批量写入器
+
+    submit() 把结果放入缓冲区后立即返回，调用方不必等待写入（worker 的执行槽位可以马上领取下一个组合）。
+    后台循环在缓冲区达到 max_items 或等待 interval 秒后调用 BatchQueue.save_outcomes 一次性提交；
+    写入进行时新完成的结果继续进入下一批（group commit），并发越高每个事务包含的结果越多，提交次数越少。
+    close() 写入全部剩余结果，worker 退出前必须调用。
+
+    整批写入失败时逐个重试，避免一个异常结果导致同批的其他结果丢失。
+    """
+
+    def __init__(self, worker_id: str, interval: Optional[float] = None, max_items: Optional[int] = None):
+        self.worker_id = worker_id
+        self.interval = settings.BATCH_WRITE_INTERVAL if interval is None else interval
+        self.max_items = max(1, max_items or settings.BATCH_WRITE_MAX_ITEMS)
+        self._buffer: List[Tuple[Tuple[int, Dict[str, Any], Optional[str]], asyncio.Future]] = []
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.transactions = 0  # 已提交的写入事务数（用于日志和测试）
+
+    def start(self):
+        """启动后台写入循环"""
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    def submit(
+        self,
+        item_id: int,
+        outcome: Dict[str, Any],
+        fingerprint: Optional[str] = None,
+        urgent: bool = False
+    ) -> asyncio.Future:
+        """
+        放入一个组合的结果，返回写入后完成的 future（结果为是否保存成功，租约失效时为 False）
+
+        urgent=True 时不再等待 interval，立即写入当前缓冲区
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append(((item_id, outcome, fingerprint), future))
+        self._pending.set()
+        if urgent or len(self._buffer) >= self.max_items:
+            self._full.set()
+        return future
+
+    async def close(self):
+        """写入缓冲区中剩余的结果并停止后台循环（不会中断进行中的写入）"""
+        if self._task is not None:
+            self._closing = True
+            self._pending.set()
+            self._full.set()
+            await self._task
+            self._task = None
+        while self._buffer:
+            await self._flush()
+
+    async def _run(self):
+        while True:
+            await self._pending.wait()
+            if self.interval > 0 and not self._closing and len(self._buffer) < self.max_items:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush()
+            if self._closing and not self._buffer:
+                return
+
+    async def _flush(self):
+        batch, self._buffer = self._buffer[:self.max_items], self._buffer[self.max_items:]
+        if not self._buffer:
+            self._pending.clear()
+        self._full.clear()
+        if not batch:
+            return
+        entries = [entry for entry, _ in batch]
+        try:
+            results = await asyncio.to_thread(BatchQueue.save_outcomes, self.worker_id, entries)
+            self.transactions += 1
+        except Exception as e:
+            logger.error(f"❌ 批量保存 {len(entries)} 个组合结果失败，逐个重试: {e}")
+            results = []
+            for item_id, outcome, fingerprint in entries:
+                try:
+                    results.append(await asyncio.to_thread(
+                        BatchQueue.save_outcome, item_id, self.worker_id, outcome, fingerprint
+                    ))
+                    self.transactions += 1
+                except Exception as item_error:
+                    logger.error(f"❌ 保存组合结果失败 (item={item_id}): {item_error}")
+                    results.append(False)
+        for (_, future), saved in zip(batch, results):
+            if not future.done():
+                future.set_result(saved)
@@ -0,0 +1,77 @@
+"""多次采样统计 - 基于已保存的采样结果计算 pass@k、得分均值/标准差和延迟分位数"""
+from typing import Dict, Any, Optional
+
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.test_result import TestResultSampleDB
+from app.utils import stats
+
+# 视为采样完成的结果状态（与批量队列一致）
+COMPLETED_SAMPLE_STATUSES = ("success", "max_iterations_reached")
+
+# 汇总时计算的 pass@k（只保留 k <= 采样数的项，并总是包含 k = 采样数）
+PASS_AT_K = (1, 3, 5, 10)
+
+
+class SampleStats:
+    """采样统计服务"""
+
+    @staticmethod
+    def is_passed(status: Optional[str], score: Optional[float], metrics: Optional[Dict[str, Any]]) -> bool:
+        """
+        判断一次采样是否通过
+
+        调用完成且得分不低于 BATCH_PASS_SCORE；测试用例没有任何评估维度时只要求调用完成
+        """
+        if status not in COMPLETED_SAMPLE_STATUSES:
+            return False
+        evaluation = (metrics or {}).get("evaluation") or {}
+        if not evaluation.get("scores"):
+            return True
+        return score is not None and score >= settings.BATCH_PASS_SCORE
+
+    @staticmethod
+    def summarize(db: Session, result_id: int) -> Dict[str, Any]:
+        """
+        汇总一个组合的全部采样
+
+        计数、通过数和均值由数据库聚合计算，标准差和分位数在取出的得分/延迟列上计算。
+        """
+        totals = db.query(
+            func.count(TestResultSampleDB.id),
+            func.sum(case((TestResultSampleDB.passed.is_(True), 1), else_=0)),
+            func.min(TestResultSampleDB.score),
+            func.max(TestResultSampleDB.score),
+            func.avg(TestResultSampleDB.total_tokens)
+        ).filter(TestResultSampleDB.result_id == result_id).one()
+        n, passed, score_min, score_max, tokens_mean = totals
+        passed = int(passed or 0)
+
+        scores = [row[0] for row in db.query(TestResultSampleDB.score).filter(
+            TestResultSampleDB.result_id == result_id,
+            TestResultSampleDB.score.isnot(None)
+        )]
+        latencies = [row[0] for row in db.query(TestResultSampleDB.response_time).filter(
+            TestResultSampleDB.result_id == result_id,
+            TestResultSampleDB.response_time.isnot(None)
+        )]
+
+        ks = sorted({k for k in PASS_AT_K if k <= n} | {n}) if n else []
+        return {
+            "n_samples": n,
+            "n_passed": passed,
+            "pass_rate": passed / n if n else None,
+            "pass_at_k": {str(k): stats.pass_at_k(n, passed, k) for k in ks},
+            "score_mean": stats.mean(scores),
+            "score_std": stats.stddev(scores),
+            "score_min": score_min,
+            "score_max": score_max,
+            "latency_mean": stats.mean(latencies),
+            "latency_std": stats.stddev(latencies),
+            "latency_p50": stats.percentile(latencies, 50),
+            "latency_p90": stats.percentile(latencies, 90),
+            "latency_p95": stats.percentile(latencies, 95),
+            "tokens_mean": float(tokens_mean) if tokens_mean is not None else None
+        }
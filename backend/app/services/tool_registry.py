@@ -0,0 +1,124 @@
+"""工具注册表 - 缓存工具定义转换后的 OpenAI 格式和 mock 配置"""
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.models.tool_definition import ToolDefinitionDB
+
+logger = logging.getLogger(__name__)
+
+# 工具列表和 mock 配置（与 OpenAI tools 参数格式一致）
+ToolSet = Tuple[Optional[List[Dict[str, Any]]], Dict[str, Dict[str, Any]]]
+
+
+class _CachedTool:
+    """一个工具版本的转换结果"""
+    __slots__ = ("updated_at", "name", "schema", "mock_responses")
+
+    def __init__(self, tool: ToolDefinitionDB):
+        self.updated_at = tool.updated_at
+        self.name = tool.name
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.parameters
+            }
+        }
+        self.mock_responses = tool.mock_responses
+
+
+class ToolRegistry:
+    """
+    工具注册表
+
+    按 (工具ID, updated_at) 缓存转换后的工具 schema，相同工具组合的 (tools, tools_config)
+    也会复用同一个对象。每次解析只查询一次各工具的 updated_at，仅对变化或未缓存的工具读取完整定义。
+
+    返回的列表和字典在多个调用方之间共享，调用方不能修改。
+    """
+
+    _lock = threading.Lock()
+    _tools: Dict[int, _CachedTool] = {}
+    _toolsets: Dict[Tuple[Tuple[int, Optional[datetime]], ...], ToolSet] = {}
+    MAX_TOOLSETS = 1024
+
+    @classmethod
+    def _refresh(cls, db: Session, tool_ids: Iterable[int]) -> Dict[int, _CachedTool]:
+        """
+        检查工具版本并加载变化的工具，返回 {tool_id: 缓存的工具}（不存在的工具不在结果中）
+
+        返回的是本次解析使用的快照：其他线程随后调用 invalidate() 清空缓存也不影响本次解析。
+        """
+        ids = set(tool_ids)
+        if not ids:
+            return {}
+        versions = dict(db.query(ToolDefinitionDB.id, ToolDefinitionDB.updated_at).filter(
+            ToolDefinitionDB.id.in_(ids)
+        ).all())
+        snapshot = {}
+        with cls._lock:
+            for tool_id, updated_at in versions.items():
+                cached = cls._tools.get(tool_id)
+                if cached is not None and cached.updated_at == updated_at:
+                    snapshot[tool_id] = cached
+        stale = [tool_id for tool_id in versions if tool_id not in snapshot]
+        if stale:
+            loaded = db.query(ToolDefinitionDB).filter(ToolDefinitionDB.id.in_(stale)).all()
+            with cls._lock:
+                for tool in loaded:
+                    snapshot[tool.id] = cls._tools[tool.id] = _CachedTool(tool)
+        return snapshot
+
+    @classmethod
+    def resolve_many(cls, db: Session, tool_id_lists: List[Optional[List[int]]]) -> List[ToolSet]:
+        """
+        解析多组工具ID（如一个批次中各测试用例的工具）
+
+        所有组合共用一次版本查询；工具顺序与 ID 列表一致，重复和不存在的 ID 被忽略。
+        没有工具的组合返回 (None, {})。
+        """
+        snapshot = cls._refresh(db, (tool_id for ids in tool_id_lists if ids for tool_id in ids))
+        toolsets = []
+        with cls._lock:
+            for ids in tool_id_lists:
+                if not ids:
+                    toolsets.append((None, {}))
+                    continue
+                ordered = [tool_id for tool_id in dict.fromkeys(ids) if tool_id in snapshot]
+                key = tuple((tool_id, snapshot[tool_id].updated_at) for tool_id in ordered)
+                toolset = cls._toolsets.get(key)
+                if toolset is None:
+                    cached = [snapshot[tool_id] for tool_id in ordered]
+                    toolset = (
+                        [tool.schema for tool in cached],
+                        {tool.name: tool.mock_responses for tool in cached}
+                    )
+                    if len(cls._toolsets) >= cls.MAX_TOOLSETS:
+                        cls._toolsets.clear()
+                    cls._toolsets[key] = toolset
+                toolsets.append(toolset)
+        return toolsets
+
+    @classmethod
+    def resolve(cls, db: Session, tool_ids: Optional[List[int]]) -> ToolSet:
+        """解析一组工具ID，返回 (OpenAI 格式工具列表, {工具名: mock配置})"""
+        return cls.resolve_many(db, [tool_ids])[0]
+
+    @classmethod
+    def invalidate(cls, tool_id: Optional[int] = None):
+        """
+        清除缓存（工具更新或删除后调用）
+
+        updated_at 只精确到秒，同一秒内的多次修改依赖此方法及时失效本进程的缓存。
+        """
+        with cls._lock:
+            if tool_id is None:
+                cls._tools.clear()
+            else:
+                cls._tools.pop(tool_id, None)
+            cls._toolsets.clear()
@@ -1,25 +1,109 @@
 """数据库工具"""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from typing import Optional
+
 from app.config import settings
 
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+# 结构化数据列类型：PostgreSQL 上使用 JSONB（二进制存储，读取时不必重新解析，支持 GIN 索引），其他数据库为 JSON
+# 注意 JSONB 不保留对象键的顺序，键顺序有意义的列（如工具参数的 JSON Schema）仍使用 JSON
+JSONVariant = JSON().with_variant(JSONB(), "postgresql")
+
+
+def async_database_url(url: str) -> str:
+    """把同步数据库 URL 转换为异步驱动的 URL（已指定驱动的 URL 保持不变）"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+
+def sqlite_pragmas() -> dict:
+    """
+    SQLite 连接参数（每个新连接执行一次）
+
+    WAL 模式下读写互不阻塞，批次写入结果时页面查询不会等待；synchronous=NORMAL 在 WAL 下
+    只在检查点时 fsync，断电最多丢失最近提交的事务，不会损坏数据库；
+    busy_timeout 让写冲突时等待而不是立即报 "database is locked"。
+    """
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,  # 负数表示 KiB
+        "mmap_size": settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024,
+        "temp_store": "MEMORY",
+    }
+
+
+def configure_sqlite(target: Engine, pragmas: Optional[dict] = None):
+    """为 SQLite 引擎注册连接参数（非 SQLite 引擎不做处理）；异步引擎传入 async_engine.sync_engine"""
+    if target.dialect.name != "sqlite" or not settings.SQLITE_TUNING_ENABLED:
+        return
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(target, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def engine_options(url: str) -> dict:
+    """
+    create_engine / create_async_engine 的参数
+
+    SQLite 为本地文件，只需允许跨线程使用连接；其他数据库按配置设置连接池，
+    pool_pre_ping 在取出连接时检测，数据库重启或故障切换后自动重连。
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
 # 创建数据库引擎
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # SQLite需要
-)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+configure_sqlite(engine)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎和会话工厂（API 请求处理使用，查询不阻塞事件循环）
+# expire_on_commit=False：提交后仍可直接返回 ORM 对象，避免序列化时触发隐式的同步加载
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+configure_sqlite(async_engine.sync_engine)
+
 # 创建基础模型类
 Base = declarative_base()
 
 
 def init_db():
-    """初始化数据库"""
+    """初始化数据库：创建缺失的表，再执行尚未执行的结构迁移（见 app.utils.migrations）"""
+    from app.utils.migrations import run_migrations
+
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 
 def get_db():
@@ -29,3 +113,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    获取异步数据库会话
+
+    同步的服务层代码（如 BatchQueue、ToolRegistry）通过 await db.run_sync(fn, ...) 调用，
+    fn 的第一个参数为与该异步会话绑定的同步 Session。
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
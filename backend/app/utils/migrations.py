@@ -0,0 +1,358 @@
+"""
+数据库结构迁移 - 按版本号依次执行，已执行的版本记录在 schema_migrations 表中
+
+服务启动时（lifespan）和独立 worker 启动时先用 create_all 创建缺失的表，再执行未执行过的迁移。
+新增字段、索引或数据修正时在 MIGRATIONS 末尾追加一个版本，不要修改已发布的版本。
+
+事务：每个迁移在一个事务中执行，版本记录与结构变更一起提交，失败时整体回滚，下次启动重试。
+大表改写（MigrationContext.chunks）和 PostgreSQL 上的建索引（CREATE INDEX CONCURRENTLY）例外：
+它们先提交此前的变更，再分段提交，期间 API 和 worker 的读写不会被长时间阻塞；
+因此使用它们的迁移必须可以重复执行（只改写尚未处理的行、IF NOT EXISTS）。
+"""
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Float, Integer, JSON, MetaData, String, Table, bindparam, event, inspect, select, text
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.types import TypeEngine
+
+from app.config import settings
+from app.utils.database import JSONVariant
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL 咨询锁的键，多个节点同时启动时只有一个执行迁移，其余等待后跳过已执行的版本
+MIGRATION_LOCK_KEY = 724110
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class MigrationContext:
+    """迁移执行上下文，封装与数据库方言相关的结构变更操作"""
+
+    def __init__(self, conn: Connection, chunk_size: Optional[int] = None):
+        self.conn = conn
+        self.dialect = conn.dialect.name
+        self.chunk_size = max(1, chunk_size or settings.MIGRATION_CHUNK_SIZE)
+
+    def execute(self, sql, params=None):
+        """在当前迁移事务中执行 SQL（字符串或需要指定参数类型时传入 text() 语句）"""
+        return self.conn.execute(sql if isinstance(sql, TextClause) else text(sql), params or {})
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.conn).has_table(table)
+
+    def columns(self, table: str) -> List[str]:
+        return [column["name"] for column in inspect(self.conn).get_columns(table)]
+
+    def add_column(
+        self,
+        table: str,
+        name: str,
+        type_: TypeEngine,
+        default: Optional[str] = None,
+        nullable: bool = True
+    ) -> bool:
+        """
+        添加字段（字段已存在时跳过），返回是否新增
+
+        default 为 SQL 字面量（如 "0"、"false"），nullable=False 时必须提供。SQLite 和 PostgreSQL
+        添加可空字段或常量默认值字段都只修改表定义，不改写已有行，大表上也是瞬间完成。
+        """
+        if name in self.columns(table):
+            return False
+        column_sql = f"{name} {type_.compile(dialect=self.conn.dialect)}"
+        if not nullable:
+            column_sql += " NOT NULL"
+        if default is not None:
+            column_sql += f" DEFAULT {default}"
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {column_sql}")
+        logger.info(f"  ➕ {table}.{name}")
+        return True
+
+    def create_index(self, name: str, table: str, columns: Sequence[str]) -> bool:
+        """
+        创建索引（已存在时跳过），返回是否新建
+
+        PostgreSQL 上使用 CREATE INDEX CONCURRENTLY，建索引期间表仍可写入（不能在事务中执行，
+        会先提交当前事务）；SQLite 建索引时持有写锁，但只需一次顺序扫描。
+        """
+        if name in {index["name"] for index in inspect(self.conn).get_indexes(table)}:
+            return False
+        sql = f"CREATE INDEX {{}}IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+        if self.dialect == "postgresql":
+            self.conn.commit()
+            autocommit = self.conn.execution_options(isolation_level="AUTOCOMMIT")
+            autocommit.execute(text(sql.format("CONCURRENTLY ")))
+            self.conn.execution_options(isolation_level=self.conn.default_isolation_level)
+        else:
+            self.execute(sql.format(""))
+        logger.info(f"  🗂️ {name}")
+        return True
+
+    def chunks(self, table: str, columns: Sequence[str], where: Optional[str] = None, key: str = "id") -> Iterator[list]:
+        """
+        按主键分段读取需要改写的行，每段处理完后提交
+
+        调用方在循环体内用 execute() 写入本段的改动。每段一个短事务，
+        数百万行的表改写期间其他连接仍能在段与段之间写入；中断后重新执行会从未处理的行继续
+        （where 应排除已处理的行）。
+        """
+        self.conn.commit()
+        params = {"limit": self.chunk_size}
+        while True:
+            conditions = [f"({where})"] if where else []
+            if "last" in params:
+                conditions.append(f"{key} > :last")
+            sql = f"SELECT {', '.join([key, *columns])} FROM {table}"
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            rows = self.execute(f"{sql} ORDER BY {key} LIMIT :limit", params).all()
+            if not rows:
+                return
+            yield rows
+            self.conn.commit()
+            params["last"] = rows[-1][0]
+
+
+@dataclass
+class Migration:
+    """一个迁移版本"""
+    version: int
+    name: str
+    upgrade: Callable[[MigrationContext], None]
+
+
+# ========== 迁移版本（原 migrate_*.py 脚本，按添加顺序） ==========
+
+# 迁移前未配置权重的测试用例使用的默认评分权重
+DEFAULT_EVALUATION_WEIGHTS = {"tool_calls": 70, "text_similarity": 20, "custom_criteria": 10}
+
+# 视为组合执行完成的结果状态（与批量队列一致）
+COMPLETED_RESULT_STATUSES = ("success", "max_iterations_reached")
+
+
+def _add_columns(table: str, columns: dict) -> Callable[[MigrationContext], None]:
+    """只添加字段的迁移；columns 为 {字段名: 类型} 或 {字段名: (类型, 默认值)}"""
+    def upgrade(ctx: MigrationContext):
+        for name, spec in columns.items():
+            type_, default = spec if isinstance(spec, tuple) else (spec, None)
+            ctx.add_column(table, name, type_, default)
+    return upgrade
+
+
+def _add_evaluation_weights(ctx: MigrationContext):
+    if ctx.add_column("test_cases", "evaluation_weights", JSON()):
+        ctx.execute(
+            "UPDATE test_cases SET evaluation_weights = :weights WHERE evaluation_weights IS NULL",
+            {"weights": json.dumps(DEFAULT_EVALUATION_WEIGHTS)}
+        )
+
+
+def _add_mock_responses(ctx: MigrationContext):
+    if not ctx.add_column("tool_definitions", "mock_responses", JSON()):
+        return
+    for tool_id, name in ctx.execute("SELECT id, name FROM tool_definitions").all():
+        config = {
+            "enabled": False,
+            "response_type": "static",
+            "static_response": {"success": True, "data": f"这是 {name} 工具的模拟响应", "message": "模拟执行成功"},
+            "latency_ms": {"min": 100, "max": 500}
+        }
+        ctx.execute(
+            "UPDATE tool_definitions SET mock_responses = :config WHERE id = :id",
+            {"config": json.dumps(config, ensure_ascii=False), "id": tool_id}
+        )
+
+
+def _add_result_fingerprint(ctx: MigrationContext):
+    ctx.add_column("test_results", "fingerprint", String(64))
+    ctx.create_index("ix_test_results_fingerprint", "test_results", ["fingerprint"])
+
+
+def _import_result_files(ctx: MigrationContext):
+    """把 batches 表中不存在的旧批次结果文件导入为已完成的批次（不含组合明细）"""
+    existing = {row[0] for row in ctx.execute("SELECT id FROM batches")}
+    for path in sorted(settings.RESULTS_DIR.glob("batch_*.json")):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"跳过无法读取的结果文件 {path}: {e}")
+            continue
+        batch_id = data.get("batch_id") or path.stem
+        if batch_id in existing:
+            continue
+        model_ids = [m["id"] for m in data.get("models", [])]
+        test_case_ids = [tc["id"] for tc in data.get("test_cases", [])]
+        results = data.get("results", [])
+        timestamp = datetime.fromisoformat(data["timestamp"]) if data.get("timestamp") else None
+        done = sum(1 for r in results if r.get("status") in COMPLETED_RESULT_STATUSES)
+        ctx.execute(text("""
+            INSERT INTO batches (
+                id, status, priority, model_ids, test_case_ids, total_items,
+                done_items, failed_items, cancelled_items, skipped_items, scored_items, score_sum,
+                created_at, finished_at
+            ) VALUES (:id, 'completed', 0, :model_ids, :test_case_ids, :total, :done, :failed, 0, 0, 0, 0, :ts, :ts)
+        """).bindparams(bindparam("ts", type_=DateTime())), {
+            "id": batch_id,
+            "model_ids": json.dumps(model_ids),
+            "test_case_ids": json.dumps(test_case_ids),
+            "total": len(model_ids) * len(test_case_ids),
+            "done": done,
+            "failed": len(results) - done,
+            "ts": timestamp,
+        })
+
+
+def _add_batch_counters(ctx: MigrationContext):
+    for name, type_ in (
+        ("done_items", Integer()),
+        ("failed_items", Integer()),
+        ("cancelled_items", Integer()),
+        ("skipped_items", Integer()),
+        ("scored_items", Integer()),
+        ("score_sum", Float()),
+    ):
+        ctx.add_column("batches", name, type_, default="0", nullable=False)
+    ctx.create_index("ix_batches_created_at", "batches", ["created_at"])
+
+    # 根据 batch_items 重新计算计数（可重复执行）
+    counted = ", ".join(
+        f"{name} = (SELECT COUNT(*) FROM batch_items i WHERE i.batch_id = batches.id AND i.status = '{status}')"
+        for name, status in (
+            ("done_items", "done"), ("failed_items", "failed"), ("cancelled_items", "cancelled"), ("skipped_items", "skipped")
+        )
+    )
+    scored = """
+        SELECT {} FROM batch_items i JOIN test_results r ON r.id = i.result_id
+        WHERE i.batch_id = batches.id AND i.status IN ('done', 'failed')
+    """
+    recount = text(
+        f"UPDATE batches SET {counted}, scored_items = ({scored.format('COUNT(r.score)')}), "
+        f"score_sum = COALESCE(({scored.format('SUM(r.score)')}), 0) WHERE id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    for rows in ctx.chunks("batches", []):
+        ctx.execute(recount, {"ids": [row[0] for row in rows]})
+    _import_result_files(ctx)
+
+
+def _add_query_indexes(ctx: MigrationContext):
+    from app.models.test_case import parse_tags
+
+    ctx.create_index("ix_test_results_case_model", "test_results", ["test_case_id", "model_id"])
+    ctx.create_index("ix_test_results_executed_at", "test_results", ["executed_at"])
+    # test_case_tags 表由 create_all 创建；回填尚无标签行的测试用例
+    for rows in ctx.chunks(
+        "test_cases", ["tags"],
+        where="tags IS NOT NULL AND tags != '' AND id NOT IN (SELECT test_case_id FROM test_case_tags)"
+    ):
+        tags = [{"id": case_id, "tag": tag} for case_id, value in rows for tag in parse_tags(value)]
+        if tags:
+            ctx.execute("INSERT INTO test_case_tags (test_case_id, tag) VALUES (:id, :tag)", tags)
+    # 更新统计信息，查询规划器据此选择索引
+    ctx.execute("ANALYZE")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "add_test_case_tools", _add_columns("test_cases", {"tools": JSONVariant})),
+    Migration(2, "add_expected_tool_calls", _add_columns("test_cases", {"expected_tool_calls": JSON()})),
+    Migration(3, "add_use_mock", _add_columns("test_cases", {"use_mock": (Boolean(), "false")})),
+    Migration(4, "add_conversation_history", _add_columns("test_cases", {"conversation_history": JSONVariant})),
+    Migration(5, "add_evaluation_weights", _add_evaluation_weights),
+    Migration(6, "add_mock_responses", _add_mock_responses),
+    Migration(7, "add_model_concurrency", _add_columns("models", {"max_concurrency": Integer()})),
+    Migration(8, "add_rate_limits", _add_columns("models", {"rpm_limit": Integer(), "tpm_limit": Integer()})),
+    Migration(9, "add_resilience_policy", _add_columns("models", {"resilience_policy": JSON()})),
+    Migration(10, "add_batch_item_leases", _add_columns(
+        "batch_items", {"lease_owner": String(128), "lease_expires_at": DateTime()}
+    )),
+    Migration(11, "add_batch_priority", _add_columns("batches", {"priority": (Integer(), "0")})),
+    Migration(12, "add_result_fingerprint", _add_result_fingerprint),
+    Migration(13, "add_batch_early_stopping", _add_columns("batches", {"early_stopping": JSON()})),
+    Migration(14, "add_batch_counters", _add_batch_counters),
+    Migration(15, "add_query_indexes", _add_query_indexes),
+]
+
+
+def current_version(engine: Engine) -> int:
+    """已执行的最高版本号（未执行过迁移时为 0）"""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("schema_migrations"):
+            return 0
+        return conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version.desc())).scalar() or 0
+
+
+def run_migrations(engine: Engine, migrations: Optional[List[Migration]] = None) -> List[int]:
+    """
+    执行尚未执行的迁移，返回本次执行的版本号
+
+    调用前应已执行 create_all：缺失的表按当前模型完整创建，迁移只补齐已有表缺少的字段和索引，
+    因此新数据库上的迁移都不做任何改动，只记录版本。
+    """
+    migrations = sorted(MIGRATIONS if migrations is None else migrations, key=lambda m: m.version)
+    _metadata.create_all(bind=engine)
+    applied_now = []
+    with engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            _transactional_ddl(conn)
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            conn.commit()
+        try:
+            applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+            ctx = MigrationContext(conn)
+            for migration in migrations:
+                if migration.version in applied:
+                    continue
+                logger.info(f"🔧 执行数据库迁移 {migration.version}: {migration.name}")
+                try:
+                    migration.upgrade(ctx)
+                    conn.execute(schema_migrations.insert().values(
+                        version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                    ))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logger.error(f"❌ 数据库迁移 {migration.version} ({migration.name}) 失败")
+                    raise
+                applied_now.append(migration.version)
+        finally:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                conn.commit()
+            if conn.dialect.name == "sqlite":
+                conn.invalidate()  # 连接的事务模式已被修改，不放回连接池
+    return applied_now
+
+
+def _transactional_ddl(conn: Connection):
+    """
+    让 SQLite 连接上的 DDL 也在事务中执行
+
+    Python sqlite3 驱动只在 DML 前自动 BEGIN，ALTER/CREATE 会立即生效、无法回滚；
+    关闭驱动的事务管理并在每个事务开始时显式 BEGIN（SQLAlchemy 文档推荐的做法）。
+    """
+    conn.connection.driver_connection.isolation_level = None
+    event.listen(conn, "begin", lambda c: c.exec_driver_sql("BEGIN"))
+
+
+if __name__ == "__main__":
+    # python -m app.utils.migrations：不启动服务，仅创建表并执行迁移
+    from app.utils.database import engine, init_db
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    init_db()
+    print(f"✅ 数据库版本: {current_version(engine)}")
@@ -0,0 +1,50 @@
+"""统计工具 - 指标汇总用的均值、分位数等"""
+import math
+from typing import Optional, Sequence
+
+
+def mean(values: Sequence[float]) -> Optional[float]:
+    """算术平均值（空序列返回 None）"""
+    if not values:
+        return None
+    return sum(values) / len(values)
+
+
+def stddev(values: Sequence[float]) -> Optional[float]:
+    """样本标准差（少于2个值返回 None）"""
+    if len(values) < 2:
+        return None
+    avg = sum(values) / len(values)
+    return math.sqrt(sum((v - avg) ** 2 for v in values) / (len(values) - 1))
+
+
+def percentile(values: Sequence[float], p: float) -> Optional[float]:
+    """
+    分位数（线性插值，与 numpy 默认方法一致）
+
+    Args:
+        values: 数值序列（无需排序）
+        p: 百分位，0-100
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[int(rank)]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def pass_at_k(n: int, c: int, k: int) -> Optional[float]:
+    """
+    pass@k 无偏估计：n 次采样中 c 次通过时，随机取 k 次至少一次通过的概率
+
+    pass@k = 1 - C(n-c, k) / C(n, k)；k > n 时返回 None
+    """
+    if k <= 0 or k > n:
+        return None
+    if n - c < k:
+        return 1.0
+    return 1.0 - math.comb(n - c, k) / math.comb(n, k)
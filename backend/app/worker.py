@@ -0,0 +1,65 @@
+"""独立批量测试 worker 进程
+
+用法（在 backend 目录下）:
+    python -m app.worker                       # 持续消费所有批次
+    python -m app.worker --concurrency 16      # 指定本 worker 的并发上限
+    python -m app.worker --batch batch_xxx --drain   # 只消费指定批次，完成后退出
+
+多 worker 部署时在 API 进程中设置 BATCH_INPROCESS_WORKER=false，
+然后在一台或多台机器上启动任意数量的 worker，它们通过数据库租约分摊组合。
+注意：--concurrency 与模型的 max_concurrency 都是单个 worker 进程内的限制，
+N 个 worker 时对同一模型的实际并发最多为 N × max_concurrency，需按供应商限额折算。
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.services.batch_worker import BatchWorker
+from app.services.client_pool import ClientPool
+from app.utils.database import init_db
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="批量测试 worker")
+    parser.add_argument("--concurrency", type=int, default=None, help="本 worker 的最大并发调用数（默认 BATCH_MAX_CONCURRENCY）；模型 max_concurrency 同样按 worker 计，多 worker 时实际并发成倍增加")
+    parser.add_argument("--batch", dest="batch_id", default=None, help="只消费指定批次")
+    parser.add_argument("--drain", action="store_true", help="没有可领取的组合时退出")
+    parser.add_argument("--worker-id", default=None, help="worker 标识（默认 主机名:进程号:随机串）")
+    return parser.parse_args()
+
+
+async def run_worker(args):
+    worker = BatchWorker(args.worker_id, args.concurrency, args.batch_id)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # 收到信号后停止领取，等待执行中的组合完成
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            # Windows 不支持，Ctrl+C 时任务被取消，租约会被释放
+            pass
+    try:
+        await worker.run(drain=args.drain)
+    finally:
+        await ClientPool.close_all()
+
+
+def main():
+    args = parse_args()
+    init_db()
+    asyncio.run(run_worker(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+SQLite 写入基准：比较默认配置、调优 PRAGMA、调优 + 批量提交时保存组合结果的速度
+
+用法：python benchmark_sqlite_writes.py [组合数量] [每个事务的结果数]
+每个场景使用临时目录中的新数据库，走与 worker 相同的 BatchQueue 保存路径（租约校验、计数更新、完成检查）。
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.model_config import ModelConfigDB
+from app.models.test_case import TestCaseDB
+from app.services import batch_queue
+from app.services.batch_queue import BatchQueue
+from app.utils.database import Base, configure_sqlite
+
+# 默认配置：SQLite 出厂设置（回滚日志、每次提交 fsync）
+DEFAULT_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def run_scenario(workdir: Path, name: str, pragmas, items: int, group_size: int) -> float:
+    """执行一个场景，返回每秒保存的结果数"""
+    engine = create_engine(f"sqlite:///{workdir / name}.db", connect_args={"check_same_thread": False})
+    configure_sqlite(engine, pragmas)
+    Base.metadata.create_all(bind=engine)
+    batch_queue.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = batch_queue.SessionLocal()
+    model = ModelConfigDB(name="bench", provider="openai", model_name="bench")
+    cases = [TestCaseDB(title=f"case {i}", prompt=f"prompt {i}") for i in range(items)]
+    db.add(model)
+    db.add_all(cases)
+    db.commit()
+    BatchQueue.create_batch(db, f"batch_{name}", [model], cases, None, {})
+    db.close()
+    claimed = BatchQueue.claim_items("bench", items, lease_seconds=600)
+
+    outcome = {
+        "result": {"output": "x" * 500, "status": "success"},
+        "metrics": {"response_time": 1.0, "total_tokens": 100},
+        "score": 0.8
+    }
+    entries = [(entry["item_id"], outcome, None) for entry in claimed]
+    start = time.perf_counter()
+    for i in range(0, len(entries), group_size):
+        BatchQueue.save_outcomes("bench", entries[i:i + group_size])
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return len(entries) / elapsed
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    group_size = int(sys.argv[2]) if len(sys.argv) > 2 else settings.BATCH_WRITE_MAX_ITEMS
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        settings.RESULTS_DIR = workdir
+        scenarios = [
+            ("default", DEFAULT_PRAGMAS, 1),
+            ("tuned", None, 1),
+            ("tuned_batched", None, group_size),
+        ]
+        baseline = None
+        print(f"保存 {items} 个组合结果（批量提交每个事务 {group_size} 个）")
+        for name, pragmas, size in scenarios:
+            rate = run_scenario(workdir, name, pragmas, items, size)
+            baseline = baseline or rate
+            print(f"  {name:<14} {rate:>10.1f} 条/秒  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Tests for the streaming agent loop, streamed tool calls and streaming latency metrics."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import agent_service, batch_executor
+from app.services.agent_service import AgentService
+from app.services.batch_executor import BatchExecutor
+from app.services.llm_service import LLMService
+from app.utils import stats
+
+SLOW_TOOL = {
+    "enabled": True,
+    "response_type": "static",
+    "static_response": {"ok": True},
+    "latency_ms": {"min": 100, "max": 100},
+}
+
+
+def _model():
+    return SimpleNamespace(name="Streamed", model_name="gpt-4o-mini", resilience_policy=None)
+
+
+def _tool_call_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+class _FakeCompletions:
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def create(self, **kwargs):
+        async def gen():
+            for chunk in self._chunks:
+                yield chunk
+        return gen()
+
+
+@pytest.mark.asyncio
+async def test_streamed_tool_call_fragments_are_accumulated():
+    chunks = [
+        _chunk(tool_calls=[_tool_call_delta(0, id="c1", name="get_", arguments='{"ci')]),
+        _chunk(tool_calls=[_tool_call_delta(0, name="weather", arguments='ty": "x"}')]),
+        _chunk(tool_calls=[_tool_call_delta(1, id="c2", name="now", arguments="{}")]),
+    ]
+    client = SimpleNamespace(chat=SimpleNamespace(completions=_FakeCompletions(chunks)))
+
+    events = [
+        event async for event in LLMService._stream_openai_response(
+            client, {"messages": [{"content": "hi"}]}, time.time(), _model()
+        )
+    ]
+
+    tool_calls = events[-1]["final_response"]["tool_calls"]
+    assert [tc["id"] for tc in tool_calls] == ["c1", "c2"]
+    assert tool_calls[0]["function"] == {"name": "get_weather", "arguments": '{"city": "x"}'}
+
+
+@pytest.mark.asyncio
+async def test_agent_stream_emits_events_in_order(monkeypatch):
+    final_responses = [
+        {
+            "output": "",
+            "metrics": {"prompt_tokens": 5, "completion_tokens": 1},
+            "status": "success",
+            "tool_calls": [
+                {"id": "c1", "function": {"name": "slow", "arguments": "{}"}},
+                {"id": "c2", "function": {"name": "slow", "arguments": "{}"}},
+            ],
+        },
+        {"output": "sunny", "metrics": {"prompt_tokens": 9, "completion_tokens": 2}, "status": "success"},
+    ]
+
+    async def fake_call_model(*args, **kwargs):
+        assert kwargs["stream"] is True
+        final = final_responses.pop(0)
+
+        async def gen():
+            if final["output"]:
+                yield {"content": final["output"], "done": False}
+            yield {"done": True, "final_response": final, "metrics": final["metrics"]}
+        return gen()
+
+    monkeypatch.setattr(agent_service.LLMService, "call_model", fake_call_model)
+
+    events = [
+        event async for event in AgentService.run_agent_stream(
+            model_config=_model(),
+            content="weather?",
+            tools=[{"type": "function", "function": {"name": "slow"}}],
+            tools_config={"slow": SLOW_TOOL},
+            use_mock=True,
+            virtual_clock=True,
+        )
+    ]
+
+    types = [event["type"] for event in events]
+    assert types == [
+        "iteration_start", "iteration_end",
+        "tool_call_start", "tool_call_start", "tool_call_end", "tool_call_end",
+        "iteration_start", "content", "iteration_end",
+        "done",
+    ]
+    done = events[-1]
+    assert done["status"] == "success"
+    assert done["output"] == "sunny"
+    assert done["metrics"]["total_tokens"] == 17
+    assert done["metrics"]["time_to_first_token"] is not None
+    assert [m["role"] for m in done["conversation_history"]] == ["user", "assistant", "tool", "tool", "assistant"]
+
+
+class _SlowCompletions:
+    """Emits content chunks 20ms apart, then a usage-only chunk with no choices."""
+
+    async def create(self, **kwargs):
+        async def gen():
+            for piece in ("a", "b", "c"):
+                await asyncio.sleep(0.02)
+                yield _chunk(content=piece)
+            yield SimpleNamespace(
+                choices=[], usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3)
+            )
+        return gen()
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_latency_metrics_and_usage_chunk():
+    client = SimpleNamespace(chat=SimpleNamespace(completions=_SlowCompletions()))
+
+    events = [
+        event async for event in LLMService._stream_openai_response(
+            client, {"messages": [{"content": "hi"}]}, time.time(), _model()
+        )
+    ]
+
+    metrics = events[-1]["metrics"]
+    assert metrics["prompt_tokens"] == 7
+    assert metrics["completion_tokens"] == 3
+    assert metrics["tokens_estimated"] is False
+    assert metrics["chunk_count"] == 3
+    assert 0.015 < metrics["time_to_first_token"] < 0.2
+    assert 0.015 < metrics["inter_token_latency_mean"] < 0.2
+    assert metrics["inter_token_latency_p95"] >= metrics["inter_token_latency_mean"] * 0.9
+    assert metrics["output_tokens_per_second"] > 0
+
+
+@pytest.mark.asyncio
+async def test_batch_force_stream_collects_streamed_result(monkeypatch):
+    async def fake_call_model(*args, **kwargs):
+        assert kwargs["stream"] is True
+
+        async def gen():
+            yield {"content": "hello", "done": False}
+            yield {
+                "done": True,
+                "final_response": {
+                    "output": "hello",
+                    "metrics": {"time_to_first_token": 0.1, "chunk_count": 1},
+                    "status": "success",
+                },
+            }
+        return gen()
+
+    monkeypatch.setattr(batch_executor.LLMService, "call_model", fake_call_model)
+    test_case = SimpleNamespace(
+        id=1, prompt="hi", system_prompt=None, conversation_history=None,
+        expected_output=None, expected_tool_calls=None, evaluation_criteria=None,
+        evaluation_weights=None, use_mock=False,
+    )
+
+    outcome = await BatchExecutor.execute_pair(
+        test_case, SimpleNamespace(id=1), None, {}, None, force_stream=True
+    )
+
+    assert outcome["result"]["output"] == "hello"
+    assert outcome["metrics"]["time_to_first_token"] == 0.1
+
+
+def test_percentile_interpolates():
+    assert stats.percentile([1, 2, 3, 4], 50) == 2.5
+    assert stats.percentile([5], 95) == 5
+    assert stats.percentile([], 95) is None
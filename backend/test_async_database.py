@@ -0,0 +1,59 @@
+"""Tests for the database layer: async sessions used by the API routers and SQLite tuning."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.api import testcases, tools
+from app.services.tool_registry import ToolRegistry
+from app.utils.database import Base, get_async_db, async_database_url, configure_sqlite
+
+
+def test_async_database_url():
+    assert async_database_url("sqlite:///./data/models.db") == "sqlite+aiosqlite:///./data/models.db"
+    assert async_database_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+
+def test_sqlite_pragmas_are_applied_on_connect(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    configure_sqlite(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+@pytest.fixture
+def client(tmp_path):
+    url = f"sqlite:///{tmp_path / 'api.db'}"
+    Base.metadata.create_all(bind=create_engine(url))
+    factory = async_sessionmaker(create_async_engine(async_database_url(url)), expire_on_commit=False)
+
+    async def override():
+        async with factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(testcases.router, prefix="/api/testcases")
+    app.include_router(tools.router, prefix="/api/tools")
+    app.dependency_overrides[get_async_db] = override
+    ToolRegistry.invalidate()
+    with TestClient(app) as test_client:
+        yield test_client
+    ToolRegistry.invalidate()
+
+
+def test_crud_round_trip_through_async_session(client):
+    created = client.post("/api/testcases/", json={"title": "greeting", "prompt": "hi", "tags": "smoke"})
+    assert created.status_code == 201
+    case_id = created.json()["id"]
+
+    assert client.put(f"/api/testcases/{case_id}", json={"title": "hello"}).json()["title"] == "hello"
+    assert [c["id"] for c in client.get("/api/testcases/", params={"tags": "smoke"}).json()] == [case_id]
+    assert client.delete(f"/api/testcases/{case_id}").status_code == 204
+    assert client.get(f"/api/testcases/{case_id}").status_code == 404
+
+    tool = {"name": "search", "description": "web search", "parameters": {"type": "object", "properties": {}}}
+    assert client.post("/api/tools/", json=tool).status_code == 201
+    assert client.post("/api/tools/", json=tool).status_code == 400
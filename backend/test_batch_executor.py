@@ -0,0 +1,89 @@
+"""Tests for the concurrent batch executor."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.batch_executor import ConcurrencyLimiter, PrioritySemaphore
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_respects_global_and_model_limits():
+    """Global and per-model limits cap the number of concurrent slots."""
+    ConcurrencyLimiter._model_semaphores.clear()
+    limiter = ConcurrencyLimiter(3)
+    fast = SimpleNamespace(id=101, max_concurrency=3)
+    slow = SimpleNamespace(id=102, max_concurrency=1)
+    state = {"in_flight": {}, "peak": {}, "peak_total": 0}
+
+    async def job(model):
+        async with limiter.slot(model):
+            in_flight = state["in_flight"]
+            in_flight[model.id] = in_flight.get(model.id, 0) + 1
+            state["peak"][model.id] = max(state["peak"].get(model.id, 0), in_flight[model.id])
+            state["peak_total"] = max(state["peak_total"], sum(in_flight.values()))
+            await asyncio.sleep(0.01)
+            in_flight[model.id] -= 1
+
+    await asyncio.gather(*(job(model) for _ in range(6) for model in (fast, slow)))
+
+    assert state["peak_total"] <= 3
+    assert state["peak"][fast.id] <= 3
+    assert state["peak"][slow.id] == 1
+
+
+@pytest.mark.asyncio
+async def test_priority_semaphore_serves_high_priority_waiters_first():
+    semaphore = PrioritySemaphore(1)
+    order = []
+
+    async def job(name, priority):
+        async with semaphore.hold(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await semaphore.acquire()
+    tasks = [asyncio.create_task(job(name, priority)) for name, priority in [("low1", 0), ("low2", 0), ("high", 5)]]
+    cancelled = asyncio.create_task(job("cancelled", 9))
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+    semaphore.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["high", "low1", "low2"]
+
+
+@pytest.mark.asyncio
+async def test_model_limit_change_resizes_the_shared_semaphore():
+    """Editing a model's max_concurrency mid-batch never lets old and new slots add up."""
+    ConcurrencyLimiter._model_semaphores.clear()
+    limiter = ConcurrencyLimiter(10)
+    model = SimpleNamespace(id=301, max_concurrency=3)
+    state = {"in_flight": 0, "peak": 0}
+    started = asyncio.Event()
+
+    async def job():
+        async with limiter.slot(model):
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            started.set()
+            await asyncio.sleep(0.02)
+            state["in_flight"] -= 1
+
+    first = [asyncio.create_task(job()) for _ in range(3)]
+    await started.wait()
+    model.max_concurrency = 1
+    await asyncio.gather(*first, *(job() for _ in range(3)))
+
+    assert len(ConcurrencyLimiter._model_semaphores) == 1
+    assert state["peak"] == 3
+    assert ConcurrencyLimiter._model_semaphores[model.id]._value == 1
+
+    # 缩容后新组合按新上限执行，扩容立即生效
+    state["peak"] = 0
+    await asyncio.gather(*(job() for _ in range(3)))
+    assert state["peak"] == 1
+    model.max_concurrency = 2
+    state["peak"] = 0
+    await asyncio.gather(*(job() for _ in range(4)))
+    assert state["peak"] == 2
@@ -0,0 +1,520 @@
+"""Tests for the persistent, resumable batch queue and lease-based workers."""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.batch_job import BatchDB, BatchItemDB, ITEM_CANCELLED, ITEM_DONE, ITEM_FAILED, ITEM_PENDING, ITEM_RUNNING, ITEM_SKIPPED
+from app.models.model_config import ModelConfigDB
+from app.models.test_case import TestCaseDB
+from app.models.test_result import TestResultDB, TestResultSampleDB
+from app.services import batch_executor, batch_progress, batch_queue
+from app.services.batch_executor import ConcurrencyLimiter
+from app.services.batch_progress import BatchProgress
+from app.services.batch_queue import BatchQueue
+from app.services.batch_worker import BatchWorker
+from app.services.early_stopping import EarlyStopping
+from app.services.result_writer import ResultWriter
+from app.utils.database import Base
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(batch_queue, "SessionLocal", factory)
+    monkeypatch.setattr(batch_progress, "SessionLocal", factory)
+    monkeypatch.setattr(settings, "BATCH_PROGRESS_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "RESULTS_DIR", tmp_path)
+    ConcurrencyLimiter._model_semaphores.clear()
+    return factory
+
+
+async def _drain(batch_id=None, worker_id=None, concurrency=4):
+    await BatchWorker(worker_id=worker_id, concurrency=concurrency, batch_id=batch_id).run(drain=True)
+
+
+def _seed(db, n_cases=3):
+    model = ModelConfigDB(name="M", provider="openai", model_name="m", default_params={})
+    db.add(model)
+    cases = [TestCaseDB(title=f"case {i}", prompt=f"prompt {i}") for i in range(n_cases)]
+    db.add_all(cases)
+    db.commit()
+    return model, cases
+
+
+def _install_fake_llm(monkeypatch, fail_prompts=(), delay=0.0):
+    calls = []
+
+    async def fake_call_model(model_config, content, **kwargs):
+        calls.append(content)
+        await asyncio.sleep(delay)
+        if content in fail_prompts:
+            return {"output": "", "metrics": {}, "status": "error", "error_message": "boom"}
+        return {"output": content, "metrics": {"response_time": 0.01}, "status": "success"}
+
+    monkeypatch.setattr(batch_executor.LLMService, "call_model", fake_call_model)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_results_are_committed_per_item(monkeypatch, session_factory):
+    calls = _install_fake_llm(monkeypatch, fail_prompts={"prompt 1"})
+    db = session_factory()
+    model, cases = _seed(db)
+    BatchQueue.create_batch(db, "batch_a", [model], cases, None, {})
+
+    await _drain("batch_a")
+
+    db.expire_all()
+    items = db.query(BatchItemDB).order_by(BatchItemDB.position).all()
+    assert [item.status for item in items] == [ITEM_DONE, ITEM_FAILED, ITEM_DONE]
+    assert all(item.result_id for item in items)
+    assert db.query(TestResultDB).count() == 3
+    batch = db.get(BatchDB, "batch_a")
+    assert batch.status == "completed"
+    assert (batch.done_items, batch.failed_items) == (2, 1)
+    assert len(calls) == 3
+    data = json.loads((settings.RESULTS_DIR / "batch_a.json").read_text(encoding="utf-8"))
+    assert [r["test_case_id"] for r in data["results"]] == [c.id for c in cases]
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_items(monkeypatch, session_factory):
+    """After a crash, only interrupted and failed items are called again."""
+    db = session_factory()
+    model, cases = _seed(db)
+    BatchQueue.create_batch(db, "batch_b", [model], cases, None, {})
+
+    # 模拟进程崩溃：第一个组合已完成，第二个执行到一半，第三个失败
+    items = db.query(BatchItemDB).order_by(BatchItemDB.position).all()
+    done_result = TestResultDB(test_case_id=cases[0].id, model_id=model.id, output="old", status="success")
+    failed_result = TestResultDB(test_case_id=cases[2].id, model_id=model.id, output="", status="error")
+    db.add_all([done_result, failed_result])
+    db.flush()
+    items[0].status, items[0].result_id = ITEM_DONE, done_result.id
+    items[1].status = ITEM_RUNNING
+    items[2].status, items[2].result_id = ITEM_FAILED, failed_result.id
+    db.get(BatchDB, "batch_b").status = "running"
+    db.commit()
+    failed_result_id = failed_result.id
+
+    calls = _install_fake_llm(monkeypatch)
+    BatchQueue.reset_for_resume(db, "batch_b")
+    await _drain("batch_b")
+
+    db.expire_all()
+    assert sorted(calls) == ["prompt 1", "prompt 2"]
+    assert {item.status for item in db.query(BatchItemDB)} == {ITEM_DONE}
+    # 重试成功的结果替换了之前失败的结果
+    assert db.query(TestResultDB).count() == 3
+    assert db.get(TestResultDB, failed_result_id) is None
+    batch = db.get(BatchDB, "batch_b")
+    assert (batch.done_items, batch.failed_items) == (3, 0)
+
+
+@pytest.mark.asyncio
+async def test_two_workers_share_a_batch_without_duplicates(monkeypatch, session_factory):
+    calls = _install_fake_llm(monkeypatch, delay=0.01)
+    db = session_factory()
+    model, cases = _seed(db, n_cases=12)
+    BatchQueue.create_batch(db, "batch_c", [model], cases, None, {})
+
+    await asyncio.gather(_drain(worker_id="w1", concurrency=2), _drain(worker_id="w2", concurrency=2))
+
+    assert sorted(calls) == sorted(c.prompt for c in cases)
+    db.expire_all()
+    assert {item.status for item in db.query(BatchItemDB)} == {ITEM_DONE}
+    assert db.get(BatchDB, "batch_c").status == "completed"
+
+
+@pytest.mark.asyncio
+async def test_batch_concurrency_limit_is_released_when_the_batch_drains(monkeypatch, session_factory):
+    _install_fake_llm(monkeypatch, delay=0.01)
+    db = session_factory()
+    model, cases = _seed(db, n_cases=4)
+    BatchQueue.create_batch(db, "batch_l", [model], cases, None, {"max_concurrency": 2})
+    worker = BatchWorker(concurrency=4, batch_id="batch_l")
+
+    await worker.run(drain=True)
+
+    assert db.get(BatchDB, "batch_l").status == "completed"
+    assert worker._batch_semaphores == {} and worker._batch_inflight == {}
+
+
+def test_expired_leases_are_reclaimed(session_factory):
+    db = session_factory()
+    model, cases = _seed(db, n_cases=2)
+    BatchQueue.create_batch(db, "batch_d", [model], cases, None, {})
+
+    first = BatchQueue.claim_items("w1", 10, lease_seconds=60)
+    assert len(first) == 2
+    assert BatchQueue.claim_items("w2", 10, lease_seconds=60) == []
+
+    # w1 失联：租约过期后 w2 可以接管，w1 之后提交的结果被丢弃
+    db.query(BatchItemDB).update({BatchItemDB.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    second = BatchQueue.claim_items("w2", 10, lease_seconds=60)
+    assert len(second) == 2
+
+    outcome = {"result": {"output": "late", "status": "success"}, "metrics": {}, "score": None}
+    assert BatchQueue.save_outcome(first[0]["item_id"], "w1", outcome) is False
+    assert BatchQueue.save_outcome(second[0]["item_id"], "w2", outcome) is True
+
+
+@pytest.mark.asyncio
+async def test_progress_stream_pushes_results_incrementally(monkeypatch, session_factory):
+    _install_fake_llm(monkeypatch, fail_prompts={"prompt 1"}, delay=0.02)
+    db = session_factory()
+    model, cases = _seed(db)
+    BatchQueue.create_batch(db, "batch_e", [model], cases, None, {})
+
+    async def collect():
+        return [event async for event in BatchProgress.stream("batch_e")]
+
+    events, _ = await asyncio.gather(collect(), _drain("batch_e", concurrency=1))
+
+    results = [e for e in events if e["type"] == "result"]
+    assert [e["test_case_id"] for e in results] == [c.id for c in cases]
+    assert [e["item_status"] for e in results] == [ITEM_DONE, ITEM_FAILED, ITEM_DONE]
+    # 第一个进度事件在任何结果之前推送，之后随完成数量递增
+    assert events[0]["type"] == "progress" and events[0]["completed"] == 0
+    final = [e for e in events if e["type"] == "progress"][-1]
+    assert (final["completed"], final["failed"], final["percent"], final["eta_seconds"]) == (2, 1, 100.0, 0.0)
+    stats = final["models"][model.id]
+    assert (stats["name"], stats["count"], stats["failed"]) == ("M", 3, 1)
+    assert stats["avg_latency"] == pytest.approx(0.01)
+    assert events[-1] == {"type": "done", "batch_id": "batch_e", "status": "completed"}
+
+
+@pytest.mark.asyncio
+async def test_progress_stream_follows_items_not_result_ids(session_factory):
+    """A result with a lower id that becomes visible late is still reported; a retried item is counted once."""
+    db = session_factory()
+    model, cases = _seed(db, n_cases=2)
+    BatchQueue.create_batch(db, "batch_o", [model], cases, None, {})
+    db.query(BatchDB).filter(BatchDB.id == "batch_o").update({BatchDB.status: "running"})
+    first, second, retried = (TestResultDB(test_case_id=c.id, model_id=model.id, output="", status=s, score=v) for c, s, v in (
+        (cases[0], "success", 1.0), (cases[1], "error", 0.0), (cases[1], "success", 0.5)
+    ))
+    db.add_all([first, second, retried])
+    db.flush()
+    items = db.query(BatchItemDB).order_by(BatchItemDB.position).all()
+    # 第二个组合（较大的结果ID）先提交可见
+    items[1].status, items[1].result_id = ITEM_FAILED, second.id
+    db.commit()
+
+    stream = BatchProgress.stream("batch_o")
+    events = []
+    while not events or events[-1]["type"] != "progress":
+        events.append(await stream.__anext__())
+    assert [e["result_id"] for e in events if e["type"] == "result"] == [second.id]
+
+    # 较小ID的结果随后可见，第二个组合重试成功替换失败结果
+    items[0].status, items[0].result_id = ITEM_DONE, first.id
+    items[1].status, items[1].result_id = ITEM_DONE, retried.id
+    db.query(BatchDB).filter(BatchDB.id == "batch_o").update({BatchDB.status: "completed"})
+    db.commit()
+    events += [event async for event in stream]
+
+    assert sorted(e["result_id"] for e in events if e["type"] == "result") == sorted([second.id, first.id, retried.id])
+    stats = [e for e in events if e["type"] == "progress"][-1]["models"][model.id]
+    assert (stats["count"], stats["failed"], stats["avg_score"]) == (2, 0, 0.75)
+
+
+@pytest.mark.asyncio
+async def test_progress_stream_unknown_batch(session_factory):
+    events = [event async for event in BatchProgress.stream("missing")]
+    assert events == [{"type": "error", "error_message": "Batch not found"}]
+
+
+def test_history_pages_batches_by_creation_time(session_factory):
+    db = session_factory()
+    model, cases = _seed(db, n_cases=2)
+    batch_ids = [BatchQueue.new_batch_id() for _ in range(3)]
+    # 同一秒内创建的批次ID也不会冲突
+    assert len(set(batch_ids)) == 3
+    for index, batch_id in enumerate(batch_ids):
+        batch = BatchQueue.create_batch(db, batch_id, [model], cases, None, {})
+        batch.created_at = datetime(2024, 1, 1 + index)
+        batch.done_items, batch.scored_items, batch.score_sum = 2, 2, 1.5
+    db.commit()
+
+    history, total = BatchQueue.history(db, skip=1, limit=1)
+    assert total == 3
+    assert [entry["batch_id"] for entry in history] == [batch_ids[1]]
+    assert history[0]["models"] == [{"id": model.id, "name": "M"}]
+    assert history[0]["counts"]["done"] == 2
+    assert history[0]["score_mean"] == 0.75
+    assert BatchQueue.history(db, status="completed") == ([], 0)
+
+
+@pytest.mark.asyncio
+async def test_items_of_deleted_test_cases_are_counted_as_failed(monkeypatch, session_factory):
+    _install_fake_llm(monkeypatch)
+    db = session_factory()
+    model, cases = _seed(db)
+    BatchQueue.create_batch(db, "batch_d", [model], cases, None, {})
+    db.delete(cases[1])
+    db.commit()
+
+    await _drain("batch_d")
+
+    db.expire_all()
+    assert BatchQueue.status(db, db.get(BatchDB, "batch_d"))["counts"]["failed"] == 1
+    history, _ = BatchQueue.history(db)
+    assert history[0]["status"] == "completed"
+    assert (history[0]["counts"]["done"], history[0]["counts"]["failed"]) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_delete_removes_batch_and_its_own_results(monkeypatch, session_factory):
+    _install_fake_llm(monkeypatch)
+    db = session_factory()
+    model, cases = _seed(db, n_cases=2)
+    BatchQueue.create_batch(db, "batch_old", [model], cases, None, {})
+    await _drain("batch_old")
+    # 第二个批次复用了第一个组合的结果（增量重跑），删除第一个批次时该结果必须保留
+    db.expire_all()
+    reused_id = db.query(BatchItemDB).filter(BatchItemDB.batch_id == "batch_old").order_by(BatchItemDB.position).first().result_id
+    BatchQueue.create_batch(db, "batch_new", [model], cases[:1], None, {})
+    item = db.query(BatchItemDB).filter(BatchItemDB.batch_id == "batch_new").one()
+    item.status, item.result_id = ITEM_DONE, reused_id
+    db.commit()
+
+    assert not BatchQueue.delete(db, "batch_new")  # 等待中的批次不能删除
+    assert BatchQueue.delete(db, "batch_old")
+
+    db.expire_all()
+    assert db.get(BatchDB, "batch_old") is None
+    assert db.query(BatchItemDB).filter(BatchItemDB.batch_id == "batch_old").count() == 0
+    assert [r.id for r in db.query(TestResultDB)] == [reused_id]
+    assert not (settings.RESULTS_DIR / "batch_old.json").exists()
+    entries, total = BatchQueue.history(db)
+    assert total == 1 and entries[0]["batch_id"] == "batch_new"
+
+
+def test_higher_priority_batches_are_claimed_first(session_factory):
+    db = session_factory()
+    model, cases = _seed(db, n_cases=2)
+    BatchQueue.create_batch(db, "overnight", [model], cases, None, {})
+    BatchQueue.create_batch(db, "regression", [model], cases[:1], None, {}, priority=10)
+
+    claimed = BatchQueue.claim_items("w1", 2, lease_seconds=60)
+    assert [(entry["batch_id"], entry["priority"]) for entry in claimed] == [("regression", 10), ("overnight", 0)]
+
+
+@pytest.mark.asyncio
+async def test_cancel_interrupts_in_flight_calls(monkeypatch, session_factory):
+    monkeypatch.setattr(settings, "BATCH_WORKER_POLL_INTERVAL", 0.05)
+    calls = _install_fake_llm(monkeypatch, delay=10)
+    db = session_factory()
+    model, cases = _seed(db)
+    BatchQueue.create_batch(db, "batch_f", [model], cases, None, {})
+
+    worker = asyncio.create_task(_drain("batch_f", concurrency=2))
+    while len(calls) < 2:
+        await asyncio.sleep(0.01)
+    assert BatchQueue.cancel(db, "batch_f") == 3
+    BatchWorker.check_revoked()
+    # 执行中的调用被中断，worker 不必等待 10 秒的调用结束
+    await asyncio.wait_for(worker, timeout=2)
+
+    db.expire_all()
+    assert {item.status for item in db.query(BatchItemDB)} == {ITEM_CANCELLED}
+    assert db.query(TestResultDB).count() == 0
+    assert db.get(BatchDB, "batch_f").status == "cancelled"
+    assert db.get(BatchDB, "batch_f").cancelled_items == 3
+
+
+@pytest.mark.asyncio
+async def test_pause_requeues_in_flight_items_until_resumed(monkeypatch, session_factory):
+    monkeypatch.setattr(settings, "BATCH_WORKER_POLL_INTERVAL", 0.05)
+    calls = _install_fake_llm(monkeypatch, delay=10)
+    db = session_factory()
+    model, cases = _seed(db)
+    BatchQueue.create_batch(db, "batch_g", [model], cases, None, {})
+
+    worker = asyncio.create_task(_drain("batch_g", concurrency=2))
+    while len(calls) < 2:
+        await asyncio.sleep(0.01)
+    assert BatchQueue.pause(db, "batch_g") == 2
+    BatchWorker.check_revoked()
+    await asyncio.wait_for(worker, timeout=2)
+
+    db.expire_all()
+    assert {item.status for item in db.query(BatchItemDB)} == {ITEM_PENDING}
+    assert db.get(BatchDB, "batch_g").status == "paused"
+
+    _install_fake_llm(monkeypatch)
+    BatchQueue.reset_for_resume(db, "batch_g")
+    await _drain("batch_g")
+    db.expire_all()
+    assert {item.status for item in db.query(BatchItemDB)} == {ITEM_DONE}
+    assert db.get(BatchDB, "batch_g").status == "completed"
+
+
+@pytest.mark.asyncio
+async def test_multi_sample_run_stores_samples_and_pass_at_k(monkeypatch, session_factory):
+    calls = []
+
+    async def flaky_call_model(model_config, content, **kwargs):
+        calls.append(kwargs.get("use_cache"))
+        index = len(calls)
+        await asyncio.sleep(0.01)
+        if index % 2 == 0:
+            return {"output": "", "metrics": {}, "status": "error", "error_message": "boom"}
+        return {"output": content, "metrics": {"response_time": 0.1 * index, "total_tokens": 10}, "status": "success"}
+
+    monkeypatch.setattr(batch_executor.LLMService, "call_model", flaky_call_model)
+    db = session_factory()
+    model, cases = _seed(db, n_cases=1)
+    BatchQueue.create_batch(db, "batch_h", [model], cases, None, {"n_samples": 4, "use_cache": True})
+
+    await _drain("batch_h")
+
+    # 采样不走缓存，4 次调用全部真实执行
+    assert calls == [False] * 4
+    db.expire_all()
+    item = db.query(BatchItemDB).one()
+    assert item.status == ITEM_DONE
+    result = db.get(TestResultDB, item.result_id)
+    assert result.status == "success"
+    samples = db.query(TestResultSampleDB).filter(TestResultSampleDB.result_id == result.id).all()
+    assert sorted(s.sample_index for s in samples) == [0, 1, 2, 3]
+    assert sum(s.passed for s in samples) == 2
+
+    summary = result.metrics["samples"]
+    assert (summary["n_samples"], summary["n_passed"], summary["pass_rate"]) == (4, 2, 0.5)
+    assert summary["pass_at_k"]["1"] == pytest.approx(0.5)
+    assert summary["pass_at_k"]["3"] == 1.0
+    assert summary["pass_at_k"]["4"] == 1.0
+    assert summary["latency_p50"] == pytest.approx(0.2)
+    assert summary["tokens_mean"] == 10
+    assert result.metrics["response_time"] == pytest.approx(summary["latency_mean"])
+
+
+@pytest.mark.asyncio
+async def test_only_stale_reruns_changed_pairs(monkeypatch, session_factory):
+    calls = _install_fake_llm(monkeypatch)
+    db = session_factory()
+    model, cases = _seed(db)
+    BatchQueue.create_batch(db, "nightly_1", [model], cases, None, {})
+    await _drain("nightly_1")
+    assert len(calls) == 3
+    assert all(r.fingerprint for r in db.query(TestResultDB))
+
+    # 只修改一个用例的提示词
+    cases[1].prompt = "prompt 1 edited"
+    db.commit()
+    calls.clear()
+    BatchQueue.create_batch(db, "nightly_2", [model], cases, None, {}, only_stale=True)
+    await _drain("nightly_2")
+
+    assert calls == ["prompt 1 edited"]
+    db.expire_all()
+    items = db.query(BatchItemDB).filter(BatchItemDB.batch_id == "nightly_2").order_by(BatchItemDB.position).all()
+    assert {item.status for item in items} == {ITEM_DONE}
+    first = db.query(BatchItemDB).filter(BatchItemDB.batch_id == "nightly_1").order_by(BatchItemDB.position).all()
+    assert items[0].result_id == first[0].result_id
+    assert items[1].result_id != first[1].result_id
+    assert db.get(BatchDB, "nightly_2").status == "completed"
+
+    # 全部复用时批次直接完成；覆盖模型参数视为输入变化，全部组合重新执行
+    BatchQueue.create_batch(db, "nightly_3", [model], cases, None, {}, only_stale=True)
+    assert db.get(BatchDB, "nightly_3").status == "completed"
+    BatchQueue.create_batch(db, "nightly_4", [model], cases, {"temperature": 0}, {}, only_stale=True)
+    assert db.query(BatchItemDB).filter(
+        BatchItemDB.batch_id == "nightly_4", BatchItemDB.status == ITEM_PENDING
+    ).count() == 3
+
+
+@pytest.mark.asyncio
+async def test_adaptive_batch_stops_models_that_are_clearly_behind(monkeypatch, session_factory):
+    calls = []
+
+    async def fake_call_model(model_config, content, **kwargs):
+        calls.append(model_config.name)
+        output = "the expected answer" if model_config.name == "strong" else "zzz"
+        return {"output": output, "metrics": {}, "status": "success"}
+
+    monkeypatch.setattr(batch_executor.LLMService, "call_model", fake_call_model)
+    db = session_factory()
+    strong = ModelConfigDB(name="strong", provider="openai", model_name="a", default_params={})
+    weak = ModelConfigDB(name="weak", provider="openai", model_name="b", default_params={})
+    cases = [TestCaseDB(title=f"case {i}", prompt=f"q{i}", expected_output="the expected answer") for i in range(10)]
+    db.add_all([strong, weak, *cases])
+    db.commit()
+    BatchQueue.create_batch(db, "adaptive", [strong, weak], cases, None, {"adaptive": True, "min_cases": 3})
+
+    await _drain("adaptive", concurrency=1)
+
+    # 用例在模型间交错执行；得分全为 1 和全为 0 时，95% 的 Wilson 区间在第 4 个用例分开
+    assert calls.count("strong") == 10
+    assert calls.count("weak") == 4
+    db.expire_all()
+    batch = db.get(BatchDB, "adaptive")
+    assert batch.status == "completed"
+    decision = batch.early_stopping
+    assert decision["leader"] == strong.id
+    assert decision["models"][str(weak.id)]["stopped"] is True
+    assert decision["models"][str(weak.id)]["stopped_at"] == 4
+    assert decision["models"][str(strong.id)]["stopped"] is False
+    assert db.query(BatchItemDB).filter(BatchItemDB.status == ITEM_SKIPPED).count() == 6
+    assert (batch.done_items, batch.skipped_items) == (14, 6)
+
+
+def test_early_stopping_keeps_models_with_overlapping_intervals():
+    scores = {1: {"n": 20, "mean": 0.72, "std": 0.2}, 2: {"n": 20, "mean": 0.65, "std": 0.2}}
+    decision = EarlyStopping.evaluate(scores, [1, 2], confidence=0.95, min_cases=5)
+    assert decision["leader"] == 1
+    assert decision["models"]["2"]["stopped"] is False
+    lower, upper = decision["models"]["2"]["ci"]
+    assert lower < 0.65 < upper
+
+    # 差距足够大时停止；最少用例数不足时不作判断
+    scores[2]["mean"] = 0.3
+    assert EarlyStopping.evaluate(scores, [1, 2], 0.95, 5)["models"]["2"]["stopped"] is True
+    assert EarlyStopping.evaluate(scores, [1, 2], 0.95, 50)["models"]["2"]["stopped"] is False
+
+
+def test_early_stopping_does_not_trust_identical_early_scores():
+    """Identical early scores have zero sample variance but must not give a zero-width interval."""
+    scores = {1: {"n": 2, "mean": 0.8, "std": 0.0}, 2: {"n": 2, "mean": 0.7, "std": 0.0}}
+    decision = EarlyStopping.evaluate(scores, [1, 2], confidence=0.95, min_cases=2)
+    assert decision["models"]["2"]["stopped"] is False
+    lower, upper = decision["models"]["1"]["ci"]
+    assert lower < 0.8 < upper
+    assert 0.0 <= lower and upper <= 1.0
+
+    # 更多用例仍一致时区间收窄，差距明显的模型最终被停止
+    scores = {1: {"n": 40, "mean": 0.8, "std": 0.0}, 2: {"n": 40, "mean": 0.5, "std": 0.0}}
+    assert EarlyStopping.evaluate(scores, [1, 2], 0.95, 2)["models"]["2"]["stopped"] is True
+
+
+@pytest.mark.asyncio
+async def test_result_writer_groups_outcomes_into_one_transaction(session_factory):
+    db = session_factory()
+    model, cases = _seed(db, n_cases=5)
+    BatchQueue.create_batch(db, "batch_w", [model], cases, None, {})
+    claimed = BatchQueue.claim_items("w1", 5, lease_seconds=60)
+
+    writer = ResultWriter("w1", interval=0.05)
+    writer.start()
+    outcome = {"result": {"output": "ok", "status": "success"}, "metrics": {}, "score": 1.0}
+    futures = [writer.submit(entry["item_id"], outcome) for entry in claimed]
+    # 租约不属于该 worker 的结果被拒绝，不影响同批的其他结果
+    futures.append(writer.submit(claimed[0]["item_id"], outcome))
+    await writer.close()
+
+    assert [f.result() for f in futures] == [True] * 5 + [False]
+    assert writer.transactions == 1
+    db.expire_all()
+    batch = db.get(BatchDB, "batch_w")
+    assert batch.status == "completed"
+    assert (batch.done_items, batch.score_sum) == (5, 5.0)
@@ -0,0 +1,93 @@
+"""Tests for the concurrency-sweep benchmark."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import benchmark_service
+from app.services.benchmark_service import BenchmarkService
+from app.services.llm_service import LLMService
+
+CASES = [SimpleNamespace(prompt="p", system_prompt=None, conversation_history=None)]
+
+
+def _model(policy=None):
+    return SimpleNamespace(
+        id=1, name="Fake vLLM", provider="openai", api_endpoint="http://bench.local/v1",
+        api_key=None, model_name="fake", default_params={}, rpm_limit=1, tpm_limit=None,
+        resilience_policy=policy,
+    )
+
+
+def test_default_levels_double_up_to_max():
+    assert BenchmarkService.default_levels(1) == [1]
+    assert BenchmarkService.default_levels(8) == [1, 2, 4, 8]
+    assert BenchmarkService.default_levels(12) == [1, 2, 4, 8, 12]
+
+
+@pytest.mark.asyncio
+async def test_sweep_detects_saturation_of_a_two_slot_server(monkeypatch):
+    """A fake server that serves two requests at a time saturates at concurrency 2."""
+    server_slots = asyncio.Semaphore(2)
+
+    async def fake_dispatch(*args, **kwargs):
+        async with server_slots:
+            await asyncio.sleep(0.02)
+        return {
+            "output": "ok",
+            "metrics": {"completion_tokens": 10, "time_to_first_token": 0.01},
+            "status": "success",
+        }
+
+    monkeypatch.setattr(benchmark_service.LLMService, "_dispatch", fake_dispatch)
+
+    report = await BenchmarkService.run_sweep(
+        _model(), CASES, [1, 2, 4], requests_per_level=8, stream=False
+    )
+
+    levels = report["levels"]
+    assert [level["requests"] for level in levels] == [8, 8, 8]
+    assert levels[1]["throughput_rps"] > levels[0]["throughput_rps"] * 1.5
+    assert levels[2]["latency_p95"] > levels[1]["latency_p95"]
+    assert levels[0]["error_rate"] == 0.0
+    assert levels[0]["ttft_p50"] == 0.01
+    assert report["saturation"]["concurrency"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_are_reported_not_retried(monkeypatch):
+    """429s count as errors instead of being absorbed by the client's limiter and retries."""
+    calls = []
+
+    async def throttled_dispatch(*args, **kwargs):
+        calls.append(1)
+        if len(calls) % 2:
+            return {"output": "", "metrics": {}, "status": "error", "status_code": 429, "retry_after": 30}
+        return {"output": "ok", "metrics": {}, "status": "success"}
+
+    async def unexpected_call_model(*args, **kwargs):
+        raise AssertionError("benchmark must bypass call_model")
+
+    monkeypatch.setattr(LLMService, "_dispatch", throttled_dispatch)
+    monkeypatch.setattr(LLMService, "call_model", unexpected_call_model)
+
+    report = await BenchmarkService.run_sweep(
+        _model({"max_retries": 3}), CASES, [2], requests_per_level=6, stream=False
+    )
+
+    level = report["levels"][0]
+    assert len(calls) == 6
+    assert level["rate_limited"] == 3
+    assert level["error_rate"] == 0.5
+
+
+def test_error_rate_marks_saturation():
+    levels = [
+        {"concurrency": 1, "throughput_rps": 10.0, "error_rate": 0.0},
+        {"concurrency": 2, "throughput_rps": 19.0, "error_rate": 0.0},
+        {"concurrency": 4, "throughput_rps": 30.0, "error_rate": 0.2},
+    ]
+
+    saturation = BenchmarkService.find_saturation(levels)
+
+    assert saturation["concurrency"] == 2
@@ -0,0 +1,37 @@
+"""Tests for the pooled provider client registry."""
+import pytest
+
+from app.services.client_pool import ClientPool
+
+
+@pytest.mark.asyncio
+async def test_clients_are_reused_per_endpoint_and_key():
+    """Same (provider, endpoint, key) reuses one client; different keys do not."""
+    first = ClientPool.get_openai_client("sk-a", "http://gateway.local/v1")
+    again = ClientPool.get_openai_client("sk-a", "http://gateway.local/v1")
+    other_key = ClientPool.get_openai_client("sk-b", "http://gateway.local/v1")
+
+    assert first is again
+    assert first is not other_key
+
+    local = ClientPool.get_http_client("local", "http://localhost:11434")
+    assert ClientPool.get_http_client("local", "http://localhost:11434") is local
+
+    await ClientPool.close_all()
+    assert local.is_closed
+    assert ClientPool.stats() == {"http_clients": 0, "sdk_clients": 0}
+
+
+@pytest.mark.asyncio
+async def test_dedicated_pool_is_isolated_and_closed():
+    shared = ClientPool.get_http_client("local", "http://localhost:11434")
+
+    async with ClientPool.dedicated(max_connections=256):
+        dedicated = ClientPool.get_http_client("local", "http://localhost:11434")
+        assert dedicated is not shared
+        assert dedicated._transport._pool._max_connections == 256
+
+    assert dedicated.is_closed
+    assert not shared.is_closed
+    assert ClientPool.get_http_client("local", "http://localhost:11434") is shared
+    await ClientPool.close_all()
@@ -0,0 +1,100 @@
+"""Tests for the aggregated multi-model comparison queries."""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.batch_job import BatchDB, BatchItemDB
+from app.models.model_config import ModelConfigDB
+from app.models.test_case import TestCaseDB
+from app.models.test_result import TestResultDB
+from app.services.compare_service import CompareService
+from app.utils.database import Base
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'compare.db'}")
+    Base.metadata.create_all(bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session = sessionmaker(bind=engine)()
+    session.statements = statements
+    yield session
+    session.close()
+
+
+def _seed(db, cases=4):
+    models = [ModelConfigDB(name=name, provider="openai", model_name=name) for name in ("fast", "slow")]
+    test_cases = [TestCaseDB(title=f"case {i}", prompt=f"prompt {i}") for i in range(cases)]
+    db.add_all(models + test_cases)
+    db.commit()
+    for i, test_case in enumerate(test_cases):
+        for model, latency, score in ((models[0], 1.0 + i, 1.0), (models[1], 10.0 + i, 0.5)):
+            db.add(TestResultDB(
+                test_case_id=test_case.id,
+                model_id=model.id,
+                output="ok",
+                score=score,
+                status="success" if i or model is models[0] else "error",
+                metrics={"response_time": latency, "total_tokens": 100}
+            ))
+    db.commit()
+    return [m.id for m in models], [c.id for c in test_cases]
+
+
+def test_results_are_joined_and_paginated_by_test_case(db):
+    model_ids, case_ids = _seed(db)
+
+    db.statements.clear()
+    groups, total = CompareService.results(db, model_ids, case_ids, skip=1, limit=2)
+    # 计数、分页、连表查询各一次，与测试用例数量无关
+    assert len(db.statements) == 3
+    assert total == 4
+    assert [g["test_case_id"] for g in groups] == case_ids[1:3]
+    assert groups[0]["test_case_title"] == "case 1"
+    assert [r["model_name"] for r in groups[0]["results"]] == ["fast", "slow"]
+
+
+def test_latest_only_and_batch_filters(db):
+    model_ids, case_ids = _seed(db, cases=2)
+    rerun = TestResultDB(test_case_id=case_ids[0], model_id=model_ids[0], output="rerun", score=0.0, status="error")
+    db.add(rerun)
+    db.commit()
+
+    groups, _ = CompareService.results(db, model_ids, case_ids)
+    assert len(groups[0]["results"]) == 3
+    groups, _ = CompareService.results(db, model_ids, case_ids, latest_only=True)
+    assert [r["output"] for r in groups[0]["results"]] == ["ok", "rerun"]
+
+    db.add(BatchDB(id="b1", model_ids=model_ids, test_case_ids=case_ids, total_items=1))
+    db.add(BatchItemDB(batch_id="b1", position=0, test_case_id=case_ids[0], model_id=model_ids[0],
+                       status="done", result_id=rerun.id))
+    db.commit()
+    groups, total = CompareService.results(db, model_ids, case_ids, batch_id="b1")
+    assert total == 1
+    assert [r["result_id"] for r in groups[0]["results"]] == [rerun.id]
+
+
+def test_summary_aggregates_per_model(db):
+    model_ids, case_ids = _seed(db)
+
+    fast, slow = CompareService.summary(db, model_ids, case_ids)
+    assert fast["model_name"] == "fast" and fast["total"] == 4
+    assert fast["success_rate"] == 1.0 and slow["success_rate"] == 0.75
+    assert fast["score_mean"] == 1.0 and slow["score_mean"] == 0.5
+    assert fast["latency_mean"] == 2.5
+    assert (fast["latency_p50"], fast["latency_p90"], fast["latency_p95"]) == (2.0, 4.0, 4.0)
+    assert slow["latency_p50"] == 11.0
+    assert fast["tokens_total"] == 400
+    assert fast["cache_lookups"] == 0 and fast["cache_hit_rate"] is None
+
+
+def test_summary_cache_hit_rate_is_scoped_to_the_results(db):
+    model_ids, case_ids = _seed(db, cases=1)
+    for metrics in ({"cache_hit": True}, {"cache_hit": False}, {"cache_hits": 2, "cache_misses": 1}):
+        db.add(TestResultDB(test_case_id=case_ids[0], model_id=model_ids[0], output="ok", status="success", metrics=metrics))
+    db.commit()
+
+    fast = CompareService.summary(db, model_ids, case_ids)[0]
+    assert (fast["cache_hits"], fast["cache_lookups"]) == (3, 5)
+    assert fast["cache_hit_rate"] == 0.6
@@ -0,0 +1,105 @@
+"""Tests for the versioned schema migration runner."""
+import json
+
+import pytest
+from sqlalchemy import String, create_engine, inspect, text
+
+from app.config import settings
+from app.models import batch_job, model_config, model_template, system_prompt, test_case, test_result, tool_definition  # noqa: F401
+from app.utils.database import Base
+from app.utils.migrations import MIGRATIONS, Migration, current_version, run_migrations
+
+# 旧版本数据库缺少的字段（删除字段前先删除其上的索引）
+LEGACY_COLUMNS = [
+    ("test_cases", "tools", None),
+    ("test_cases", "use_mock", None),
+    ("test_cases", "evaluation_weights", None),
+    ("tool_definitions", "mock_responses", None),
+    ("models", "rpm_limit", None),
+    ("test_results", "fingerprint", "ix_test_results_fingerprint"),
+    ("batches", "done_items", None),
+    ("batches", "score_sum", None),
+]
+LEGACY_INDEXES = ["ix_test_results_case_model", "ix_batches_created_at"]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULTS_DIR", tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _make_legacy(engine):
+    with engine.begin() as conn:
+        for index in LEGACY_INDEXES:
+            conn.execute(text(f"DROP INDEX {index}"))
+        for table, column, index in LEGACY_COLUMNS:
+            if index:
+                conn.execute(text(f"DROP INDEX {index}"))
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(text("DELETE FROM test_case_tags"))
+
+
+def test_fresh_database_records_all_versions(engine):
+    assert current_version(engine) == 0
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS]
+    assert current_version(engine) == MIGRATIONS[-1].version
+    assert run_migrations(engine) == []
+
+
+def test_legacy_database_is_upgraded_in_chunks(engine, monkeypatch):
+    monkeypatch.setattr(settings, "MIGRATION_CHUNK_SIZE", 2)
+    _make_legacy(engine)
+    with engine.begin() as conn:
+        for i in range(5):
+            conn.execute(text("INSERT INTO test_cases (title, prompt, tags) VALUES (:t, 'p', :tags)"), {
+                "t": f"case {i}", "tags": "a, b" if i % 2 else "c"
+            })
+        conn.execute(text("INSERT INTO tool_definitions (name, description, parameters) VALUES ('search', 'd', '{}')"))
+        conn.execute(text(
+            "INSERT INTO batches (id, status, priority, model_ids, test_case_ids, total_items, failed_items, "
+            "cancelled_items, skipped_items, scored_items, created_at) "
+            "VALUES ('batch_1', 'completed', 0, '[1]', '[1]', 2, 0, 0, 0, 0, CURRENT_TIMESTAMP)"
+        ))
+        conn.execute(text("INSERT INTO batch_items (batch_id, position, test_case_id, model_id, status) VALUES ('batch_1', 0, 1, 1, 'done')"))
+        conn.execute(text("INSERT INTO batch_items (batch_id, position, test_case_id, model_id, status) VALUES ('batch_1', 1, 2, 1, 'failed')"))
+    (settings.RESULTS_DIR / "batch_legacy.json").write_text(json.dumps({
+        "batch_id": "batch_legacy",
+        "timestamp": "2024-01-02T03:04:05",
+        "models": [{"id": 1}],
+        "test_cases": [{"id": 1}, {"id": 2}],
+        "results": [{"status": "success"}, {"status": "error"}]
+    }), encoding="utf-8")
+
+    run_migrations(engine)
+
+    inspector = inspect(engine)
+    for table, column, _ in LEGACY_COLUMNS:
+        assert column in [c["name"] for c in inspector.get_columns(table)]
+    assert "ix_test_results_case_model" in [i["name"] for i in inspector.get_indexes("test_results")]
+    with engine.connect() as conn:
+        weights = conn.execute(text("SELECT DISTINCT evaluation_weights FROM test_cases")).scalars().all()
+        assert [json.loads(w) for w in weights] == [{"tool_calls": 70, "text_similarity": 20, "custom_criteria": 10}]
+        assert json.loads(conn.execute(text("SELECT mock_responses FROM tool_definitions")).scalar())["enabled"] is False
+        assert conn.execute(text("SELECT COUNT(*) FROM test_case_tags")).scalar() == 2 * 2 + 3
+        counters = conn.execute(text("SELECT done_items, failed_items FROM batches WHERE id = 'batch_1'")).one()
+        assert tuple(counters) == (1, 1)
+        legacy = conn.execute(text("SELECT done_items, failed_items, created_at FROM batches WHERE id = 'batch_legacy'")).one()
+        assert tuple(legacy) == (1, 1, "2024-01-02 03:04:05.000000")
+
+
+def test_failed_migration_is_rolled_back_and_retried(engine):
+    def broken(ctx):
+        ctx.add_column("models", "extra", String(10))
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run_migrations(engine, [Migration(1, "broken", broken)])
+    assert current_version(engine) == 0
+    assert "extra" not in [c["name"] for c in inspect(engine).get_columns("models")]
+
+    assert run_migrations(engine, [Migration(1, "fixed", lambda ctx: ctx.add_column("models", "extra", String(10)))]) == [1]
+    assert current_version(engine) == 1
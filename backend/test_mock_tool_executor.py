@@ -0,0 +1,146 @@
+"""Tests for non-blocking and virtual-clock mock tool execution."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import agent_service
+from app.services.agent_service import AgentService
+from app.services.mock_tool_executor import MockToolExecutor
+
+SLOW_TOOL = {
+    "enabled": True,
+    "response_type": "static",
+    "static_response": {"ok": True},
+    "latency_ms": {"min": 200, "max": 200},
+}
+
+
+@pytest.mark.asyncio
+async def test_async_execution_does_not_block_event_loop():
+    """Two concurrent 200ms tool calls finish in ~200ms, not 400ms."""
+    started = time.monotonic()
+    results = await asyncio.gather(
+        MockToolExecutor.execute_tool_call_async("slow", {}, SLOW_TOOL),
+        MockToolExecutor.execute_tool_call_async("slow", {}, SLOW_TOOL),
+    )
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.35
+    assert [latency for _, latency in results] == [200, 200]
+    assert results[0][0]["ok"] is True
+
+
+@pytest.mark.asyncio
+async def test_multiple_tool_calls_run_concurrently_in_order():
+    """The debug/training helper runs one turn's tool calls concurrently and keeps their order."""
+    fast = {**SLOW_TOOL, "latency_ms": {"min": 50, "max": 50}, "static_response": {"tool": "fast"}}
+    tool_calls = [
+        {"id": "a", "function": {"name": "slow", "arguments": "{}"}},
+        {"id": "b", "function": {"name": "fast", "arguments": "{}"}},
+        {"id": "c", "function": {"name": "slow", "arguments": "{}"}},
+    ]
+
+    started = time.monotonic()
+    results = await MockToolExecutor.execute_multiple_tool_calls_async(
+        tool_calls, {"slow": SLOW_TOOL, "fast": fast}, max_parallel=3
+    )
+
+    assert time.monotonic() - started < 0.35
+    assert [r["tool_call_id"] for r in results] == ["a", "b", "c"]
+    assert results[1]["result"]["tool"] == "fast"
+
+
+@pytest.mark.asyncio
+async def test_virtual_clock_records_latency_without_waiting():
+    started = time.monotonic()
+    response, latency = await MockToolExecutor.execute_tool_call_async(
+        "slow", {}, SLOW_TOOL, virtual_clock=True
+    )
+
+    assert time.monotonic() - started < 0.1
+    assert latency == 200
+    assert response["ok"] is True
+
+
+@pytest.mark.asyncio
+async def test_agent_reports_simulated_tool_latency(monkeypatch):
+    responses = [
+        {
+            "output": "",
+            "metrics": {},
+            "status": "success",
+            "tool_calls": [
+                {"id": "c1", "function": {"name": "slow", "arguments": "{}"}},
+                {"id": "c2", "function": {"name": "slow", "arguments": "{}"}},
+            ],
+        },
+        {"output": "done", "metrics": {}, "status": "success"},
+    ]
+
+    async def fake_call_model(*args, **kwargs):
+        return responses.pop(0)
+
+    monkeypatch.setattr(agent_service.LLMService, "call_model", fake_call_model)
+    model = SimpleNamespace(name="Mocked", resilience_policy=None)
+
+    started = time.monotonic()
+    result = await AgentService.run_agent(
+        model_config=model,
+        content="hi",
+        tools=[{"type": "function", "function": {"name": "slow"}}],
+        tools_config={"slow": SLOW_TOOL},
+        use_mock=True,
+        virtual_clock=True,
+    )
+
+    assert time.monotonic() - started < 0.1
+    assert result["output"] == "done"
+    assert result["metrics"]["simulated_tool_latency_ms"] == 400
+    assert [t["simulated_latency_ms"] for t in result["tool_call_history"]] == [200, 200]
+
+
+@pytest.mark.asyncio
+async def test_agent_runs_tool_calls_in_parallel_and_keeps_order(monkeypatch):
+    """Agent latency tracks the slowest tool; results keep tool_call_id order."""
+    fast_tool = {**SLOW_TOOL, "latency_ms": {"min": 50, "max": 50}}
+    seen_messages = []
+    responses = [
+        {
+            "output": "",
+            "metrics": {},
+            "status": "success",
+            "tool_calls": [
+                {"id": "c1", "function": {"name": "slow", "arguments": "{}"}},
+                {"id": "c2", "function": {"name": "fast", "arguments": "{}"}},
+                {"id": "c3", "function": {"name": "slow", "arguments": "{}"}},
+            ],
+        },
+        {"output": "done", "metrics": {}, "status": "success"},
+    ]
+
+    async def fake_call_model(*args, **kwargs):
+        seen_messages.append(kwargs["conversation_history"])
+        return responses.pop(0)
+
+    monkeypatch.setattr(agent_service.LLMService, "call_model", fake_call_model)
+    model = SimpleNamespace(name="Mocked", resilience_policy=None)
+
+    started = time.monotonic()
+    result = await AgentService.run_agent(
+        model_config=model,
+        content="hi",
+        tools=[{"type": "function", "function": {"name": "slow"}}],
+        tools_config={"slow": SLOW_TOOL, "fast": fast_tool},
+        use_mock=True,
+        virtual_clock=False,
+        max_parallel_tools=3,
+    )
+
+    assert time.monotonic() - started < 0.35
+    history = result["tool_call_history"]
+    assert [t["tool_call_id"] for t in history] == ["c1", "c2", "c3"]
+    assert history[1]["duration_ms"] < history[0]["duration_ms"]
+    tool_messages = [m["tool_call_id"] for m in seen_messages[-1] if m["role"] == "tool"]
+    assert tool_messages == ["c1", "c2", "c3"]
@@ -0,0 +1,93 @@
+"""Tests that the hot read paths (comparison, tag filter, batch history) are served by indexes."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.api import testcases
+from app.models.test_case import TestCaseTagDB
+from app.services.batch_queue import BatchQueue
+from app.services.compare_service import CompareService
+from app.utils.database import Base, get_async_db, async_database_url
+
+
+def capture(engine):
+    """记录引擎执行的 SELECT 语句及参数"""
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    return statements
+
+
+def query_plan(engine, statements):
+    """返回全部语句的 EXPLAIN QUERY PLAN 明细"""
+    details = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            details += [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+    return details
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def test_compare_and_history_use_indexes(engine):
+    db = sessionmaker(bind=engine)()
+    statements = capture(engine)
+    CompareService.results(db, [1, 2], [1, 2, 3], 0, 10, None, True)
+    CompareService.summary(db, [1, 2], [1, 2, 3])
+    compare_plan = query_plan(engine, statements)
+    statements.clear()
+    BatchQueue.history(db)
+    history_plan = query_plan(engine, statements)
+    db.close()
+
+    assert any("ix_test_results_case_model" in detail for detail in compare_plan)
+    assert not any(detail.startswith("SCAN test_results") for detail in compare_plan)
+    assert any("ix_batches_created_at" in detail for detail in history_plan)
+
+
+def test_tags_are_synced_and_filtered_through_index(engine):
+    async_engine = create_async_engine(async_database_url(str(engine.url)))
+    factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override():
+        async with factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(testcases.router, prefix="/api/testcases")
+    app.dependency_overrides[get_async_db] = override
+    with TestClient(app) as client:
+        first = client.post("/api/testcases/", json={"title": "a", "prompt": "a", "tags": "math, code"}).json()["id"]
+        second = client.post("/api/testcases/", json={"title": "b", "prompt": "b", "tags": "math，mathematics"}).json()["id"]
+
+        def tags_of(case_id):
+            with engine.connect() as conn:
+                return sorted(conn.scalars(select(TestCaseTagDB.tag).where(TestCaseTagDB.test_case_id == case_id)))
+
+        assert tags_of(first) == ["code", "math"]
+        assert tags_of(second) == ["math", "mathematics"]
+
+        statements = capture(async_engine.sync_engine)
+        assert [c["id"] for c in client.get("/api/testcases/", params={"tags": "math"}).json()] == [first, second]
+        assert [c["id"] for c in client.get("/api/testcases/", params={"tags": "math,code"}).json()] == [first]
+        # 精确匹配：math 不再匹配 mathematics
+        assert client.get("/api/testcases/", params={"tags": "mathematics"}).json()[0]["id"] == second
+        plan = query_plan(engine, statements)
+        assert any("test_case_tags" in detail and "INDEX" in detail for detail in plan)
+
+        client.put(f"/api/testcases/{first}", json={"tags": "code"})
+        assert tags_of(first) == ["code"]
+        client.delete(f"/api/testcases/{second}")
+        assert tags_of(second) == []
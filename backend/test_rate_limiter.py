@@ -0,0 +1,141 @@
+"""Tests for the per-endpoint rate limiter."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_service
+from app.services.llm_service import LLMService
+from app.services.rate_limiter import EndpointRateLimiter, RateLimiter
+
+
+def _model(**overrides):
+    config = dict(
+        id=1,
+        name="Gateway",
+        provider="openai",
+        api_endpoint="http://gateway.local/v1",
+        api_key=None,
+        model_name="qwen-test",
+        default_params={},
+        rpm_limit=None,
+        tpm_limit=None,
+    )
+    config.update(overrides)
+    return SimpleNamespace(**config)
+
+
+@pytest.mark.asyncio
+async def test_rpm_bucket_spaces_requests():
+    """Requests beyond the burst wait for the bucket to refill."""
+    limiter = EndpointRateLimiter(rpm=600)  # 10 req/s, burst = 100
+    limiter.request_bucket.tokens = 1
+
+    assert await limiter.acquire() < 0.01
+    waited = await limiter.acquire()
+    assert 0.05 < waited < 0.5
+
+
+def test_limiter_is_usable_from_several_event_loops():
+    """A shared limiter queues on a per-loop lock; an asyncio.Lock contended in one loop cannot be used in another."""
+    limiter = EndpointRateLimiter(rpm=6000)
+
+    async def contend():
+        limiter.blocked_until = time.monotonic() + 0.02
+        await asyncio.gather(limiter.acquire(), limiter.acquire())
+
+    asyncio.run(contend())
+    asyncio.run(contend())
+
+
+def test_rate_limited_halves_rate_and_recovers():
+    """429 feedback lowers the rate; successes recover it gradually."""
+    limiter = EndpointRateLimiter(rpm=60, tpm=6000)
+
+    cooldown = limiter.on_rate_limited(retry_after=0.5)
+    assert cooldown == 0.5
+    assert limiter.rate_factor == 0.5
+    assert limiter.blocked_until > time.monotonic()
+
+    limiter.on_success()
+    assert 0.5 < limiter.rate_factor < 1.0
+
+
+def test_parse_retry_after_headers():
+    assert RateLimiter.parse_retry_after({"retry-after": "3"}) == 3.0
+    assert RateLimiter.parse_retry_after({"retry-after-ms": "250"}) == 0.25
+    assert RateLimiter.parse_retry_after({}) is None
+
+
+@pytest.mark.asyncio
+async def test_call_model_retries_on_429(monkeypatch):
+    """A 429 is retried after the cooldown instead of being recorded as an error."""
+    calls = []
+
+    async def fake_dispatch(*args, **kwargs):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return {"output": "", "metrics": {}, "status": "error", "status_code": 429, "retry_after": 0.05}
+        return {"output": "ok", "metrics": {"total_tokens": 10}, "status": "success"}
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", fake_dispatch)
+    RateLimiter._limiters.clear()
+
+    result = await LLMService.call_model(model_config=_model(), content="hi")
+
+    assert result["status"] == "success"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.05
+    assert result["metrics"]["rate_limit_retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_reconciles_token_reservation(monkeypatch):
+    """The TPM reservation of a streamed call is corrected to the real usage once the stream completes."""
+
+    async def chunks():
+        yield {"content": "hi", "done": False}
+        yield {"done": True, "final_response": {"output": "hi", "metrics": {"total_tokens": 10}, "status": "success"}}
+
+    async def stream_dispatch(*args, **kwargs):
+        return chunks()
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", stream_dispatch)
+    RateLimiter._limiters.clear()
+    model = _model(tpm_limit=100000)
+    limiter = RateLimiter.for_model(model)
+    reserved = []
+    reconciled = []
+    monkeypatch.setattr(limiter, "acquire", lambda tokens, max_wait=None: reserved.append(tokens) or asyncio.sleep(0, 0.0))
+    monkeypatch.setattr(limiter, "on_success", lambda estimated, actual: reconciled.append((estimated, actual)))
+
+    stream = await LLMService.call_model(model_config=model, content="x" * 4000, params={"max_tokens": 1000}, stream=True)
+    assert reconciled == []
+    await LLMService.collect_stream(stream)
+
+    assert reconciled == [(reserved[0], 10)]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_cooldown_is_bounded_by_the_deadline(monkeypatch):
+    """A Retry-After longer than the remaining deadline fails fast instead of waiting it out."""
+    calls = []
+
+    async def throttled_dispatch(*args, **kwargs):
+        calls.append(1)
+        return {"output": "", "metrics": {}, "status": "error", "status_code": 429, "retry_after": 30}
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", throttled_dispatch)
+    RateLimiter._limiters.clear()
+    model = _model(resilience_policy={"deadline": 1.0})
+
+    started = time.monotonic()
+    result = await LLMService.call_model(model_config=model, content="hi")
+
+    assert time.monotonic() - started < 0.5
+    assert len(calls) == 1
+    assert result["status"] == "timeout"
+
+    with pytest.raises(asyncio.TimeoutError):
+        await RateLimiter.for_model(model).acquire(max_wait=1.0)
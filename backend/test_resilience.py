@@ -0,0 +1,247 @@
+"""Tests for retry, deadline and circuit-breaker handling in LLMService."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_service
+from app.services.llm_service import LLMService
+from app.services.resilience import CircuitBreaker, Deadline
+from app.services.rate_limiter import RateLimiter
+
+
+def _model(policy=None, endpoint="http://flaky.local/v1"):
+    return SimpleNamespace(
+        id=1,
+        name="Flaky",
+        provider="openai",
+        api_endpoint=endpoint,
+        api_key=None,
+        model_name="flaky-model",
+        default_params={},
+        rpm_limit=None,
+        tpm_limit=None,
+        resilience_policy=policy,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _reset_registries():
+    CircuitBreaker._breakers.clear()
+    RateLimiter._limiters.clear()
+    yield
+    CircuitBreaker._breakers.clear()
+    RateLimiter._limiters.clear()
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(monkeypatch):
+    """A 503 followed by success is retried transparently."""
+    responses = [
+        {"output": "", "metrics": {}, "status": "error", "status_code": 503},
+        {"output": "ok", "metrics": {"total_tokens": 3}, "status": "success"},
+    ]
+
+    async def fake_dispatch(*args, **kwargs):
+        return responses.pop(0)
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", fake_dispatch)
+
+    result = await LLMService.call_model(
+        model_config=_model({"max_retries": 2, "base_delay": 0.01}), content="hi"
+    )
+
+    assert result["status"] == "success"
+    assert result["metrics"]["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(monkeypatch):
+    calls = []
+
+    async def fake_dispatch(*args, **kwargs):
+        calls.append(1)
+        return {"output": "", "metrics": {}, "status": "error", "status_code": 400}
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", fake_dispatch)
+
+    result = await LLMService.call_model(model_config=_model({"base_delay": 0.01}), content="hi")
+
+    assert result["status"] == "error"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_per_attempt_timeout_uses_policy(monkeypatch):
+    """A hanging endpoint is cut off by the policy timeout instead of waiting forever."""
+
+    async def hanging_dispatch(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", hanging_dispatch)
+
+    started = time.monotonic()
+    result = await LLMService.call_model(
+        model_config=_model({"timeout": 0.05, "max_retries": 0}), content="hi"
+    )
+
+    assert result["status"] == "timeout"
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_fails_fast(monkeypatch):
+    """After the failure threshold the endpoint is rejected without calling it."""
+    calls = []
+
+    async def failing_dispatch(*args, **kwargs):
+        calls.append(1)
+        return {"output": "", "metrics": {}, "status": "error", "transient": True}
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", failing_dispatch)
+    model = _model({"max_retries": 0, "failure_threshold": 2, "recovery_time": 60})
+
+    await LLMService.call_model(model_config=model, content="1")
+    await LLMService.call_model(model_config=model, content="2")
+    result = await LLMService.call_model(model_config=model, content="3")
+
+    assert len(calls) == 2
+    assert result["status"] == "circuit_open"
+
+
+@pytest.mark.asyncio
+async def test_deadline_is_shared_across_calls(monkeypatch):
+    """An outer deadline (e.g. an agent run) bounds every nested call."""
+
+    async def slow_dispatch(*args, **kwargs):
+        await asyncio.sleep(0.03)
+        return {"output": "ok", "metrics": {}, "status": "success"}
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", slow_dispatch)
+    model = _model()
+
+    statuses = []
+    with Deadline.scope(0.05):
+        for _ in range(3):
+            result = await LLMService.call_model(model_config=model, content="hi")
+            statuses.append(result["status"])
+
+    assert statuses[0] == "success"
+    assert statuses[-1] == "timeout"
+
+
+def _half_open_breaker(model):
+    from app.services.resilience import resolve_policy
+    breaker = CircuitBreaker.for_model(model, resolve_policy(model))
+    breaker.state = CircuitBreaker.OPEN
+    breaker.opened_at = time.monotonic() - breaker.recovery_time - 1
+    return breaker
+
+
+@pytest.mark.asyncio
+async def test_stream_probe_records_outcome(monkeypatch):
+    """A streamed probe closes the breaker once its first chunk arrives."""
+
+    async def chunks():
+        yield {"content": "hi", "done": False}
+        yield {"done": True, "final_response": {"output": "hi", "metrics": {}, "status": "success"}}
+
+    async def stream_dispatch(*args, **kwargs):
+        return chunks()
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", stream_dispatch)
+    model = _model({"recovery_time": 60})
+
+    breaker = _half_open_breaker(model)
+    stream = await LLMService.call_model(model_config=model, content="hi", stream=True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert (await LLMService.collect_stream(stream))["status"] == "success"
+
+
+@pytest.mark.asyncio
+async def test_stream_failures_before_first_chunk_are_retried(monkeypatch):
+    """A 503 error chunk or a stream that never starts is retried like a non-streaming call."""
+    attempts = []
+
+    async def chunks(attempt):
+        if attempt == 0:
+            yield {"done": True, "error": "unavailable", "status": "error", "status_code": 503}
+        elif attempt == 1:
+            await asyncio.sleep(10)
+        yield {"content": "ok", "done": False}
+        yield {"done": True, "final_response": {"output": "ok", "metrics": {}, "status": "success"}}
+
+    async def stream_dispatch(*args, **kwargs):
+        attempts.append(1)
+        return chunks(len(attempts) - 1)
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", stream_dispatch)
+    model = _model({"max_retries": 2, "base_delay": 0.01, "timeout": 0.05})
+
+    stream = await LLMService.call_model(model_config=model, content="hi", stream=True)
+
+    assert (await LLMService.collect_stream(stream))["output"] == "ok"
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_stalled_stream_is_cut_off(monkeypatch):
+    """A stream that stops sending chunks ends with a timeout chunk instead of hanging the caller."""
+
+    async def chunks():
+        yield {"content": "partial", "done": False}
+        await asyncio.sleep(10)
+
+    async def stream_dispatch(*args, **kwargs):
+        return chunks()
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", stream_dispatch)
+
+    started = time.monotonic()
+    stream = await LLMService.call_model(model_config=_model({"timeout": 0.05}), content="hi", stream=True)
+    result = await LLMService.collect_stream(stream)
+
+    assert result["status"] == "timeout"
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_released(monkeypatch):
+    """Cancelling the half-open probe (e.g. batch pause) does not leave the endpoint rejected forever."""
+
+    async def hanging_dispatch(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", hanging_dispatch)
+    model = _model({"recovery_time": 60})
+    breaker = _half_open_breaker(model)
+
+    task = asyncio.create_task(LLMService.call_model(model_config=model, content="hi"))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_probe_keeps_endpoint_reachable(monkeypatch):
+    responses = [
+        {"output": "", "metrics": {}, "status": "error", "status_code": 429, "retry_after": 0.01},
+        {"output": "ok", "metrics": {}, "status": "success"},
+    ]
+
+    async def fake_dispatch(*args, **kwargs):
+        return responses.pop(0)
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", fake_dispatch)
+    model = _model({"recovery_time": 60})
+    breaker = _half_open_breaker(model)
+
+    result = await LLMService.call_model(model_config=model, content="hi")
+
+    assert result["status"] == "success"
+    assert breaker.state == CircuitBreaker.CLOSED
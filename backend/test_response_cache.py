@@ -0,0 +1,101 @@
+"""Tests for the content-addressed LLM response cache."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services import llm_service
+from app.services.llm_service import LLMService
+from app.services.response_cache import ResponseCache
+
+
+def _model():
+    return SimpleNamespace(
+        id=1,
+        name="Cached",
+        provider="openai",
+        api_endpoint="http://cache.local/v1",
+        api_key=None,
+        model_name="det-model",
+        default_params={"temperature": 0},
+        rpm_limit=None,
+        tpm_limit=None,
+        resilience_policy=None,
+    )
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_PATH", tmp_path / "cache.db")
+    ResponseCache.hits = 0
+    ResponseCache.misses = 0
+    return tmp_path / "cache.db"
+
+
+@pytest.mark.asyncio
+async def test_second_identical_call_is_served_from_cache(monkeypatch, cache_path):
+    calls = []
+
+    async def fake_dispatch(*args, **kwargs):
+        calls.append(1)
+        return {
+            "output": "cached answer",
+            "metrics": {"response_time": 1.5, "total_tokens": 12, "estimated_cost": 0.01},
+            "status": "success",
+        }
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", fake_dispatch)
+
+    first = await LLMService.call_model(model_config=_model(), content="hi", use_cache=True)
+    second = await LLMService.call_model(model_config=_model(), content="hi", use_cache=True)
+    different = await LLMService.call_model(model_config=_model(), content="other", use_cache=True)
+
+    assert len(calls) == 2
+    assert first["metrics"]["cache_hit"] is False
+    assert second["metrics"]["cache_hit"] is True
+    assert second["output"] == "cached answer"
+    assert second["metrics"]["estimated_cost"] == 0.0
+    assert second["metrics"]["saved_cost"] == 0.01
+    assert different["metrics"]["cache_hit"] is False
+    assert ResponseCache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_non_deterministic_calls_bypass_cache(monkeypatch, cache_path):
+    calls = []
+
+    async def fake_dispatch(*args, **kwargs):
+        calls.append(1)
+        return {"output": "x", "metrics": {}, "status": "success"}
+
+    monkeypatch.setattr(llm_service.LLMService, "_dispatch", fake_dispatch)
+
+    for _ in range(2):
+        result = await LLMService.call_model(
+            model_config=_model(), content="hi", params={"temperature": 0.8}, use_cache=True
+        )
+
+    assert len(calls) == 2
+    assert "cache_hit" not in result["metrics"]
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_keeps_recently_used_entries(monkeypatch, cache_path):
+    monkeypatch.setattr(settings, "LLM_CACHE_MAX_ENTRIES", 2)
+
+    await ResponseCache.set("a", "m", {"output": "a"})
+    await ResponseCache.set("b", "m", {"output": "b"})
+    assert await ResponseCache.get("a") is not None  # a 变为最近使用
+    await ResponseCache.set("c", "m", {"output": "c"})
+
+    assert await ResponseCache.get("b") is None
+    assert await ResponseCache.get("a") is not None
+    assert await ResponseCache.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses(monkeypatch, cache_path):
+    await ResponseCache.set("old", "m", {"output": "old"})
+    monkeypatch.setattr(settings, "LLM_CACHE_TTL", -1)
+
+    assert await ResponseCache.get("old") is None
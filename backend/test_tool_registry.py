@@ -0,0 +1,80 @@
+"""Tests for the shared tool schema cache."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.tool_definition import ToolDefinitionDB
+from app.services.tool_registry import ToolRegistry
+from app.utils.database import Base
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tools.db'}")
+    Base.metadata.create_all(bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session = sessionmaker(bind=engine)()
+    session.statements = statements
+    ToolRegistry.invalidate()
+    yield session
+    session.close()
+    ToolRegistry.invalidate()
+
+
+def _tool(name, mock=None):
+    return ToolDefinitionDB(
+        name=name,
+        description=f"{name} tool",
+        parameters={"type": "object", "properties": {}},
+        mock_responses=mock
+    )
+
+
+def test_schemas_are_memoized_until_the_tool_changes(db):
+    search, weather = _tool("search", {"default": 1}), _tool("weather")
+    db.add_all([search, weather])
+    db.commit()
+
+    tools, config = ToolRegistry.resolve(db, [weather.id, search.id, 999, weather.id])
+    assert [t["function"]["name"] for t in tools] == ["weather", "search"]
+    assert config == {"weather": None, "search": {"default": 1}}
+
+    db.statements.clear()
+    toolsets = ToolRegistry.resolve_many(db, [[weather.id, search.id], None, [search.id]])
+    # 只有一次版本查询，工具定义全部命中缓存，相同组合复用同一对象
+    assert len(db.statements) == 1
+    assert toolsets[0][0] is tools
+    assert toolsets[1] == (None, {})
+    assert toolsets[2][0][0] is tools[1]
+
+    search.description = "updated"
+    search.updated_at = datetime.now() + timedelta(seconds=5)
+    db.commit()
+    ids = [weather.id, search.id]
+    db.statements.clear()
+    tools, _ = ToolRegistry.resolve(db, ids)
+    assert len(db.statements) == 2
+    assert tools[1]["function"]["description"] == "updated"
+
+
+def test_concurrent_invalidate_does_not_break_resolution(db, monkeypatch):
+    """invalidate() from another request between the version check and the lookup is harmless."""
+    search, weather = _tool("search"), _tool("weather")
+    db.add_all([search, weather])
+    db.commit()
+    ToolRegistry.resolve(db, [search.id])
+
+    refresh = ToolRegistry._refresh.__func__
+
+    def refresh_then_invalidate(cls, session, tool_ids):
+        versions = refresh(cls, session, tool_ids)
+        ToolRegistry.invalidate()
+        return versions
+
+    monkeypatch.setattr(ToolRegistry, "_refresh", classmethod(refresh_then_invalidate))
+    tools, _ = ToolRegistry.resolve(db, [search.id, weather.id])
+
+    assert [t["function"]["name"] for t in tools] == ["search", "weather"]